@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from stats.models import Team, Player, Match, PlayerStats, TeamStats
-from ml_models.models import MLModel, Prediction, ModelFeature
+from stats.models import Team, Player, Match, PlayerStats, TeamStats, PlayerSeasonTotals, TeamSeasonTotals
+from stats.season_totals import PLAYER_FIELDS, TEAM_FIELDS
+from ml_models.models import MLModel, Prediction, ModelFeature, InferenceTiming
+from ml_models.comparison import MAX_PLAYERS as MAX_COMPARED_PLAYERS
+from ml_models.timing import histogram_quantile
 
 
 class TeamSerializer(serializers.ModelSerializer):
@@ -67,15 +70,86 @@ class TeamStatsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class PlayerSeasonTotalsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the PlayerSeasonTotals model, with per-game averages.
+    """
+    player_name = serializers.ReadOnlyField(source='player.full_name')
+    per_game = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = PlayerSeasonTotals
+        fields = '__all__'
+    
+    def get_per_game(self, obj):
+        return {field: obj.per_game(field) for field in PLAYER_FIELDS}
+
+
+class TeamSeasonTotalsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the TeamSeasonTotals model, with per-game averages.
+    """
+    team_name = serializers.ReadOnlyField(source='team.name')
+    per_game = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TeamSeasonTotals
+        fields = '__all__'
+    
+    def get_per_game(self, obj):
+        return {field: obj.per_game(field) for field in TEAM_FIELDS}
+
+
 class MLModelSerializer(serializers.ModelSerializer):
     """
     Serializer for the MLModel model.
     """
+    graded_correct = serializers.ReadOnlyField(source='grading_totals.correct')
+    graded_incorrect = serializers.ReadOnlyField(source='grading_totals.incorrect')
+    graded_accuracy = serializers.ReadOnlyField(source='grading_totals.accuracy')
+    
     class Meta:
         model = MLModel
         fields = '__all__'
 
 
+class InferenceTimingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the InferenceTiming model, with latencies in milliseconds.
+    """
+    mean_ms = serializers.SerializerMethodField()
+    p50_ms = serializers.SerializerMethodField()
+    p90_ms = serializers.SerializerMethodField()
+    p99_ms = serializers.SerializerMethodField()
+    max_ms = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = InferenceTiming
+        fields = [
+            'operation', 'stage', 'calls', 'rows', 'total_seconds',
+            'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'buckets', 'updated_at'
+        ]
+    
+    @staticmethod
+    def to_ms(seconds):
+        return None if seconds is None else seconds * 1000
+    
+    def get_mean_ms(self, obj):
+        return self.to_ms(obj.mean_seconds)
+    
+    def get_p50_ms(self, obj):
+        return self.to_ms(histogram_quantile(obj.buckets, 0.5, obj.max_seconds))
+    
+    def get_p90_ms(self, obj):
+        return self.to_ms(histogram_quantile(obj.buckets, 0.9, obj.max_seconds))
+    
+    def get_p99_ms(self, obj):
+        return self.to_ms(histogram_quantile(obj.buckets, 0.99, obj.max_seconds))
+    
+    def get_max_ms(self, obj):
+        return self.to_ms(obj.max_seconds)
+
+
 class ModelFeatureSerializer(serializers.ModelSerializer):
     """
     Serializer for the ModelFeature model.
@@ -123,3 +197,41 @@ class PlayerComparisonSerializer(serializers.Serializer):
     player1_id = serializers.IntegerField()
     player2_id = serializers.IntegerField()
     model_version = serializers.CharField(required=False)
+
+
+class SimilarPlayersSerializer(serializers.Serializer):
+    """
+    Serializer for similar-player queries.
+    """
+    k = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class PlayerComparisonMatrixSerializer(serializers.Serializer):
+    """
+    Serializer for N-way player comparison requests.
+    """
+    player_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=2, max_length=MAX_COMPARED_PLAYERS
+    )
+    recent_matches = serializers.IntegerField(min_value=1, max_value=82, default=5)
+    save = serializers.BooleanField(default=False)
+    model_version = serializers.CharField(required=False)
+
+
+class RosterPredictionSerializer(serializers.Serializer):
+    """
+    Serializer for match roster prediction requests.
+    """
+    player_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    model_version = serializers.CharField(required=False)
+
+
+class BacktestSerializer(serializers.Serializer):
+    """
+    Serializer for model backtest requests.
+    """
+    season_from = serializers.CharField(required=False)
+    season_to = serializers.CharField(required=False)
+    save = serializers.BooleanField(default=True)
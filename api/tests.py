@@ -4,19 +4,36 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from stats.models import Team, Player, Match, PlayerStats, TeamStats
 from ml_models.models import MLModel, Prediction
+from django.core.cache import cache
+from django.test import override_settings
 from django.utils import timezone
 import datetime
 import os
 import pickle
+import tempfile
 import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from ml_models import timing, warmup
+from ml_models.grading import grade_predictions
+from ml_models.services import ModelService
+from ml_models.similarity import similar_players
 
 
+# Keep MLModel saves from writing the stamp file into the checkout
+STAMP_FILE = os.path.join(tempfile.mkdtemp(), '.active_models_stamp')
+
+
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
 class APIEndpointTests(TestCase):
     """Tests for the API endpoints."""
     
     def setUp(self):
         """Set up test data."""
+        cache.clear()
         self.client = APIClient()
         
         # Create teams
@@ -306,3 +323,158 @@ class APIEndpointTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
         self.assertEqual(response.data[0]['points'] + response.data[1]['points'], 207)  # 105 + 102
+    
+    def test_match_predict_roster_action(self):
+        """Test predicting both rosters of a match in one request."""
+        features = ModelService.prepare_player_features(self.player1, self.match3)
+        pipeline = Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=10, random_state=42)),
+        ])
+        pipeline.fit(pd.DataFrame([features]), np.array([[30, 9, 8, 2, 1]]))
+        model_dir = tempfile.mkdtemp()
+        file_path = os.path.join(model_dir, 'player_performance_pipeline.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(pipeline, f)
+        self.player_model.file_path = file_path
+        self.player_model.save()
+        
+        url = reverse('match-predict-roster', args=[self.match3.id])
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['predictions']), 1)
+        self.assertEqual(response.data['predictions'][0]['player'], self.player1.id)
+        self.assertEqual(response.data['skipped_player_ids'], [self.player2.id])
+    
+    def test_readiness_endpoint(self):
+        """Test that readiness waits for model warm-up when it is enabled."""
+        url = reverse('health-ready')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'ready')
+        
+        with override_settings(ML_WARM_UP=True):
+            warmup._state.update(pid=None, status=warmup.PENDING)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response.data['status'], 'pending')
+            
+            # The fixture models were not trained on service features
+            with self.assertLogs('ml_models.warmup', level='WARNING'):
+                warmup.start_warm_up(background=False)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['status'], 'ready')
+            self.assertIn(self.match_model.id, response.data['models'])
+    
+    def test_model_backtest_action(self):
+        """Test backtesting a match outcome model through the API."""
+        features = ModelService.prepare_match_features(self.match3)
+        classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        classifier.fit(pd.DataFrame([features, features]), np.array([0, 1]))
+        file_path = os.path.join(tempfile.mkdtemp(), 'match_outcome_backtest.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(classifier, f)
+        self.match_model.file_path = file_path
+        self.match_model.save()
+        
+        url = reverse('mlmodel-backtest', args=[self.match_model.id])
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['matches'], 1)
+        self.match_model.refresh_from_db()
+        self.assertEqual(self.match_model.accuracy, response.data['accuracy'])
+        
+        url = reverse('mlmodel-backtest', args=[self.player_model.id])
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_model_graded_accuracy(self):
+        """Test that the ML model endpoint reports running graded accuracy."""
+        url = reverse('mlmodel-detail', args=[self.match_model.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['graded_accuracy'])
+        
+        # match1 was won by the home team
+        for winner in (self.team1, self.team2, self.team1, self.team1):
+            Prediction.objects.create(
+                model=self.match_model,
+                prediction_type='MATCH_WINNER',
+                match=self.match1,
+                prediction_data={'winner_id': winner.id},
+                confidence=0.6
+            )
+        grade_predictions()
+        
+        response = self.client.get(url)
+        self.assertEqual(response.data['graded_correct'], 3)
+        self.assertEqual(response.data['graded_incorrect'], 1)
+        self.assertEqual(response.data['graded_accuracy'], 0.75)
+    
+    def test_model_timings_action(self):
+        """Test that per-stage prediction timings are reported for a model."""
+        features = ModelService.prepare_match_features(self.match3)
+        classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        classifier.fit(pd.DataFrame([features, features]), np.array([0, 1]))
+        file_path = os.path.join(tempfile.mkdtemp(), 'match_outcome_timed.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(classifier, f)
+        self.match_model.file_path = file_path
+        self.match_model.save()
+        
+        timing.get_aggregator().clear()
+        with override_settings(ML_TIMING_ENABLED=True):
+            ModelService.predict_match_outcome(self.match3)
+        
+        url = reverse('mlmodel-timings', args=[self.match_model.id])
+        response = self.client.get(url, {'operation': 'predict_match_outcome'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stages = [row['stage'] for row in response.data['timings']]
+        self.assertEqual(stages, list(timing.STAGES))
+        total = response.data['timings'][-1]
+        self.assertEqual(total['calls'], 1)
+        self.assertEqual(sum(total['buckets']), 1)
+        self.assertLessEqual(total['p50_ms'], total['max_ms'])
+        self.assertEqual(len(response.data['bucket_bounds_ms']), len(total['buckets']) - 1)
+    
+    def test_player_similar_action(self):
+        """Test finding the players most similar to a player."""
+        stats = PlayerStats.objects.get(pk=self.player_stats1.pk)
+        stats.pk = None
+        stats.player = self.player2
+        stats.save()
+        similar_players.invalidate()
+        
+        url = reverse('player-similar', args=[self.player1.id])
+        response = self.client.get(url, {'k': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['player'], self.player1.id)
+        self.assertEqual([entry['player']['id'] for entry in response.data['similar']], [self.player2.id])
+        self.assertIn('points', response.data['similar'][0]['per_game'])
+        
+        response = self.client.get(url, {'k': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_compare_matrix_action(self):
+        """Test comparing several players in one request."""
+        url = reverse('prediction-compare-matrix')
+        data = {'player_ids': [self.player1.id, self.player2.id, self.player1.id]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['skipped_player_ids'], [self.player2.id])
+        self.assertEqual([player['id'] for player in response.data['players']], [self.player1.id])
+        self.assertEqual(response.data['differences']['avg_points'], [[0.0]])
+        self.assertFalse(Prediction.objects.filter(prediction_type='PLAYER_COMPARISON').exists())
+        
+        # Storing pairwise predictions needs a player comparison model
+        response = self.client.post(url, {**data, 'save': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.post(url, {'player_ids': [self.player1.id, 999999]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(url, {'player_ids': [self.player1.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
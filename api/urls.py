@@ -5,8 +5,12 @@ from api.views import (
     PlayerViewSet,
     MatchViewSet,
     PredictionViewSet,
+    MLModelViewSet,
     PlayerStatsViewSet,
-    TeamStatsViewSet
+    TeamStatsViewSet,
+    PlayerSeasonTotalsViewSet,
+    TeamSeasonTotalsViewSet,
+    ReadinessView
 )
 from api.auth import (
     UserRegistrationView,
@@ -20,8 +24,11 @@ router.register(r'teams', TeamViewSet)
 router.register(r'players', PlayerViewSet)
 router.register(r'matches', MatchViewSet)
 router.register(r'predictions', PredictionViewSet)
+router.register(r'ml-models', MLModelViewSet)
 router.register(r'player-stats', PlayerStatsViewSet)
 router.register(r'team-stats', TeamStatsViewSet)
+router.register(r'player-season-totals', PlayerSeasonTotalsViewSet)
+router.register(r'team-season-totals', TeamSeasonTotalsViewSet)
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
@@ -32,4 +39,7 @@ urlpatterns = [
     path('auth/register/', UserRegistrationView.as_view(), name='register'),
     path('auth/token/', CustomAuthToken.as_view(), name='token'),
     path('auth/user/', UserDetailView.as_view(), name='user-detail'),
+
+    # Health checks
+    path('health/ready/', ReadinessView.as_view(), name='health-ready'),
 ]
@@ -1,23 +1,40 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, views
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from stats.models import Team, Player, Match, PlayerStats, TeamStats
+from stats.models import Team, Player, Match, PlayerStats, TeamStats, PlayerSeasonTotals, TeamSeasonTotals
+from stats.season_totals import PLAYER_FIELDS, TEAM_FIELDS
 from ml_models.models import MLModel, Prediction, ModelFeature
+from ml_models import timing
+from ml_models.backtest import backtest
+from ml_models.comparison import compare_players, comparison_predictions
 from ml_models.services import ModelService
+from ml_models.similarity import similar_players
+from ml_models.warmup import READY, warm_up_status
 from api.serializers import (
     TeamSerializer, 
     PlayerSerializer, 
     MatchSerializer, 
     PlayerStatsSerializer, 
     TeamStatsSerializer,
+    PlayerSeasonTotalsSerializer,
+    TeamSeasonTotalsSerializer,
     MLModelSerializer,
+    InferenceTimingSerializer,
     ModelFeatureSerializer,
     PredictionSerializer,
     PlayerPerformancePredictionSerializer,
     MatchOutcomePredictionSerializer,
-    PlayerComparisonSerializer
+    PlayerComparisonSerializer,
+    PlayerComparisonMatrixSerializer,
+    RosterPredictionSerializer,
+    SimilarPlayersSerializer,
+    BacktestSerializer
 )
 
 
@@ -92,6 +109,40 @@ class PlayerViewSet(viewsets.ModelViewSet):
         serializer = MatchSerializer(matches, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Return the `k` players most similar to a specific player, by
+        per-game averages, height, weight and position.
+        """
+        player = self.get_object()
+        serializer = SimilarPlayersSerializer(data=request.query_params)
+        
+        if serializer.is_valid():
+            try:
+                neighbours = similar_players.similar(player.id, k=serializer.validated_data['k'])
+                players = Player.objects.in_bulk([player_id for player_id, _, _ in neighbours])
+                return Response({
+                    'player': player.id,
+                    'similar': [
+                        {
+                            'player': PlayerSerializer(players[player_id]).data,
+                            'distance': distance,
+                            'per_game': per_game,
+                        }
+                        for player_id, distance, per_game in neighbours
+                        # Skip players deleted since the index was built
+                        if player_id in players
+                    ],
+                })
+            except Exception as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=True, methods=['post'])
     def predict_performance(self, request, pk=None):
         """
@@ -176,6 +227,42 @@ class MatchViewSet(viewsets.ModelViewSet):
                 )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['post'])
+    def predict_roster(self, request, pk=None):
+        """
+        Predict performance for every active player on both rosters of a match.
+        """
+        match = self.get_object()
+        serializer = RosterPredictionSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            player_ids = serializer.validated_data.get('player_ids')
+            model_version = serializer.validated_data.get('model_version')
+            
+            players = Player.objects.filter(
+                team__in=[match.home_team_id, match.away_team_id],
+                is_active=True
+            ).select_related('team').order_by('team', 'last_name', 'first_name')
+            if player_ids:
+                players = players.filter(pk__in=player_ids)
+            
+            try:
+                predictions, skipped = ModelService.predict_players_batch(
+                    list(players), match, model_version
+                )
+                prediction_serializer = PredictionSerializer(predictions, many=True)
+                return Response({
+                    'predictions': prediction_serializer.data,
+                    'skipped_player_ids': [player.id for player in skipped],
+                })
+            except Exception as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class PlayerStatsViewSet(viewsets.ModelViewSet):
@@ -198,6 +285,102 @@ class TeamStatsViewSet(viewsets.ModelViewSet):
     filterset_fields = ['team', 'match']
 
 
+def per_game_annotations(fields):
+    """
+    Return per-game average annotations, e.g. points_per_game, for season
+    totals querysets. Totals rows always have at least one game.
+    """
+    return {
+        f'{field}_per_game': Cast(F(field), FloatField()) / F('games')
+        for field in fields
+    }
+
+
+class PlayerSeasonTotalsViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows player season totals to be viewed and ranked.
+    """
+    queryset = PlayerSeasonTotals.objects.select_related('player').annotate(
+        **per_game_annotations(PLAYER_FIELDS)
+    ).order_by('-season', '-points')
+    serializer_class = PlayerSeasonTotalsSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['player', 'season', 'is_playoff']
+    ordering_fields = ['games', *PLAYER_FIELDS, *per_game_annotations(PLAYER_FIELDS)]
+
+
+class TeamSeasonTotalsViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows team season totals to be viewed and ranked.
+    """
+    queryset = TeamSeasonTotals.objects.select_related('team').annotate(
+        **per_game_annotations(TEAM_FIELDS)
+    ).order_by('-season', '-points')
+    serializer_class = TeamSeasonTotalsSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['team', 'season', 'is_playoff']
+    ordering_fields = ['games', *TEAM_FIELDS, *per_game_annotations(TEAM_FIELDS)]
+
+
+class MLModelViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows ML models to be viewed, backtested and profiled.
+    """
+    queryset = MLModel.objects.select_related('grading_totals').order_by('model_type', '-created_at')
+    serializer_class = MLModelSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['model_type', 'version', 'is_active']
+    
+    @action(detail=True, methods=['post'])
+    def backtest(self, request, pk=None):
+        """
+        Backtest a match outcome model on completed matches.
+        """
+        model_instance = self.get_object()
+        serializer = BacktestSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            try:
+                summary = backtest(
+                    model_instance,
+                    season_from=serializer.validated_data.get('season_from'),
+                    season_to=serializer.validated_data.get('season_to'),
+                    save=serializer.validated_data['save']
+                )
+                return Response(summary)
+            except Exception as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['get'])
+    def timings(self, request, pk=None):
+        """
+        Get per-stage latency histograms and row counts of a model's
+        prediction calls, optionally for one `operation`.
+        """
+        model_instance = self.get_object()
+        # Include this process's timings that are not written yet
+        timing.flush()
+        timings = model_instance.inference_timings.all()
+        operation = request.query_params.get('operation')
+        if operation:
+            timings = timings.filter(operation=operation)
+        stage_order = {stage: index for index, stage in enumerate(timing.STAGES)}
+        timings = sorted(timings, key=lambda row: (row.operation, stage_order.get(row.stage, len(stage_order))))
+        return Response({
+            'model': model_instance.id,
+            'name': model_instance.name,
+            'version': model_instance.version,
+            'enabled': getattr(settings, 'ML_TIMING_ENABLED', False),
+            'bucket_bounds_ms': [bound * 1000 for bound in timing.BUCKETS],
+            'timings': InferenceTimingSerializer(timings, many=True).data,
+        })
+
+
 class PredictionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows predictions to be viewed.
@@ -265,13 +448,13 @@ class PredictionViewSet(viewsets.ReadOnlyModelViewSet):
                 }
                 
                 # Create prediction object
-                prediction = Prediction.objects.create(
+                prediction = ModelService.save_predictions([Prediction(
                     model=model_instance,
                     prediction_type='PLAYER_COMPARISON',
                     player=player1,  # Reference to first player
                     prediction_data=comparison_data,
                     confidence=0.9  # Placeholder
-                )
+                )])[0]
                 
                 prediction_serializer = PredictionSerializer(prediction)
                 return Response(prediction_serializer.data)
@@ -282,3 +465,68 @@ class PredictionViewSet(viewsets.ReadOnlyModelViewSet):
                 )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def compare_matrix(self, request):
+        """
+        Compare up to 50 players at once: recent averages, pairwise
+        differences and percentiles within the group. Pairwise comparison
+        predictions are only stored when `save` is set.
+        """
+        serializer = PlayerComparisonMatrixSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            player_ids = list(dict.fromkeys(serializer.validated_data['player_ids']))
+            players = Player.objects.in_bulk(player_ids)
+            missing = [player_id for player_id in player_ids if player_id not in players]
+            if missing:
+                return Response(
+                    {'error': f"Players not found: {', '.join(map(str, missing))}"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            try:
+                comparison = compare_players(
+                    [players[player_id] for player_id in player_ids],
+                    recent_matches=serializer.validated_data['recent_matches']
+                )
+                
+                if serializer.validated_data['save']:
+                    # Get the ML model
+                    model_instance = ModelService.get_model(
+                        'PLAYER_COMPARISON', serializer.validated_data.get('model_version')
+                    )
+                    if not model_instance:
+                        return Response(
+                            {'error': 'No active player comparison model found'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    predictions = ModelService.save_predictions(
+                        comparison_predictions(model_instance, comparison)
+                    )
+                    comparison['saved_predictions'] = len(predictions)
+                
+                return Response(comparison)
+            except Exception as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ReadinessView(views.APIView):
+    """
+    Report whether this process has finished warming up its models.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        if not getattr(settings, 'ML_WARM_UP', False):
+            return Response({'status': READY, 'models': {}, 'error': None})
+        
+        warm_up = warm_up_status()
+        if warm_up['status'] != READY:
+            return Response(warm_up, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(warm_up)
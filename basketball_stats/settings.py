@@ -138,3 +138,70 @@ SWAGGER_SETTINGS = {
         }
     }
 }
+
+# ML model registry settings
+# Upper bound on the estimated memory of the models kept loaded per process; memory-mapped
+# arrays are shared through the page cache and not counted
+ML_MODEL_REGISTRY_MAX_BYTES = 512 * 1024 * 1024
+
+# Inference backend for random forest models: 'sklearn' or 'numpy'
+# The numpy backend compiles forests into flat node arrays when they are loaded
+ML_INFERENCE_BACKEND = 'sklearn'
+# With the numpy backend, batches with more rows than this still run on sklearn, which is
+# faster for large batches such as predict_slate, backfill_predictions and backtests
+ML_INFERENCE_NUMPY_MAX_ROWS = 256
+
+# Prediction persistence settings
+# When enabled, predictions are buffered and written in batches by a background thread;
+# pending rows are spilled to locked per-writer files in ML_PREDICTION_SPILL_DIR so they survive a crash
+ML_PREDICTION_WRITE_BEHIND = False
+ML_PREDICTION_WRITE_BEHIND_BATCH_SIZE = 200
+ML_PREDICTION_WRITE_BEHIND_INTERVAL = 1.0
+ML_PREDICTION_WRITE_BEHIND_MAX_PENDING = 10000
+ML_PREDICTION_SPILL_DIR = os.path.join(BASE_DIR, 'prediction_spill')
+
+# Prediction cache settings
+# Seconds a prediction is reused for repeated requests with unchanged features
+ML_PREDICTION_CACHE_TIMEOUT = 60 * 60
+
+# Model warm-up settings
+# Load and exercise every active model when a server process loads the WSGI or ASGI
+# application; /api/health/ready/ reports not-ready until this finishes. With preforking
+# servers, also call ml_models.warmup.start_warm_up() from the post-fork hook.
+ML_WARM_UP = False
+
+# Active model resolution settings
+# Replaced whenever an MLModel row changes so every process re-resolves its active models
+ML_MODEL_STAMP_FILE = os.path.join(BASE_DIR, 'ml_models', 'models', '.active_models_stamp')
+# Seconds before resolved models are looked up again, for changes that bypass model signals
+ML_MODEL_RESOLUTION_TTL = 60
+
+# Shadow evaluation settings
+# Candidate versions to run on the same features as each served prediction, e.g.
+# {'MATCH_OUTCOME': ['2.0']}; outputs are stored as ShadowPrediction rows
+ML_SHADOW_MODELS = {}
+# Background threads per process (0 runs shadows inline) and the most runs allowed to wait
+ML_SHADOW_WORKERS = 2
+ML_SHADOW_MAX_PENDING = 100
+
+# Prediction grading settings
+# Points a PLAYER_STATS prediction without quantiles may miss by and still be graded correct
+ML_GRADING_POINTS_TOLERANCE = 5.0
+
+# Inference timing settings
+# Record per-stage timings of every prediction call, aggregated per model into latency
+# histograms (see /api/ml-models/{id}/timings/ and the inference_timings command)
+ML_TIMING_ENABLED = False
+# Seconds between writes of each process's aggregated timings to the database
+ML_TIMING_FLUSH_INTERVAL = 10.0
+
+# Prediction retention settings
+# Superseded predictions older than this many days are rolled into daily PredictionRollup
+# rows and deleted by the prune_predictions command
+ML_PREDICTION_RETENTION_DAYS = 30
+# Predictions deleted per transaction, so pruning never holds long write locks
+ML_PREDICTION_RETENTION_BATCH_SIZE = 500
+
+# Similar-player index settings
+# Seconds before each process fully reloads its index, picking up box scores saved by other processes
+ML_SIMILAR_PLAYERS_TTL = 300
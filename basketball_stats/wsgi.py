@@ -9,3 +9,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'basketball_stats.settings')
 
 application = get_wsgi_application()
+
+# Load the active models in the background once the application exists
+from ml_models.warmup import start_server_warm_up  # noqa: E402
+
+start_server_warm_up()
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from ml_models.models import MLModel, Prediction, ModelFeature
+from ml_models.models import (
+    MLModel, Prediction, ModelFeature, PlayerFeatureSnapshot, TeamFeatureSnapshot, BackfillCheckpoint,
+    ShadowPrediction, GradingTotals, InferenceTiming, PredictionRollup
+)
 
 
 @admin.register(MLModel)
@@ -21,3 +24,48 @@ class ModelFeatureAdmin(admin.ModelAdmin):
     list_display = ('name', 'model', 'importance')
     list_filter = ('model',)
     search_fields = ('name', 'description')
+
+
+@admin.register(PlayerFeatureSnapshot)
+class PlayerFeatureSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('player', 'as_of', 'window', 'games', 'avg_points', 'avg_assists', 'avg_rebounds')
+    list_filter = ('window',)
+    search_fields = ('player__first_name', 'player__last_name')
+
+
+@admin.register(TeamFeatureSnapshot)
+class TeamFeatureSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('team', 'as_of', 'window', 'games', 'avg_points', 'avg_assists', 'avg_rebounds')
+    list_filter = ('window',)
+    search_fields = ('team__name',)
+
+
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('model', 'partition', 'predictions', 'skipped', 'completed_at')
+    list_filter = ('model',)
+    search_fields = ('partition',)
+
+
+@admin.register(ShadowPrediction)
+class ShadowPredictionAdmin(admin.ModelAdmin):
+    list_display = ('prediction', 'model', 'confidence', 'latency_ms', 'primary_latency_ms', 'created_at')
+    list_filter = ('model',)
+
+
+@admin.register(GradingTotals)
+class GradingTotalsAdmin(admin.ModelAdmin):
+    list_display = ('model', 'correct', 'incorrect', 'accuracy', 'updated_at')
+
+
+@admin.register(InferenceTiming)
+class InferenceTimingAdmin(admin.ModelAdmin):
+    list_display = ('model', 'operation', 'stage', 'calls', 'rows', 'total_seconds', 'max_seconds')
+    list_filter = ('model', 'operation', 'stage')
+
+
+@admin.register(PredictionRollup)
+class PredictionRollupAdmin(admin.ModelAdmin):
+    list_display = ('model', 'prediction_type', 'day', 'predictions', 'graded', 'accuracy', 'mean_confidence')
+    list_filter = ('model', 'prediction_type')
+    date_hierarchy = 'day'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MlModelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_models'
+
+    def ready(self):
+        import ml_models.signals  # noqa: F401
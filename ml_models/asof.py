@@ -0,0 +1,253 @@
+"""
+Point-in-time (as-of) feature engine.
+
+Box score history for players or teams is loaded once into arrays sorted by
+(entity, match date), with running sums of every stat column. Features for
+any number of (entity, timestamp) pairs are then computed with vectorized
+binary searches: only games strictly before each timestamp are used, so
+features for historical matches never include the match itself or later
+games.
+"""
+
+import itertools
+import numpy as np
+import pandas as pd
+from ml_models import feature_store
+from ml_models.features import SEASON, SOURCES, validate_windows, window_feature_name
+
+# Timestamps are stored as seconds in the low 32 bits of the search keys
+TIMESTAMP_BITS = 32
+LOAD_CHUNK_SIZE = 5000
+
+
+def to_timestamp(value):
+    """
+    Convert a datetime (or None, meaning "now and later") to epoch seconds.
+    """
+    if value is None:
+        return np.iinfo(np.int64).max
+    return int(value.timestamp())
+
+
+def iter_chunks(iterable, size):
+    """
+    Yield lists of up to `size` items from an iterable.
+    """
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class StatsHistory:
+    """
+    Sorted box score history for one kind of entity ('player' or 'team').
+    """
+
+    def __init__(self, kind, entity_ids, timestamps, seasons, values, fields):
+        self.kind = kind
+        self.fields = list(fields)
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        seasons = np.asarray(seasons)
+        values = np.asarray(values, dtype=np.int64).reshape(len(entity_ids), len(self.fields))
+
+        order = np.lexsort((timestamps, entity_ids))
+        entity_ids, timestamps = entity_ids[order], timestamps[order]
+        seasons, values = seasons[order], values[order]
+
+        self.entities, self.entity_start = np.unique(entity_ids, return_index=True)
+        ranks = np.searchsorted(self.entities, entity_ids)
+        self.min_timestamp = int(timestamps.min()) if len(timestamps) else 0
+        self.keys = self._keys(ranks, timestamps)
+
+        # Integer running sums keep averages identical to summing in Python
+        self.cumulative = np.zeros((len(entity_ids) + 1, len(self.fields)), dtype=np.int64)
+        np.cumsum(values, axis=0, out=self.cumulative[1:])
+
+        # First row of each (entity, season) run, for season-to-date averages
+        new_run = np.ones(len(entity_ids), dtype=bool)
+        new_run[1:] = (entity_ids[1:] != entity_ids[:-1]) | (seasons[1:] != seasons[:-1])
+        run_starts = np.flatnonzero(new_run)
+        self.season_start = run_starts[np.cumsum(new_run) - 1] if len(run_starts) else run_starts
+
+    @classmethod
+    def load(cls, kind, entity_ids=None, fields=None):
+        """
+        Load the history of every entity (or only the given ones) with one query.
+        Rows are streamed in chunks into preallocated arrays, so memory stays
+        proportional to the arrays rather than to one Python tuple per row.
+        """
+        model, entity_field, all_fields = SOURCES[kind]
+        fields = list(fields or all_fields)
+        queryset = model.objects.all()
+        if entity_ids is not None:
+            queryset = queryset.filter(**{f'{entity_field}__in': list(entity_ids)})
+        queryset = queryset.values_list(entity_field, 'match__date', 'match__season', *fields)
+
+        size = queryset.count()
+        entities = np.empty(size, dtype=np.int64)
+        timestamps = np.empty(size, dtype=np.int64)
+        seasons = np.empty(size, dtype=np.int32)
+        values = np.empty((size, len(fields)), dtype=np.int64)
+        # Seasons only need to compare equal, so they are stored as small codes
+        season_codes = {}
+
+        count = 0
+        for chunk in iter_chunks(queryset.iterator(chunk_size=LOAD_CHUNK_SIZE), LOAD_CHUNK_SIZE):
+            end = count + len(chunk)
+            if end > len(entities):
+                # Rows were added after counting
+                entities, timestamps, seasons = (
+                    np.resize(array, end) for array in (entities, timestamps, seasons)
+                )
+                values = np.resize(values, (end, len(fields)))
+            entities[count:end] = [row[0] for row in chunk]
+            timestamps[count:end] = [to_timestamp(row[1]) for row in chunk]
+            seasons[count:end] = [season_codes.setdefault(row[2], len(season_codes)) for row in chunk]
+            values[count:end] = [row[3:] for row in chunk]
+            count = end
+        return cls(kind, entities[:count], timestamps[:count], seasons[:count], values[:count], fields)
+
+    def _keys(self, ranks, timestamps):
+        # Offset by one so a query before the first game sorts before every row
+        offsets = np.clip(
+            timestamps - self.min_timestamp + 1, 0, (1 << TIMESTAMP_BITS) - 1
+        ).astype(np.int64)
+        return (ranks.astype(np.int64) << TIMESTAMP_BITS) | offsets
+
+    def _locate(self, entity_ids, timestamps):
+        """
+        Return (first, end) row bounds of each entity's games before each timestamp.
+        """
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        ranks = np.searchsorted(self.entities, entity_ids)
+        known = ranks < len(self.entities)
+        known[known] = self.entities[ranks[known]] == entity_ids[known]
+        ranks = np.where(known, ranks, 0)
+
+        end = np.searchsorted(self.keys, self._keys(ranks, timestamps), side='left')
+        first = self.entity_start[ranks] if len(self.entities) else np.zeros_like(end)
+        first = np.where(known, first, end)
+        end = np.where(known, end, first)
+        return first, end
+
+    def window_averages(self, entity_ids, timestamps, window, fields=None):
+        """
+        Average the last `window` games (or the season to date) before each
+        timestamp. Returns (averages, games); averages are NaN where an
+        entity has no earlier games.
+        """
+        first, end = self._locate(entity_ids, timestamps)
+        if window == SEASON:
+            last = np.maximum(end - 1, 0)
+            start = np.where(end > first, self.season_start[last] if len(self.season_start) else end, end)
+        else:
+            start = np.maximum(first, end - window)
+        games = end - start
+
+        columns = slice(None)
+        if fields is not None:
+            columns = [self.fields.index(field) for field in fields]
+        sums = self.cumulative[end][:, columns] - self.cumulative[start][:, columns]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = sums / games[:, None]
+        return averages, games
+
+    def window_features(self, entity_ids, timestamps, windows, prefix=''):
+        """
+        Return {feature_name: array} with one average per stat column and
+        window, named like ml_models.features.window_averages.
+        """
+        features = {}
+        for window in validate_windows(windows):
+            averages, _ = self.window_averages(entity_ids, timestamps, window)
+            for column, field in enumerate(self.fields):
+                features[prefix + window_feature_name(field, window)] = averages[:, column]
+        return features
+
+
+def match_feature_frame(matches, recent_matches=10, windows=None, team_history=None):
+    """
+    Build match outcome features for many matches at once.
+
+    Returns a DataFrame indexed by match id with the same columns as
+    ModelService.prepare_match_features. Matches where either team has no
+    earlier games are left out.
+    """
+    matches = list(matches)
+    if team_history is None:
+        team_history = StatsHistory.load('team')
+
+    home_ids = np.array([match.home_team_id for match in matches], dtype=np.int64)
+    away_ids = np.array([match.away_team_id for match in matches], dtype=np.int64)
+    timestamps = np.array([to_timestamp(match.date) for match in matches], dtype=np.int64)
+
+    names = list(feature_store.TEAM_FEATURES)
+    fields = list(feature_store.TEAM_FEATURES.values())
+    home, home_games = team_history.window_averages(home_ids, timestamps, recent_matches, fields)
+    away, away_games = team_history.window_averages(away_ids, timestamps, recent_matches, fields)
+
+    columns = {'home_team_id': home_ids, 'away_team_id': away_ids}
+    for column, name in enumerate(names):
+        columns[f'home_{name}'] = home[:, column]
+    for column, name in enumerate(names):
+        columns[f'away_{name}'] = away[:, column]
+    if windows:
+        columns.update(team_history.window_features(home_ids, timestamps, windows, prefix='home_'))
+        columns.update(team_history.window_features(away_ids, timestamps, windows, prefix='away_'))
+
+    frame = pd.DataFrame(columns, index=pd.Index([match.id for match in matches], name='match_id'))
+    return frame[(home_games > 0) & (away_games > 0)]
+
+
+def player_feature_frame(pairs, recent_matches=5, windows=None, player_history=None, team_history=None):
+    """
+    Build player performance features for many (player, match) pairs.
+
+    `match` may be None to use every game played so far. Returns a
+    DataFrame with the same columns as ModelService.prepare_player_features,
+    indexed by position in `pairs`. Pairs where the player has no earlier
+    games are left out.
+    """
+    pairs = list(pairs)
+    if player_history is None:
+        player_history = StatsHistory.load('player', entity_ids={player.id for player, _ in pairs})
+    if team_history is None:
+        team_history = StatsHistory.load('team')
+
+    player_ids = np.array([player.id for player, _ in pairs], dtype=np.int64)
+    timestamps = np.array(
+        [to_timestamp(match.date if match else None) for _, match in pairs], dtype=np.int64
+    )
+
+    names = list(feature_store.PLAYER_FEATURES)
+    averages, games = player_history.window_averages(
+        player_ids, timestamps, recent_matches, list(feature_store.PLAYER_FEATURES.values())
+    )
+
+    columns = {
+        'player_id': player_ids,
+        'position': [player.position for player, _ in pairs],
+        'height': [player.height for player, _ in pairs],
+        'weight': [player.weight for player, _ in pairs],
+        'age': [player.age for player, _ in pairs],
+    }
+    for column, name in enumerate(names):
+        columns[name] = averages[:, column]
+
+    if any(match for _, match in pairs):
+        opponent_ids = np.array([
+            -1 if match is None else (
+                match.away_team_id if player.team_id == match.home_team_id else match.home_team_id
+            )
+            for player, match in pairs
+        ], dtype=np.int64)
+        opponent, _ = team_history.window_averages(opponent_ids, timestamps, recent_matches, ['points'])
+        columns['avg_opp_points_allowed'] = opponent[:, 0]
+
+    if windows:
+        columns.update(player_history.window_features(player_ids, timestamps, windows))
+
+    frame = pd.DataFrame(columns, index=pd.RangeIndex(len(pairs), name='pair_index'))
+    return frame[games > 0]
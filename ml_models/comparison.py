@@ -0,0 +1,97 @@
+"""
+N-way player comparison.
+
+The recent-game averages of every compared player are read from one
+box score query through the as-of feature engine. Pairwise differences
+and within-group percentiles are then computed for all players and stats
+at once with NumPy broadcasting, instead of comparing pairs one by one.
+"""
+
+import numpy as np
+from ml_models import feature_store
+from ml_models.asof import StatsHistory, to_timestamp
+from ml_models.models import Prediction
+
+MAX_PLAYERS = 50
+
+
+def compare_players(players, recent_matches=5):
+    """
+    Compare players on their averages over their last `recent_matches`
+    games. Returns a dict with:
+    - players: id, name, games, averages and percentiles per compared player
+    - stats: the compared feature names, e.g. avg_points
+    - differences: {stat: matrix} where matrix[i][j] is player i's
+      average minus player j's
+    - skipped_player_ids: players without any games, left out
+    Percentiles give the share of the other compared players with a lower
+    average, counting ties as half.
+    """
+    players = list(players)
+    if len(players) > MAX_PLAYERS:
+        raise ValueError(f"At most {MAX_PLAYERS} players can be compared at once")
+    names = list(feature_store.PLAYER_FEATURES)
+    fields = list(feature_store.PLAYER_FEATURES.values())
+
+    history = StatsHistory.load('player', entity_ids={player.id for player in players}, fields=fields)
+    player_ids = np.array([player.id for player in players], dtype=np.int64)
+    averages, games = history.window_averages(
+        player_ids, np.full(len(players), to_timestamp(None), dtype=np.int64), recent_matches, fields
+    )
+    compared = games > 0
+    averages, games = averages[compared], games[compared]
+    compared_players = [player for player, keep in zip(players, compared) if keep]
+
+    # differences[i, j, stat] = averages[i, stat] - averages[j, stat]
+    differences = averages[:, None, :] - averages[None, :, :]
+    lower = (differences > 0).sum(axis=1)
+    ties = (differences == 0).sum(axis=1) - 1
+    others = len(compared_players) - 1
+    percentiles = (lower + ties / 2) / others * 100 if others else np.full_like(averages, np.nan)
+
+    return {
+        'players': [
+            {
+                'id': player.id,
+                'name': player.full_name,
+                'games': int(player_games),
+                'averages': dict(zip(names, player_averages.tolist())),
+                'percentiles': {
+                    name: None if np.isnan(value) else value
+                    for name, value in zip(names, player_percentiles.tolist())
+                },
+            }
+            for player, player_games, player_averages, player_percentiles
+            in zip(compared_players, games, averages, percentiles)
+        ],
+        'stats': names,
+        'differences': {name: differences[:, :, column].tolist() for column, name in enumerate(names)},
+        'skipped_player_ids': [player.id for player, keep in zip(players, compared) if not keep],
+    }
+
+
+def comparison_predictions(model_instance, comparison):
+    """
+    Build one unsaved PLAYER_COMPARISON Prediction per pair of compared
+    players, in the format of the two-player comparison endpoint.
+    """
+    players = comparison['players']
+    predictions = []
+    for i, first in enumerate(players):
+        for j in range(i + 1, len(players)):
+            second = players[j]
+            predictions.append(Prediction(
+                model=model_instance,
+                prediction_type='PLAYER_COMPARISON',
+                player_id=first['id'],
+                prediction_data={
+                    'player1': {'id': first['id'], 'name': first['name'], **first['averages']},
+                    'player2': {'id': second['id'], 'name': second['name'], **second['averages']},
+                    'comparison': {
+                        f"{name.removeprefix('avg_')}_diff": comparison['differences'][name][i][j]
+                        for name in comparison['stats']
+                    },
+                },
+                confidence=0.9  # Placeholder, as for two-player comparisons
+            ))
+    return predictions
@@ -0,0 +1,199 @@
+"""
+Materialized rolling features for players and teams.
+
+Each snapshot row holds the averages of an entity's last N games up to and
+including one match, so feature preparation reads a single row instead of
+scanning box score history. Snapshots are updated incrementally when a
+PlayerStats or TeamStats row changes; only the snapshots whose window
+contains the changed game are recomputed.
+"""
+
+import numpy as np
+from django.db import transaction
+from ml_models.models import PlayerFeatureSnapshot, TeamFeatureSnapshot
+from stats.models import PlayerStats, TeamStats
+
+PLAYER_WINDOWS = (5,)
+TEAM_WINDOWS = (5, 10)
+
+PLAYER_FEATURES = {
+    'avg_points': 'points',
+    'avg_assists': 'assists',
+    'avg_rebounds': 'rebounds',
+    'avg_steals': 'steals',
+    'avg_blocks': 'blocks',
+    'avg_minutes': 'minutes_played',
+}
+
+TEAM_FEATURES = {
+    'avg_points': 'points',
+    'avg_rebounds': 'rebounds',
+    'avg_assists': 'assists',
+    'avg_steals': 'steals',
+    'avg_blocks': 'blocks',
+}
+
+STORES = {
+    'player': {
+        'stats_model': PlayerStats,
+        'snapshot_model': PlayerFeatureSnapshot,
+        'entity_field': 'player_id',
+        'windows': PLAYER_WINDOWS,
+        'features': PLAYER_FEATURES,
+    },
+    'team': {
+        'stats_model': TeamStats,
+        'snapshot_model': TeamFeatureSnapshot,
+        'entity_field': 'team_id',
+        'windows': TEAM_WINDOWS,
+        'features': TEAM_FEATURES,
+    },
+}
+
+BATCH_SIZE = 1000
+
+
+def _history_fields(store):
+    return [store['entity_field'], 'match_id', 'match__date'] + list(store['features'].values())
+
+
+def build_snapshots(store, history, start=0):
+    """
+    Build unsaved snapshot rows from an entity's history, ordered by match
+    date ascending. Snapshots are only built for games from `start` onward;
+    earlier games are used to fill the rolling windows.
+    """
+    if len(history) <= start:
+        return []
+
+    sources = list(store['features'].values())
+    # Integer sums keep the averages identical to summing in Python
+    values = np.array([[row[field] for field in sources] for row in history], dtype=np.int64)
+    cumulative = np.vstack([np.zeros((1, len(sources)), dtype=np.int64), np.cumsum(values, axis=0)])
+
+    snapshots = []
+    for index in range(start, len(history)):
+        row = history[index]
+        for window in store['windows']:
+            first = max(0, index + 1 - window)
+            games = index + 1 - first
+            averages = (cumulative[index + 1] - cumulative[first]) / games
+            snapshots.append(store['snapshot_model'](
+                **{store['entity_field']: row[store['entity_field']]},
+                match_id=row['match_id'],
+                as_of=row['match__date'],
+                window=window,
+                games=games,
+                **{name: float(average) for name, average in zip(store['features'], averages)},
+            ))
+    return snapshots
+
+
+def update_features(kind, entity_id, since):
+    """
+    Recompute the snapshots of one player or team affected by a change to
+    a game played at `since`.
+    """
+    store = STORES[kind]
+    stats_model = store['stats_model']
+    entity_filter = {store['entity_field']: entity_id}
+    max_window = max(store['windows'])
+    fields = _history_fields(store)
+
+    before = list(
+        stats_model.objects.filter(match__date__lt=since, **entity_filter)
+        .order_by('-match__date', '-match_id')
+        .values(*fields)[:max_window - 1]
+    )
+    after = list(
+        stats_model.objects.filter(match__date__gte=since, **entity_filter)
+        .order_by('match__date', 'match_id')
+        .values(*fields)[:max_window]
+    )
+    history = before[::-1] + after
+    snapshots = build_snapshots(store, history, start=len(before))
+
+    with transaction.atomic():
+        store['snapshot_model'].objects.filter(
+            as_of__gte=since,
+            match_id__in=[row['match_id'] for row in after],
+            **entity_filter
+        ).delete()
+        store['snapshot_model'].objects.bulk_create(snapshots)
+
+
+def remove_features(kind, entity_id, match_id, since):
+    """
+    Remove the snapshot for a deleted game and refresh the ones after it.
+    """
+    store = STORES[kind]
+    store['snapshot_model'].objects.filter(
+        match_id=match_id, **{store['entity_field']: entity_id}
+    ).delete()
+    update_features(kind, entity_id, since)
+
+
+def reschedule_features(match_id, old_date, new_date):
+    """
+    Refresh the snapshots of every player and team with a box score in a
+    match moved from old_date to new_date. Games after both dates can see
+    a different window, so the match's snapshots are rebuilt from each.
+    """
+    for kind, store in STORES.items():
+        entity_ids = store['stats_model'].objects.filter(match_id=match_id).values_list(
+            store['entity_field'], flat=True
+        )
+        for entity_id in entity_ids:
+            remove_features(kind, entity_id, match_id, old_date)
+            update_features(kind, entity_id, new_date)
+
+
+def rebuild_features(kind):
+    """
+    Rebuild every snapshot of one kind from the full box score history.
+    Returns the number of snapshot rows written.
+    """
+    store = STORES[kind]
+    entity_field = store['entity_field']
+    rows = (
+        store['stats_model'].objects
+        .order_by(entity_field, 'match__date', 'match_id')
+        .values(*_history_fields(store))
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+
+    written = 0
+    with transaction.atomic():
+        store['snapshot_model'].objects.all().delete()
+        pending = []
+        history = []
+        for row in rows:
+            if history and history[-1][entity_field] != row[entity_field]:
+                pending.extend(build_snapshots(store, history))
+                history = []
+            history.append(row)
+            if len(pending) >= BATCH_SIZE:
+                store['snapshot_model'].objects.bulk_create(pending)
+                written += len(pending)
+                pending = []
+        pending.extend(build_snapshots(store, history))
+        store['snapshot_model'].objects.bulk_create(pending)
+        written += len(pending)
+    return written
+
+
+def latest_snapshot(kind, entity_id, window, before=None):
+    """
+    Return the most recent snapshot for an entity, optionally only
+    considering games played before a date. Returns None if the window is
+    not materialized or no snapshot exists.
+    """
+    store = STORES[kind]
+    if window not in store['windows']:
+        return None
+    snapshots = store['snapshot_model'].objects.filter(
+        window=window, **{store['entity_field']: entity_id}
+    )
+    if before is not None:
+        snapshots = snapshots.filter(as_of__lt=before)
+    return snapshots.order_by('-as_of').first()
@@ -0,0 +1,129 @@
+"""
+Multi-window rolling averages computed in the database.
+
+All windows for all requested players or teams are computed by one query
+using SQL window functions, and only the latest row per entity is returned
+through .values(), so no stats model instances are built.
+"""
+
+from django.db.models import Avg, F, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import RowNumber
+from stats.models import PlayerStats, TeamStats
+
+SEASON = 'season'
+
+PLAYER_STAT_FIELDS = [
+    'minutes_played',
+    'points',
+    'assists',
+    'rebounds',
+    'offensive_rebounds',
+    'defensive_rebounds',
+    'steals',
+    'blocks',
+    'turnovers',
+    'personal_fouls',
+    'field_goals_made',
+    'field_goals_attempted',
+    'three_pointers_made',
+    'three_pointers_attempted',
+    'free_throws_made',
+    'free_throws_attempted',
+    'plus_minus',
+]
+
+TEAM_STAT_FIELDS = [
+    'points',
+    'assists',
+    'rebounds',
+    'offensive_rebounds',
+    'defensive_rebounds',
+    'steals',
+    'blocks',
+    'turnovers',
+    'personal_fouls',
+    'field_goals_made',
+    'field_goals_attempted',
+    'three_pointers_made',
+    'three_pointers_attempted',
+    'free_throws_made',
+    'free_throws_attempted',
+]
+
+SOURCES = {
+    'player': (PlayerStats, 'player_id', PLAYER_STAT_FIELDS),
+    'team': (TeamStats, 'team_id', TEAM_STAT_FIELDS),
+}
+
+
+def validate_windows(windows):
+    """
+    Check a window list: positive game counts and/or 'season'.
+    """
+    for window in windows:
+        if window == SEASON:
+            continue
+        if isinstance(window, bool) or not isinstance(window, int) or window < 1:
+            raise ValueError(f"Invalid feature window: {window!r}")
+    return list(windows)
+
+
+def window_feature_name(field, window):
+    """
+    Return the feature name for a stat averaged over a window.
+    """
+    if window == SEASON:
+        return f'avg_{field}_season'
+    return f'avg_{field}_last_{window}'
+
+
+def window_averages(kind, entity_ids, windows, fields=None, before=None):
+    """
+    Average stats over several windows for many players or teams at once.
+
+    Returns {entity_id: {feature_name: value}} for every entity with at
+    least one game. Game-count windows cover the entity's last N games;
+    the 'season' window covers every game of the season of its latest game.
+    Only games before `before` are considered when it is given.
+    """
+    model, entity_field, all_fields = SOURCES[kind]
+    fields = fields or all_fields
+    windows = validate_windows(windows)
+
+    oldest_first = [F('match__date').asc(), F('match_id').asc()]
+    annotations = {}
+    for window in windows:
+        for field in fields:
+            if window == SEASON:
+                expression = Window(
+                    Avg(field),
+                    partition_by=[F(entity_field), F('match__season')],
+                )
+            else:
+                expression = Window(
+                    Avg(field),
+                    partition_by=[F(entity_field)],
+                    order_by=oldest_first,
+                    frame=RowRange(start=-(window - 1), end=0),
+                )
+            annotations[window_feature_name(field, window)] = expression
+
+    queryset = model.objects.filter(**{f'{entity_field}__in': list(entity_ids)})
+    if before is not None:
+        queryset = queryset.filter(match__date__lt=before)
+    rows = (
+        queryset
+        .annotate(**annotations)
+        .annotate(recency=Window(
+            RowNumber(),
+            partition_by=[F(entity_field)],
+            order_by=[F('match__date').desc(), F('match_id').desc()],
+        ))
+        .filter(recency=1)
+        .values(entity_field, *annotations)
+    )
+    return {
+        row[entity_field]: {name: row[name] for name in annotations}
+        for row in rows
+    }
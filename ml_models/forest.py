@@ -0,0 +1,360 @@
+import json
+import os
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from ml_models.schema import VectorizedModel
+
+
+class FlatForest:
+    """
+    Random forest flattened into contiguous node arrays.
+
+    The nodes of every tree are concatenated into one set of arrays, with
+    child indices rewritten to point into the combined arrays and `roots`
+    holding the first node of each tree. Saved artifacts are a directory of
+    plain .npy files which are memory-mapped read-only on load, so every
+    worker process maps the same pages instead of holding its own copy.
+
+    Leaves point back to themselves with an infinite threshold, so a
+    traversal can run a fixed number of steps without checking which rows
+    have finished. Small batches walk every tree for every row at once; large
+    batches walk one tree at a time to keep its nodes in cache. Predictions
+    are exactly what the source sklearn forest returns.
+
+    sklearn's compiled traversal is faster once batches reach a few hundred
+    rows. A forest compiled with compile_model(max_rows=...) keeps its
+    source estimator and hands batches larger than max_rows to it.
+    """
+    FORMAT_VERSION = 2
+    # Above this many (row, tree) pairs, traverse one tree at a time
+    JOINT_TRAVERSAL_LIMIT = 50000
+    META_FILE = 'meta.json'
+    # Source sklearn forest and the largest batch run here instead of on it
+    estimator = None
+    max_rows = None
+    ARRAYS = (
+        'feature',
+        'threshold',
+        'children_left',
+        'children_right',
+        'missing_go_to_left',
+        'value',
+        'roots',
+        'depths',
+    )
+
+    def __init__(self, arrays, kind, n_features, n_outputs, classes=None, feature_names=None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.kind = kind
+        self.n_features_in_ = n_features
+        self.n_outputs_ = n_outputs
+        self.classes_ = None if classes is None else np.asarray(classes)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """
+        Flatten a fitted RandomForestRegressor or RandomForestClassifier.
+        """
+        if isinstance(estimator, RandomForestClassifier):
+            if estimator.n_outputs_ != 1:
+                raise ValueError("Multi-output classifiers are not supported")
+            kind = 'classifier'
+        elif isinstance(estimator, RandomForestRegressor):
+            kind = 'regressor'
+        else:
+            raise ValueError(f"Unsupported estimator: {type(estimator).__name__}")
+
+        parts = {name: [] for name in cls.ARRAYS if name not in ('roots', 'depths')}
+        roots = []
+        depths = []
+        offset = 0
+        for tree_estimator in estimator.estimators_:
+            tree = tree_estimator.tree_
+            is_leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count) + offset
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            parts['feature'].append(np.where(is_leaf, 0, tree.feature))
+            parts['threshold'].append(np.where(is_leaf, np.inf, tree.threshold))
+            parts['children_left'].append(np.where(is_leaf, nodes, tree.children_left + offset))
+            parts['children_right'].append(np.where(is_leaf, nodes, tree.children_right + offset))
+            missing = getattr(tree, 'missing_go_to_left', None)
+            if missing is None:
+                missing = np.zeros(tree.node_count, dtype=np.uint8)
+            parts['missing_go_to_left'].append(missing)
+            if kind == 'classifier':
+                value = tree.value[:, 0, :]
+                normalizer = value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            else:
+                value = tree.value[:, :, 0]
+            parts['value'].append(value)
+            offset += tree.node_count
+
+        arrays = {
+            'feature': np.concatenate(parts['feature']).astype(np.intp),
+            'threshold': np.concatenate(parts['threshold']).astype(np.float64),
+            'children_left': np.concatenate(parts['children_left']).astype(np.intp),
+            'children_right': np.concatenate(parts['children_right']).astype(np.intp),
+            'missing_go_to_left': np.concatenate(parts['missing_go_to_left']).astype(bool),
+            'value': np.ascontiguousarray(np.concatenate(parts['value']), dtype=np.float64),
+            'roots': np.asarray(roots, dtype=np.intp),
+            'depths': np.asarray(depths, dtype=np.intp),
+        }
+        feature_names = getattr(estimator, 'feature_names_in_', None)
+        return cls(
+            arrays,
+            kind,
+            n_features=estimator.n_features_in_,
+            n_outputs=estimator.n_outputs_,
+            classes=estimator.classes_ if kind == 'classifier' else None,
+            feature_names=None if feature_names is None else list(feature_names),
+        )
+
+    @classmethod
+    def is_artifact(cls, path):
+        """
+        Return True if path is a saved flat forest artifact.
+        """
+        return os.path.isfile(os.path.join(path, cls.META_FILE))
+
+    def save(self, path):
+        """
+        Save the forest as a directory of .npy files.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'kind': self.kind,
+            'n_features': int(self.n_features_in_),
+            'n_outputs': int(self.n_outputs_),
+            'classes': None if self.classes_ is None else self.classes_.tolist(),
+            'feature_names': None if self.feature_names_in_ is None else list(self.feature_names_in_),
+        }
+        # Written last so a partially saved artifact is never detected
+        with open(os.path.join(path, self.META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a saved forest, memory-mapping its arrays by default.
+        """
+        with open(os.path.join(path, cls.META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != cls.FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported flat forest format: {meta.get('format_version')}, "
+                "re-run convert_model_artifact"
+            )
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        }
+        return cls(
+            arrays,
+            meta['kind'],
+            n_features=meta['n_features'],
+            n_outputs=meta['n_outputs'],
+            classes=meta['classes'],
+            feature_names=meta['feature_names'],
+        )
+
+    def _prepare(self, X):
+        if self.feature_names_in_ is not None and hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)]
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[-1]} features, but the model expects {self.n_features_in_}"
+            )
+        return X
+
+    def _step(self, X, offsets, nodes, has_missing):
+        values = X[offsets + self.feature[nodes]]
+        go_left = values <= self.threshold[nodes]
+        if has_missing:
+            go_left = np.where(np.isnan(values), self.missing_go_to_left[nodes], go_left)
+        return np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+
+    def apply(self, X):
+        """
+        Return the leaf index reached in every tree for every row,
+        as an array of shape (n_rows, n_trees).
+        """
+        X = self._prepare(X)
+        n_rows, n_features = X.shape
+        n_trees = self.n_estimators
+        has_missing = bool(np.isnan(X).any())
+        # Upcast once so comparisons with float64 thresholds match sklearn
+        X = X.astype(np.float64).ravel()
+        row_offsets = np.arange(n_rows, dtype=np.intp) * n_features
+
+        if n_rows * n_trees <= self.JOINT_TRAVERSAL_LIMIT:
+            nodes = np.tile(np.asarray(self.roots, dtype=np.intp), n_rows)
+            offsets = np.repeat(row_offsets, n_trees)
+            for _ in range(int(np.max(self.depths))):
+                nodes = self._step(X, offsets, nodes, has_missing)
+            return nodes.reshape(n_rows, n_trees)
+
+        leaves = np.empty((n_rows, n_trees), dtype=np.intp)
+        for tree, (root, depth) in enumerate(zip(self.roots, self.depths)):
+            nodes = np.full(n_rows, root, dtype=np.intp)
+            for _ in range(int(depth)):
+                nodes = self._step(X, row_offsets, nodes, has_missing)
+            leaves[:, tree] = nodes
+        return leaves
+
+    def _accumulate(self, X):
+        leaves = self.apply(X)
+        out = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        # Sum tree by tree, in the same order as sklearn, for identical results
+        for tree in range(leaves.shape[1]):
+            out += self.value[leaves[:, tree]]
+        out /= self.n_estimators
+        return out
+
+    def uses_estimator(self, X):
+        """
+        Return True if a batch is large enough to run on the source estimator.
+        """
+        if self.estimator is None or self.max_rows is None:
+            return False
+        n_rows = X.shape[0] if hasattr(X, 'shape') else len(X)
+        return n_rows > self.max_rows
+
+    def tree_outputs(self, X):
+        """
+        Return every tree's output for every row, as an array of shape
+        (n_trees, n_rows, n_outputs) (class probabilities for classifiers).
+        """
+        if self.kind == 'regressor' and self.uses_estimator(X):
+            return tree_predictions(self.estimator, X)
+        return self.value[self.apply(X).T]
+
+    def predict_proba(self, X):
+        if self.kind != 'classifier':
+            raise AttributeError("predict_proba is only available for classifiers")
+        if self.uses_estimator(X):
+            return self.estimator.predict_proba(X)
+        return self._accumulate(X)
+
+    def predict(self, X):
+        if self.uses_estimator(X):
+            return self.estimator.predict(X)
+        out = self._accumulate(X)
+        if self.kind == 'classifier':
+            return self.classes_.take(np.argmax(out, axis=1))
+        if self.n_outputs_ == 1:
+            return out[:, 0]
+        return out
+
+
+class CompiledPipeline:
+    """
+    sklearn Pipeline whose final random forest runs on a FlatForest.
+    The preprocessing steps are kept as fitted sklearn transformers, so
+    large batches are transformed once and then follow the forest's
+    max_rows routing.
+    """
+
+    def __init__(self, transformer, forest):
+        self.transformer = transformer
+        self.forest = forest
+
+    @property
+    def classes_(self):
+        return self.forest.classes_
+
+    def _transform(self, X):
+        if self.transformer is None:
+            return X
+        return self.transformer.transform(X)
+
+    def predict(self, X):
+        return self.forest.predict(self._transform(X))
+
+    def predict_proba(self, X):
+        return self.forest.predict_proba(self._transform(X))
+
+    def tree_outputs(self, X):
+        return self.forest.tree_outputs(self._transform(X))
+
+
+def compile_model(model, max_rows=None):
+    """
+    Return a compiled equivalent of a random forest, or of a Pipeline ending
+    in one. Any other model is returned unchanged. With max_rows, the
+    compiled forest keeps the sklearn forest and runs larger batches on it.
+    """
+    if isinstance(model, (RandomForestClassifier, RandomForestRegressor)):
+        try:
+            forest = FlatForest.from_estimator(model)
+        except ValueError:
+            return model
+        if max_rows is not None:
+            forest.estimator = model
+            forest.max_rows = max_rows
+        return forest
+    if isinstance(model, Pipeline):
+        final = model.steps[-1][1]
+        compiled = compile_model(final, max_rows)
+        if compiled is final:
+            return model
+        transformer = Pipeline(model.steps[:-1]) if len(model.steps) > 1 else None
+        return CompiledPipeline(transformer, compiled)
+    return model
+
+
+def tree_predictions(model, X):
+    """
+    Return the per-tree predictions of a random forest regressor (or a
+    Pipeline ending in one, their compiled equivalents, or a vectorized
+    model wrapping either) as an array of
+    shape (n_trees, n_rows, n_outputs), from a single pass over the forest.
+    Returns None for any other model.
+    """
+    if isinstance(model, VectorizedModel):
+        return tree_predictions(model.estimator, model.vectorize(X))
+    if isinstance(model, Pipeline):
+        if len(model.steps) > 1:
+            X = Pipeline(model.steps[:-1]).transform(X)
+        model = model.steps[-1][1]
+    if isinstance(model, (FlatForest, CompiledPipeline)):
+        forest = model if isinstance(model, FlatForest) else model.forest
+        if forest.kind != 'regressor':
+            return None
+        return model.tree_outputs(X)
+    if isinstance(model, RandomForestRegressor):
+        if getattr(model, 'feature_names_in_', None) is not None and hasattr(X, 'columns'):
+            X = X[list(model.feature_names_in_)]
+        # Trees see the same float32 input as RandomForestRegressor.predict
+        X = np.asarray(X, dtype=np.float32)
+        outputs = np.stack([tree.predict(X) for tree in model.estimators_])
+        return outputs.reshape(len(model.estimators_), X.shape[0], -1)
+    return None
+
+
+def tree_mean(outputs):
+    """
+    Average per-tree predictions, summing tree by tree like sklearn so the
+    result is identical to the forest's predict.
+    """
+    total = np.zeros(outputs.shape[1:], dtype=np.float64)
+    for tree_output in outputs:
+        total += tree_output
+    total /= len(outputs)
+    return total
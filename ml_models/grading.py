@@ -0,0 +1,140 @@
+"""
+Grading of stored predictions once their matches are completed.
+
+Predictions are graded with set-based UPDATEs, two per model and prediction
+type, so grading one match and grading a whole season backlog take the
+same handful of queries. Only ungraded rows are touched, and the row counts
+of those UPDATEs are added to each model's GradingTotals, so its running
+accuracy is read from a single row instead of by scanning predictions.
+
+A MATCH_WINNER prediction is correct when its winner_id won the match. A
+PLAYER_STATS prediction is graded on points: it is correct when the actual
+points fall inside its p10-p90 range or, for predictions without
+quantiles, within ML_GRADING_POINTS_TOLERANCE of the predicted points.
+PLAYER_STATS predictions stay ungraded until the player's box score exists.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, FloatField, IntegerField, OuterRef, Q, Subquery
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import Exact, GreaterThanOrEqual, LessThanOrEqual
+from django.utils import timezone
+from ml_models.models import GradingTotals, Prediction
+from stats.models import Match, PlayerStats
+
+
+def gradable_matches(matches=None):
+    """
+    Restrict a Match queryset (all matches by default) to completed matches
+    with a final score.
+    """
+    if matches is None:
+        matches = Match.objects.all()
+    return matches.filter(is_completed=True, home_score__isnull=False, away_score__isnull=False)
+
+
+def match_winner_conditions():
+    """
+    Return (gradable, correct) filters for MATCH_WINNER predictions.
+    """
+    winner_id = Cast(KT('prediction_data__winner_id'), IntegerField())
+    home_won = Q(match__home_score__gt=F('match__away_score'))
+    away_won = Q(match__away_score__gt=F('match__home_score'))
+    correct = (
+        (home_won & Q(Exact(winner_id, F('match__home_team_id'))))
+        | (away_won & Q(Exact(winner_id, F('match__away_team_id'))))
+    )
+    # A tied score has no winner to grade against
+    return home_won | away_won, correct
+
+
+def player_stats_conditions():
+    """
+    Return (gradable, correct) filters for PLAYER_STATS predictions.
+    """
+    box_scores = PlayerStats.objects.filter(player_id=OuterRef('player_id'), match_id=OuterRef('match_id'))
+    actual = Subquery(box_scores.values('points')[:1], output_field=FloatField())
+    predicted = Cast(KT('prediction_data__points'), FloatField())
+    tolerance = getattr(settings, 'ML_GRADING_POINTS_TOLERANCE', 5.0)
+    low = Coalesce(Cast(KT('prediction_data__quantiles__points__p10'), FloatField()), predicted - tolerance)
+    high = Coalesce(Cast(KT('prediction_data__quantiles__points__p90'), FloatField()), predicted + tolerance)
+    correct = Q(GreaterThanOrEqual(actual, low)) & Q(LessThanOrEqual(actual, high))
+    return Q(Exists(box_scores)), correct
+
+
+GRADERS = {
+    'MATCH_WINNER': match_winner_conditions,
+    'PLAYER_STATS': player_stats_conditions,
+}
+
+
+def grade_predictions(matches=None):
+    """
+    Grade every ungraded MATCH_WINNER and PLAYER_STATS prediction for the
+    completed matches in a Match queryset (all matches by default).
+    Returns {model_id: (correct, incorrect)} for the rows graded.
+    """
+    match_ids = gradable_matches(matches).values('id')
+    graded = {}
+    now = timezone.now()
+    with transaction.atomic():
+        for prediction_type, conditions in GRADERS.items():
+            gradable, correct = conditions()
+            pending = Prediction.objects.filter(
+                gradable, prediction_type=prediction_type, match__in=match_ids, was_correct__isnull=True
+            )
+            model_ids = pending.order_by().values_list('model_id', flat=True).distinct()
+            for model_id in list(model_ids):
+                model_pending = pending.filter(model_id=model_id)
+                # Rows graded correct drop out of model_pending before the second UPDATE
+                hits = model_pending.filter(correct).update(was_correct=True, updated_at=now)
+                misses = model_pending.update(was_correct=False, updated_at=now)
+                previous = graded.get(model_id, (0, 0))
+                graded[model_id] = (previous[0] + hits, previous[1] + misses)
+        add_to_totals(graded)
+    return graded
+
+
+def reset_grades(matches=None):
+    """
+    Clear the grades of the predictions for the matches in a Match queryset
+    (all matches by default) and take them back out of the running totals,
+    so they can be graded again. Returns the number of rows reset.
+    """
+    if matches is None:
+        matches = Match.objects.all()
+    graded = Prediction.objects.filter(
+        prediction_type__in=GRADERS, match__in=matches.values('id'), was_correct__isnull=False
+    )
+    removed = {}
+    now = timezone.now()
+    with transaction.atomic():
+        model_ids = graded.order_by().values_list('model_id', flat=True).distinct()
+        for model_id in list(model_ids):
+            model_graded = graded.filter(model_id=model_id)
+            hits = model_graded.filter(was_correct=True).update(was_correct=None, updated_at=now)
+            misses = model_graded.update(was_correct=None, updated_at=now)
+            removed[model_id] = (-hits, -misses)
+        add_to_totals(removed)
+    return sum(-hits - misses for hits, misses in removed.values())
+
+
+def add_to_totals(counts):
+    """
+    Add {model_id: (correct, incorrect)} to the models' GradingTotals.
+    """
+    counts = {model_id: pair for model_id, pair in counts.items() if any(pair)}
+    if not counts:
+        return
+    GradingTotals.objects.bulk_create(
+        [GradingTotals(model_id=model_id) for model_id in counts], ignore_conflicts=True
+    )
+    now = timezone.now()
+    for model_id, (correct, incorrect) in counts.items():
+        GradingTotals.objects.filter(model_id=model_id).update(
+            correct=F('correct') + correct,
+            incorrect=F('incorrect') + incorrect,
+            updated_at=now
+        )
@@ -0,0 +1,135 @@
+"""
+Management command to backfill match outcome predictions over past seasons.
+"""
+
+import datetime
+import multiprocessing
+import os
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models.functions import TruncMonth
+from ml_models.asof import StatsHistory
+from ml_models.models import BackfillCheckpoint, MLModel
+from ml_models.services import ModelService
+from ml_models.writer import get_prediction_writer
+from stats.models import Match
+
+# Per-process state set up once by init_worker
+_worker = {}
+
+
+def init_worker(model_id):
+    """
+    Load the model and the team history once per worker process.
+    """
+    django.setup()
+    model_instance = MLModel.objects.get(pk=model_id)
+    ModelService.load_model(model_instance)
+    _worker['model'] = model_instance
+    _worker['team_history'] = StatsHistory.load('team')
+
+
+def backfill_partition(partition):
+    """
+    Predict every completed match of one (season, month) partition and
+    record its checkpoint once the predictions are written. A partition
+    interrupted before its checkpoint is rerun, and its stored predictions
+    are reused rather than duplicated.
+    """
+    season, month = partition
+    start = month
+    end = (month + datetime.timedelta(days=32)).replace(day=1)
+    matches = list(
+        Match.objects.filter(is_completed=True, season=season, date__gte=start, date__lt=end)
+        .select_related('home_team', 'away_team')
+        .order_by('date', 'id')
+    )
+    predictions, skipped = ModelService.predict_matches_batch(
+        matches, team_history=_worker['team_history'], model_instance=_worker['model']
+    )
+    get_prediction_writer().flush()
+    BackfillCheckpoint.objects.create(
+        model=_worker['model'],
+        partition=partition_key(partition),
+        predictions=len(predictions),
+        skipped=len(skipped)
+    )
+    return partition, len(predictions), len(skipped)
+
+
+def partition_key(partition):
+    season, month = partition
+    return f"{season}/{month.strftime('%Y-%m')}"
+
+
+class Command(BaseCommand):
+    help = 'Backfill match outcome predictions for completed matches, resuming from checkpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, help='MLModel to backfill (default: latest active match outcome model)')
+        parser.add_argument('--season', action='append', help='Only backfill these seasons')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Worker processes; 1 runs in this process',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore existing checkpoints for this model')
+
+    def handle(self, *args, **options):
+        if options['model_id']:
+            try:
+                model_instance = MLModel.objects.get(pk=options['model_id'])
+            except MLModel.DoesNotExist:
+                raise CommandError(f"MLModel {options['model_id']} does not exist")
+        else:
+            model_instance = ModelService.get_model('MATCH_OUTCOME')
+            if not model_instance:
+                raise CommandError('No active match outcome prediction model found')
+
+        if options['restart']:
+            model_instance.backfill_checkpoints.all().delete()
+
+        matches = Match.objects.filter(is_completed=True)
+        if options['season']:
+            matches = matches.filter(season__in=options['season'])
+        partitions = sorted(set(
+            matches.annotate(month=TruncMonth('date')).values_list('season', 'month')
+        ))
+        done = set(model_instance.backfill_checkpoints.values_list('partition', flat=True))
+        pending = [partition for partition in partitions if partition_key(partition) not in done]
+        self.stdout.write(
+            f'Backfilling {model_instance}: {len(pending)} partitions to run, '
+            f'{len(partitions) - len(pending)} already checkpointed'
+        )
+
+        started = time.perf_counter()
+        workers = max(1, min(options['workers'] or 1, len(pending)))
+        if workers == 1:
+            init_worker(model_instance.id)
+            totals = self.report(map(backfill_partition, pending))
+        else:
+            # Workers must open their own database connections
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=init_worker, initargs=(model_instance.id,)) as pool:
+                totals = self.report(pool.imap_unordered(backfill_partition, pending))
+
+        total_predictions, total_skipped = totals
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{total_predictions} predictions ({total_skipped} skipped) in {elapsed:.2f}s '
+            f'({total_predictions / elapsed if elapsed else 0:.0f} predictions/sec) '
+            f'with {workers} worker(s)'
+        )
+        self.stdout.write(self.style.SUCCESS('Successfully backfilled predictions'))
+
+    def report(self, results):
+        """Print each finished partition and return the prediction totals."""
+        total_predictions, total_skipped = 0, 0
+        for partition, predictions, skipped in results:
+            total_predictions += predictions
+            total_skipped += skipped
+            self.stdout.write(f'  {partition_key(partition)}: {predictions} predictions, {skipped} skipped')
+        return total_predictions, total_skipped
@@ -0,0 +1,55 @@
+"""
+Management command to backtest a match outcome model on completed matches.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.backtest import backtest
+from ml_models.models import MLModel
+from ml_models.services import ModelService
+
+
+class Command(BaseCommand):
+    help = 'Backtest a match outcome model and store its accuracy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, help='MLModel to backtest (default: latest active match outcome model)')
+        parser.add_argument('--season-from', help='First season to include, e.g. 2021-22')
+        parser.add_argument('--season-to', help='Last season to include, e.g. 2023-24')
+        parser.add_argument('--no-save', action='store_true', help='Do not write the accuracy to the model')
+
+    def handle(self, *args, **options):
+        if options['model_id']:
+            try:
+                model_instance = MLModel.objects.get(pk=options['model_id'])
+            except MLModel.DoesNotExist:
+                raise CommandError(f"MLModel {options['model_id']} does not exist")
+        else:
+            model_instance = ModelService.get_model('MATCH_OUTCOME')
+            if not model_instance:
+                raise CommandError('No active match outcome prediction model found')
+
+        started = time.perf_counter()
+        try:
+            summary = backtest(
+                model_instance,
+                season_from=options['season_from'],
+                season_to=options['season_to'],
+                save=not options['no_save']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{model_instance}: {summary['matches']} matches "
+            f"({summary['skipped_matches']} without history) in {elapsed:.2f}s"
+        )
+        self.stdout.write(f"  accuracy     {summary['accuracy']:.4f}")
+        self.stdout.write(f"  log-loss     {summary['log_loss']:.4f}")
+        self.stdout.write(f"  Brier score  {summary['brier_score']:.4f}")
+        for team in sorted(summary['teams'], key=lambda team: team['team_name'] or ''):
+            self.stdout.write(
+                f"  {team['team_name']:<30} {team['correct']:>5}/{team['matches']:<5} {team['accuracy']:.4f}"
+            )
+        self.stdout.write(self.style.SUCCESS('Backtest complete'))
@@ -0,0 +1,132 @@
+"""
+Management command to compare sklearn and compiled forest inference latency.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from ml_models.forest import FlatForest, compile_model
+from ml_models.models import MLModel
+from ml_models.services import ModelService
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sklearn against the compiled numpy forest backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, help='Benchmark a registered random forest model or pipeline')
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1, 100, 1000, 10000],
+            help='Batch sizes to benchmark',
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per batch size')
+
+    def handle(self, *args, **options):
+        if options['model_id']:
+            try:
+                model_instance = MLModel.objects.get(pk=options['model_id'])
+            except MLModel.DoesNotExist:
+                raise CommandError(f"MLModel {options['model_id']} does not exist")
+            models = {str(model_instance): ModelService.read_model_file(model_instance.file_path)}
+        else:
+            models = self.sample_models()
+
+        max_rows = getattr(settings, 'ML_INFERENCE_NUMPY_MAX_ROWS', 256)
+        rng = np.random.RandomState(0)
+        for name, model in models.items():
+            if isinstance(model, FlatForest):
+                # A flat artifact has no sklearn forest to compare against
+                self.stdout.write(
+                    f'{name} ({model.n_estimators} trees, {model.n_features_in_} features, already flat)'
+                )
+                predict = model.predict_proba if model.kind == 'classifier' else model.predict
+                for n_rows in options['rows']:
+                    compiled_time = self.time_call(predict, self.sample_input(model, n_rows, rng), options['repeat'])
+                    self.stdout.write(f'  {n_rows:>6} rows: numpy {compiled_time * 1000:9.3f} ms')
+                continue
+
+            compiled = compile_model(model)
+            if compiled is model:
+                raise CommandError(f'{name} is not a random forest or a pipeline ending in one')
+            # What the numpy backend serves: sklearn above max_rows
+            routed = compile_model(model, max_rows)
+            forest = compiled if isinstance(compiled, FlatForest) else compiled.forest
+
+            self.stdout.write(
+                f'{name} ({forest.n_estimators} trees, {model.n_features_in_} features, '
+                f'sklearn above {max_rows} rows)'
+            )
+            for n_rows in options['rows']:
+                X = self.sample_input(model, n_rows, rng)
+                if forest.kind == 'classifier':
+                    sklearn_predict, compiled_predict = model.predict_proba, compiled.predict_proba
+                    routed_predict = routed.predict_proba
+                else:
+                    sklearn_predict, compiled_predict = model.predict, compiled.predict
+                    routed_predict = routed.predict
+
+                if not np.array_equal(sklearn_predict(X), compiled_predict(X)):
+                    raise CommandError(f'Compiled predictions differ from sklearn for {name}')
+
+                sklearn_time = self.time_call(sklearn_predict, X, options['repeat'])
+                compiled_time = self.time_call(compiled_predict, X, options['repeat'])
+                routed_time = self.time_call(routed_predict, X, options['repeat'])
+                self.stdout.write(
+                    f'  {n_rows:>6} rows: sklearn {sklearn_time * 1000:9.3f} ms, '
+                    f'numpy {compiled_time * 1000:9.3f} ms, '
+                    f'backend {routed_time * 1000:9.3f} ms, '
+                    f'speedup {sklearn_time / routed_time:6.2f}x'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def sample_input(self, model, n_rows, rng):
+        """
+        Random rows in the shape a model was fitted on: an array, or a frame
+        with its column names and one-hot encoded columns drawn from the
+        encoder's categories.
+        """
+        names = getattr(model, 'feature_names_in_', None)
+        if names is None:
+            return rng.normal(size=(n_rows, model.n_features_in_))
+        X = pd.DataFrame(rng.normal(size=(n_rows, len(names))), columns=list(names))
+        if isinstance(model, Pipeline) and isinstance(model.steps[0][1], ColumnTransformer):
+            for _, step, columns in model.steps[0][1].transformers_:
+                if isinstance(step, OneHotEncoder):
+                    for column, categories in zip(columns, step.categories_):
+                        X[column] = rng.choice(categories, n_rows)
+        return X
+
+    def time_call(self, func, X, repeat):
+        """Return the best wall-clock time of several calls."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(X)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def sample_models(self):
+        """Train forests shaped like the ones in sample_model.py."""
+        rng = np.random.RandomState(42)
+        X_player = rng.normal(size=(800, 15))
+        y_player = X_player[:, 5:10] + rng.normal(scale=0.5, size=(800, 5))
+        X_match = rng.normal(size=(800, 12))
+        y_match = (X_match[:, 2] - X_match[:, 7] + rng.normal(size=800) > 0).astype(int)
+        return {
+            'Player performance regressor': RandomForestRegressor(
+                n_estimators=100, random_state=42
+            ).fit(X_player, y_player),
+            'Match outcome classifier': RandomForestClassifier(
+                n_estimators=100, random_state=42
+            ).fit(X_match, y_match),
+        }
@@ -0,0 +1,77 @@
+"""
+Management command to convert a pickled model into a flat forest or joblib artifact.
+"""
+
+import os
+import joblib
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.forest import CompiledPipeline, FlatForest
+from ml_models.models import MLModel
+from ml_models.schema import VectorizedModel
+from ml_models.services import ModelService
+
+
+def source_estimator(model):
+    """
+    Return the estimator to write out from a model artifact. Artifacts
+    written with the serving wrappers by earlier conversions are unwrapped:
+    a vectorized model gets back the column names its schema matched, and
+    a compiled pipeline without preprocessing is its forest.
+    """
+    if isinstance(model, VectorizedModel):
+        columns = model.schema.columns
+        if not all(isinstance(column, str) for column in columns):
+            raise CommandError("Artifact holds a vectorized pipeline whose one-hot encoding cannot be restored")
+        model = model.estimator
+        model.feature_names_in_ = np.asarray(columns, dtype=object)
+    if isinstance(model, CompiledPipeline):
+        if model.transformer is not None:
+            raise CommandError("Artifact holds a compiled pipeline whose preprocessing cannot be restored")
+        model = model.forest
+    return model
+
+
+class Command(BaseCommand):
+    help = 'Convert a model artifact into a flat forest that worker processes memory-map, or a joblib file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_id', type=int, help='ID of the MLModel to convert')
+        parser.add_argument(
+            '--format',
+            choices=['flat', 'joblib'],
+            default='flat',
+            help='flat: memory-mapped .npy tree arrays (random forests only); '
+                 'joblib: uncompressed joblib dump, loaded into each process',
+        )
+        parser.add_argument('--output', help='Path of the new artifact')
+
+    def handle(self, *args, **options):
+        try:
+            model_instance = MLModel.objects.get(pk=options['model_id'])
+        except MLModel.DoesNotExist:
+            raise CommandError(f"MLModel {options['model_id']} does not exist")
+
+        # The raw estimator, not the registry's vectorized or compiled copy
+        model = source_estimator(ModelService.read_model_file(model_instance.file_path))
+        stem = os.path.splitext(model_instance.file_path)[0]
+
+        if options['format'] == 'flat':
+            output = options['output'] or f'{stem}.forest'
+            try:
+                FlatForest.from_estimator(model).save(output)
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            output = options['output'] or f'{stem}.joblib'
+            joblib.dump(model, output)
+
+        model_instance.file_path = output
+        try:
+            model_instance.full_clean()
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
+        model_instance.save()
+
+        self.stdout.write(self.style.SUCCESS(f'Converted {model_instance} to {output}'))
@@ -0,0 +1,43 @@
+"""
+Management command to grade stored predictions for completed matches.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from ml_models.grading import grade_predictions, reset_grades
+from ml_models.models import GradingTotals
+from stats.models import Match
+
+
+class Command(BaseCommand):
+    help = 'Grade pending match winner and player stats predictions for completed matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', action='append', help='Only grade these seasons')
+        parser.add_argument('--match-id', type=int, action='append', help='Only grade these matches')
+        parser.add_argument('--regrade', action='store_true', help='Clear existing grades first and grade them again')
+
+    def handle(self, *args, **options):
+        matches = Match.objects.all()
+        if options['season']:
+            matches = matches.filter(season__in=options['season'])
+        if options['match_id']:
+            matches = matches.filter(pk__in=options['match_id'])
+
+        started = time.perf_counter()
+        if options['regrade']:
+            reset = reset_grades(matches)
+            self.stdout.write(f'Cleared {reset} existing grades')
+        graded = grade_predictions(matches)
+        elapsed = time.perf_counter() - started
+
+        total = sum(correct + incorrect for correct, incorrect in graded.values())
+        self.stdout.write(f'Graded {total} predictions in {elapsed:.2f}s')
+        totals = GradingTotals.objects.filter(model_id__in=graded).select_related('model')
+        for model_totals in totals.order_by('model__name', 'model__version'):
+            correct, incorrect = graded[model_totals.model_id]
+            self.stdout.write(
+                f'  {model_totals.model}: +{correct} correct, +{incorrect} incorrect, '
+                f'running accuracy {model_totals.accuracy:.4f} over {model_totals.graded}'
+            )
+        self.stdout.write(self.style.SUCCESS('Successfully graded predictions'))
@@ -0,0 +1,69 @@
+"""
+Management command to report per-stage timings of prediction calls.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.models import InferenceTiming, MLModel
+from ml_models.timing import STAGES, histogram_quantile
+
+
+def format_ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.2f}'
+
+
+class Command(BaseCommand):
+    help = 'Show latency histograms and row counts per model, operation and prediction stage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, action='append', help='Only report these models')
+        parser.add_argument('--operation', help='Only report this ModelService operation, e.g. predict_match_outcome')
+        parser.add_argument('--reset', action='store_true', help='Delete the reported timings afterwards')
+
+    def handle(self, *args, **options):
+        timings = InferenceTiming.objects.select_related('model')
+        if options['model_id']:
+            missing = set(options['model_id']) - set(
+                MLModel.objects.filter(pk__in=options['model_id']).values_list('id', flat=True)
+            )
+            if missing:
+                raise CommandError(f"MLModel {', '.join(map(str, sorted(missing)))} does not exist")
+            timings = timings.filter(model_id__in=options['model_id'])
+        if options['operation']:
+            timings = timings.filter(operation=options['operation'])
+
+        stage_order = {stage: index for index, stage in enumerate(STAGES)}
+        rows = sorted(timings, key=lambda row: (
+            row.model.name, row.model.version, row.operation, stage_order.get(row.stage, len(stage_order))
+        ))
+        if not rows:
+            self.stdout.write('No timings recorded (is ML_TIMING_ENABLED set?)')
+            return
+
+        # Stage times as a share of the operation's total time show where calls spend it
+        totals = {
+            (row.model_id, row.operation): row.total_seconds for row in rows if row.stage == 'total'
+        }
+        current = None
+        for row in rows:
+            if (row.model_id, row.operation) != current:
+                current = (row.model_id, row.operation)
+                self.stdout.write(f'{row.model} {row.operation}')
+                self.stdout.write(
+                    f"  {'stage':<18}{'calls':>8}{'rows':>10}{'mean ms':>10}{'p50 ms':>10}"
+                    f"{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'share':>8}"
+                )
+            total = totals.get(current)
+            share = f'{row.total_seconds / total:.1%}' if total else '-'
+            self.stdout.write(
+                f'  {row.stage:<18}{row.calls:>8}{row.rows:>10}'
+                f'{format_ms(row.mean_seconds):>10}'
+                f'{format_ms(histogram_quantile(row.buckets, 0.5, row.max_seconds)):>10}'
+                f'{format_ms(histogram_quantile(row.buckets, 0.9, row.max_seconds)):>10}'
+                f'{format_ms(histogram_quantile(row.buckets, 0.99, row.max_seconds)):>10}'
+                f'{format_ms(row.max_seconds):>10}{share:>8}'
+            )
+
+        if options['reset']:
+            deleted, _ = InferenceTiming.objects.filter(pk__in=[row.pk for row in rows]).delete()
+            self.stdout.write(f'Deleted {deleted} timing rows')
+        self.stdout.write(self.style.SUCCESS('Successfully reported inference timings'))
@@ -0,0 +1,100 @@
+"""
+Management command to precompute predictions for upcoming matches.
+"""
+
+import datetime
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from ml_models.asof import StatsHistory
+from ml_models.services import ModelService
+from ml_models.writer import get_prediction_writer
+from stats.models import Match, Player
+
+
+class Command(BaseCommand):
+    help = 'Precompute outcome and roster predictions for upcoming matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=datetime.date.fromisoformat,
+            help='First day of the slate as YYYY-MM-DD (default: today)',
+        )
+        parser.add_argument('--days', type=int, default=7, help='Number of days in the slate')
+        parser.add_argument('--model-version', help='Match outcome model version (default: latest active)')
+        parser.add_argument('--player-model-version', help='Player performance model version (default: latest active)')
+        parser.add_argument('--skip-players', action='store_true', help='Only predict match outcomes')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per model call')
+
+    def handle(self, *args, **options):
+        start_date = options['start'] or timezone.localdate()
+        start = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        end = start + datetime.timedelta(days=options['days'])
+        batch_size = options['batch_size']
+
+        matches = list(
+            Match.objects.filter(is_completed=False, date__gte=start, date__lt=end)
+            .select_related('home_team', 'away_team')
+            .order_by('date', 'id')
+        )
+        self.stdout.write(f'Predicting {len(matches)} matches from {start_date} to {end.date()}...')
+        if not matches:
+            self.stdout.write(self.style.SUCCESS('No upcoming matches to predict'))
+            return
+
+        started = time.perf_counter()
+        team_history = StatsHistory.load('team')
+
+        try:
+            match_rows, skipped_matches = 0, 0
+            for offset in range(0, len(matches), batch_size):
+                predictions, skipped = ModelService.predict_matches_batch(
+                    matches[offset:offset + batch_size],
+                    options['model_version'],
+                    team_history=team_history
+                )
+                match_rows += len(predictions)
+                skipped_matches += len(skipped)
+
+            player_rows, skipped_players = 0, 0
+            if not options['skip_players']:
+                pairs = self.roster_pairs(matches)
+                player_history = StatsHistory.load(
+                    'player', entity_ids={player.id for player, _ in pairs}
+                )
+                for offset in range(0, len(pairs), batch_size):
+                    predictions, skipped = ModelService.predict_player_matches_batch(
+                        pairs[offset:offset + batch_size],
+                        options['player_model_version'],
+                        player_history=player_history,
+                        team_history=team_history
+                    )
+                    player_rows += len(predictions)
+                    skipped_players += len(skipped)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        get_prediction_writer().flush()
+        elapsed = time.perf_counter() - started
+        rows = match_rows + player_rows
+        self.stdout.write(
+            f'{match_rows} match predictions ({skipped_matches} skipped), '
+            f'{player_rows} player predictions ({skipped_players} skipped)'
+        )
+        self.stdout.write(f'{rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/sec)')
+        self.stdout.write(self.style.SUCCESS('Successfully precomputed slate predictions'))
+
+    def roster_pairs(self, matches):
+        """Pair every active player with each upcoming match of their team."""
+        team_ids = {match.home_team_id for match in matches} | {match.away_team_id for match in matches}
+        rosters = defaultdict(list)
+        players = Player.objects.filter(team_id__in=team_ids, is_active=True).order_by('team', 'last_name', 'first_name')
+        for player in players:
+            rosters[player.team_id].append(player)
+        return [
+            (player, match)
+            for match in matches
+            for player in rosters[match.home_team_id] + rosters[match.away_team_id]
+        ]
@@ -0,0 +1,51 @@
+"""
+Management command to roll up and delete old superseded predictions.
+"""
+
+import datetime
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from ml_models.retention import prune_predictions
+
+
+class Command(BaseCommand):
+    help = 'Roll old superseded predictions into daily rollups and delete them in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Prune predictions older than this many days (default: ML_PREDICTION_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Predictions deleted per transaction (default: ML_PREDICTION_RETENTION_BATCH_SIZE)'
+        )
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the predictions that would be pruned')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'ML_PREDICTION_RETENTION_DAYS', 30)
+        if days < 0:
+            raise CommandError('--days must not be negative')
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        before = timezone.now() - datetime.timedelta(days=days)
+
+        started = time.perf_counter()
+        pruned = prune_predictions(
+            before=before,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run']
+        )
+        elapsed = time.perf_counter() - started
+
+        if options['dry_run']:
+            self.stdout.write(f'{pruned} predictions older than {days} days would be pruned')
+            return
+        self.stdout.write(f'Pruned {pruned} predictions older than {days} days in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Successfully pruned predictions'))
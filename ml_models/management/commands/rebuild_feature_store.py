@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the materialized player and team features.
+"""
+
+from django.core.management.base import BaseCommand
+from ml_models import feature_store
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the rolling feature snapshots from box score history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=sorted(feature_store.STORES),
+            action='append',
+            help='Only rebuild player or team features (default: both)',
+        )
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or sorted(feature_store.STORES):
+            self.stdout.write(f'Rebuilding {kind} features...')
+            written = feature_store.rebuild_features(kind)
+            self.stdout.write(f'Wrote {written} {kind} feature snapshots')
+
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt feature store'))
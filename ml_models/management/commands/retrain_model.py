@@ -0,0 +1,69 @@
+"""
+Management command to retrain a model incrementally on games played since it was trained.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.models import MLModel
+from ml_models.training import retrain_model
+
+
+class Command(BaseCommand):
+    help = 'Add trees fitted on new games to a trained model and register the result as a new version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_id', type=int, help='MLModel to start from')
+        parser.add_argument('--new-trees', type=int, default=20, help='Trees to fit on the new games')
+        parser.add_argument('--max-trees', type=int, help='Drop the oldest trees beyond this many')
+        parser.add_argument(
+            '--holdout',
+            type=float,
+            default=0.2,
+            help='Fraction of the most recent new examples kept out of training to score the model',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also refit a forest from scratch on all games and report both on the same holdout',
+        )
+        parser.add_argument('--model-version', help='Version to register (default: next major version)')
+        parser.add_argument('--activate', action='store_true', help='Make the new version the active one')
+        parser.add_argument('--output-dir', default='ml_models/models', help='Directory to save the artifact in')
+
+    def handle(self, *args, **options):
+        try:
+            base_instance = MLModel.objects.get(pk=options['model_id'])
+        except MLModel.DoesNotExist:
+            raise CommandError(f"MLModel {options['model_id']} does not exist")
+        if options['new_trees'] < 1:
+            raise CommandError('--new-trees must be at least 1')
+
+        try:
+            model_instance, metrics = retrain_model(
+                base_instance,
+                new_trees=options['new_trees'],
+                max_trees=options['max_trees'],
+                holdout=options['holdout'],
+                version=options['model_version'],
+                activate=options['activate'],
+                compare=options['compare'],
+                models_dir=options['output_dir']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        full_refit = metrics.pop('full_refit', None)
+        self.stdout.write(
+            f"{model_instance}: {metrics['trees']} trees, {metrics['training_examples']} new examples "
+            f"fitted in {metrics['training_seconds']:.2f}s, saved to {model_instance.file_path}"
+        )
+        if full_refit is None:
+            for metric, value in metrics.items():
+                self.stdout.write(f'  {metric}: {value}')
+        else:
+            self.stdout.write(f"  {'metric':<20} {'warm start':>12} {'full refit':>12}")
+            for metric, value in metrics.items():
+                if metric in full_refit:
+                    self.stdout.write(f'  {metric:<20} {value:>12.4g} {full_refit[metric]:>12.4g}')
+            speedup = full_refit['training_seconds'] / max(metrics['training_seconds'], 1e-9)
+            self.stdout.write(f'  warm start trained {speedup:.1f}x faster than a full refit')
+        self.stdout.write(self.style.SUCCESS('Successfully retrained model'))
@@ -0,0 +1,69 @@
+"""
+Management command to train prediction models on stored box scores.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.features import SEASON
+from ml_models.training import MODEL_NAMES, train_model
+
+
+def parse_window(value):
+    return value if value == SEASON else int(value)
+
+
+class Command(BaseCommand):
+    help = 'Train player performance and match outcome models and register them as new versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model-type',
+            action='append',
+            choices=list(MODEL_NAMES),
+            help='Model types to train (default: all)',
+        )
+        parser.add_argument('--season', action='append', help='Only train on these seasons')
+        parser.add_argument(
+            '--window',
+            action='append',
+            type=parse_window,
+            help='Extra rolling window to add features for, e.g. 3 or season',
+        )
+        parser.add_argument('--n-estimators', type=int, default=100, help='Trees per forest')
+        parser.add_argument(
+            '--holdout',
+            type=float,
+            default=0.2,
+            help='Fraction of the most recent examples kept out of training to score the model',
+        )
+        parser.add_argument('--model-version', help='Version to register (default: next major version)')
+        parser.add_argument('--activate', action='store_true', help='Make the new models the active ones')
+        parser.add_argument('--output-dir', default='ml_models/models', help='Directory to save artifacts in')
+
+    def handle(self, *args, **options):
+        for model_type in options['model_type'] or list(MODEL_NAMES):
+            started = time.perf_counter()
+            try:
+                model_instance, metrics = train_model(
+                    model_type,
+                    seasons=options['season'],
+                    windows=options['window'],
+                    n_estimators=options['n_estimators'],
+                    holdout=options['holdout'],
+                    version=options['model_version'],
+                    activate=options['activate'],
+                    models_dir=options['output_dir']
+                )
+            except ValueError as e:
+                raise CommandError(f'{model_type}: {e}')
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{model_instance} ({model_type}): {metrics['training_examples']} of "
+                f"{metrics['examples']} examples used for training in {elapsed:.2f}s, "
+                f"saved to {model_instance.file_path}"
+            )
+            for metric, value in metrics.items():
+                if metric not in ('examples', 'training_examples'):
+                    self.stdout.write(f'  {metric}: {value}')
+        self.stdout.write(self.style.SUCCESS('Successfully trained models'))
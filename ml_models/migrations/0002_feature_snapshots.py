@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+        ('ml_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamFeatureSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('window', models.IntegerField()),
+                ('games', models.IntegerField()),
+                ('avg_points', models.FloatField()),
+                ('avg_rebounds', models.FloatField()),
+                ('avg_assists', models.FloatField()),
+                ('avg_steals', models.FloatField()),
+                ('avg_blocks', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='team_feature_snapshots', to='stats.match')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feature_snapshots', to='stats.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['team', 'window', 'as_of'], name='ml_models_t_team_id_a85eb5_idx')],
+                'unique_together': {('team', 'match', 'window')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerFeatureSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('window', models.IntegerField()),
+                ('games', models.IntegerField()),
+                ('avg_points', models.FloatField()),
+                ('avg_assists', models.FloatField()),
+                ('avg_rebounds', models.FloatField()),
+                ('avg_steals', models.FloatField()),
+                ('avg_blocks', models.FloatField()),
+                ('avg_minutes', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='player_feature_snapshots', to='stats.match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feature_snapshots', to='stats.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['player', 'window', 'as_of'], name='ml_models_p_player__7be15d_idx')],
+                'unique_together': {('player', 'match', 'window')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0002_feature_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='feature_windows',
+            field=models.JSONField(blank=True, default=list, help_text='Extra rolling windows to build features for, e.g. [3, 5, 10, "season"]'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0003_mlmodel_feature_windows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='feature_hash',
+            field=models.CharField(blank=True, help_text='Hash of the feature values the prediction was made from', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['model', 'feature_hash'], name='ml_models_p_model_i_7c9ccd_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0004_prediction_feature_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('partition', models.CharField(max_length=50)),
+                ('predictions', models.IntegerField()),
+                ('skipped', models.IntegerField()),
+                ('completed_at', models.DateTimeField(auto_now_add=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backfill_checkpoints', to='ml_models.mlmodel')),
+            ],
+            options={
+                'unique_together': {('model', 'partition')},
+            },
+        ),
+    ]
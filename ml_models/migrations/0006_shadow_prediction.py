@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0005_backfill_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prediction_data', models.JSONField()),
+                ('confidence', models.FloatField()),
+                ('latency_ms', models.FloatField(help_text='Inference time of the candidate model')),
+                ('primary_latency_ms', models.FloatField(help_text='Inference time of the model that served the prediction')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_predictions', to='ml_models.mlmodel')),
+                ('prediction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_predictions', to='ml_models.prediction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'created_at'], name='ml_models_s_model_i_6bb58b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0006_shadow_prediction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correct', models.IntegerField(default=0)),
+                ('incorrect', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grading_totals', to='ml_models.mlmodel')),
+            ],
+            options={
+                'verbose_name_plural': 'Grading totals',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0007_grading_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='trained_until',
+            field=models.DateTimeField(blank=True, help_text='Date of the latest match the model was trained on', null=True),
+        ),
+    ]
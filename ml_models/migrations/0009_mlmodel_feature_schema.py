@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0008_mlmodel_trained_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='feature_schema',
+            field=models.JSONField(blank=True, editable=False, help_text='Input columns compiled from the model file when the model is registered', null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0009_mlmodel_feature_schema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InferenceTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(max_length=50)),
+                ('stage', models.CharField(max_length=50)),
+                ('calls', models.BigIntegerField(default=0)),
+                ('rows', models.BigIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('max_seconds', models.FloatField(default=0)),
+                ('buckets', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inference_timings', to='ml_models.mlmodel')),
+            ],
+            options={
+                'unique_together': {('model', 'operation', 'stage')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0010_inference_timing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prediction_type', models.CharField(choices=[('PLAYER_STATS', 'Player Statistics'), ('MATCH_WINNER', 'Match Winner'), ('SCORE', 'Score Prediction'), ('PLAYER_COMPARISON', 'Player Comparison')], max_length=50)),
+                ('day', models.DateField()),
+                ('predictions', models.IntegerField(default=0)),
+                ('graded', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_rollups', to='ml_models.mlmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'day'], name='ml_models_p_model_i_aee27e_idx')],
+                'unique_together': {('model', 'prediction_type', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0011_prediction_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['model', 'prediction_type', 'match', 'player', 'created_at'], name='ml_models_p_model_i_232012_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from ml_models.features import validate_windows
 from stats.models import Team, Player, Match
 
 
@@ -20,6 +22,22 @@ class MLModel(models.Model):
     file_path = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     accuracy = models.FloatField(null=True, blank=True)
+    feature_windows = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Extra rolling windows to build features for, e.g. [3, 5, 10, \"season\"]"
+    )
+    trained_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date of the latest match the model was trained on'
+    )
+    feature_schema = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Input columns compiled from the model file when the model is registered'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -34,6 +52,26 @@ class MLModel(models.Model):
     def __str__(self):
         return f"{self.name} v{self.version}"
 
+    def clean(self):
+        try:
+            validate_windows(self.feature_windows or [])
+        except ValueError as e:
+            raise ValidationError({'feature_windows': str(e)})
+        # Imported here since the service layer imports these models
+        from ml_models.services import ModelService
+        try:
+            self.feature_schema = ModelService.compile_feature_schema(self)
+        except ValueError as e:
+            raise ValidationError({'file_path': str(e)})
+        # Saving right after cleaning does not compile the schema again
+        self._schema_inputs = self.schema_inputs()
+
+    def schema_inputs(self):
+        """
+        Return the fields the feature schema is compiled from.
+        """
+        return self.file_path, self.model_type, list(self.feature_windows or [])
+
 
 class Prediction(models.Model):
     """
@@ -54,6 +92,7 @@ class Prediction(models.Model):
     prediction_data = models.JSONField()
     confidence = models.FloatField()
     was_correct = models.BooleanField(null=True, blank=True)
+    feature_hash = models.CharField(max_length=64, blank=True, help_text='Hash of the feature values the prediction was made from')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -64,6 +103,8 @@ class Prediction(models.Model):
             models.Index(fields=['player']),
             models.Index(fields=['team']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['model', 'feature_hash']),
+            models.Index(fields=['model', 'prediction_type', 'match', 'player', 'created_at']),
         ]
 
     def __str__(self):
@@ -96,3 +137,191 @@ class ModelFeature(models.Model):
 
     def __str__(self):
         return f"{self.name} (for {self.model})"
+
+
+class PlayerFeatureSnapshot(models.Model):
+    """
+    Rolling player averages as of a match, maintained by the feature store.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='feature_snapshots')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='player_feature_snapshots')
+    as_of = models.DateTimeField()
+    window = models.IntegerField()
+    games = models.IntegerField()
+    avg_points = models.FloatField()
+    avg_assists = models.FloatField()
+    avg_rebounds = models.FloatField()
+    avg_steals = models.FloatField()
+    avg_blocks = models.FloatField()
+    avg_minutes = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', 'window', 'as_of']),
+        ]
+        unique_together = ('player', 'match', 'window')
+
+    def __str__(self):
+        return f"{self.player} last {self.window} as of {self.as_of.strftime('%Y-%m-%d')}"
+
+
+class TeamFeatureSnapshot(models.Model):
+    """
+    Rolling team averages as of a match, maintained by the feature store.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='feature_snapshots')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='team_feature_snapshots')
+    as_of = models.DateTimeField()
+    window = models.IntegerField()
+    games = models.IntegerField()
+    avg_points = models.FloatField()
+    avg_rebounds = models.FloatField()
+    avg_assists = models.FloatField()
+    avg_steals = models.FloatField()
+    avg_blocks = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['team', 'window', 'as_of']),
+        ]
+        unique_together = ('team', 'match', 'window')
+
+    def __str__(self):
+        return f"{self.team} last {self.window} as of {self.as_of.strftime('%Y-%m-%d')}"
+
+
+class BackfillCheckpoint(models.Model):
+    """
+    A partition of historical matches whose predictions have been backfilled
+    for a model, so an interrupted backfill can resume where it stopped.
+    """
+    model = models.ForeignKey(MLModel, on_delete=models.CASCADE, related_name='backfill_checkpoints')
+    partition = models.CharField(max_length=50)
+    predictions = models.IntegerField()
+    skipped = models.IntegerField()
+    completed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('model', 'partition')
+
+    def __str__(self):
+        return f"{self.model} backfill of {self.partition}"
+
+
+class ShadowPrediction(models.Model):
+    """
+    Output of a candidate model run in the background on the same features
+    as a served prediction, used to compare model versions on live traffic.
+    """
+    prediction = models.ForeignKey(Prediction, on_delete=models.CASCADE, related_name='shadow_predictions')
+    model = models.ForeignKey(MLModel, on_delete=models.CASCADE, related_name='shadow_predictions')
+    prediction_data = models.JSONField()
+    confidence = models.FloatField()
+    latency_ms = models.FloatField(help_text='Inference time of the candidate model')
+    primary_latency_ms = models.FloatField(help_text='Inference time of the model that served the prediction')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} shadow of {self.prediction}"
+
+
+class GradingTotals(models.Model):
+    """
+    Running counts of a model's graded predictions, kept up to date by
+    ml_models.grading so accuracy can be read without scanning predictions.
+    """
+    model = models.OneToOneField(MLModel, on_delete=models.CASCADE, related_name='grading_totals')
+    correct = models.IntegerField(default=0)
+    incorrect = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Grading totals'
+
+    def __str__(self):
+        return f"{self.model} grading totals"
+
+    @property
+    def graded(self):
+        return self.correct + self.incorrect
+
+    @property
+    def accuracy(self):
+        return self.correct / self.graded if self.graded else None
+
+
+class InferenceTiming(models.Model):
+    """
+    Aggregated durations of one stage of a ModelService operation for a
+    model, written by ml_models.timing. `buckets` holds call counts per
+    latency bucket, with bounds in ml_models.timing.BUCKETS.
+    """
+    model = models.ForeignKey(MLModel, on_delete=models.CASCADE, related_name='inference_timings')
+    operation = models.CharField(max_length=50)
+    stage = models.CharField(max_length=50)
+    calls = models.BigIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    max_seconds = models.FloatField(default=0)
+    buckets = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('model', 'operation', 'stage')
+
+    def __str__(self):
+        return f"{self.model} {self.operation} {self.stage} timings"
+
+    def add(self, times):
+        """
+        Add aggregated StageTimes to the row.
+        """
+        self.calls += times.calls
+        self.rows += times.rows
+        self.total_seconds += times.total_seconds
+        self.max_seconds = max(self.max_seconds, times.max_seconds)
+        buckets = self.buckets or [0] * len(times.buckets)
+        self.buckets = [a + b for a, b in zip(buckets, times.buckets)]
+
+    @property
+    def mean_seconds(self):
+        return self.total_seconds / self.calls if self.calls else None
+
+
+class PredictionRollup(models.Model):
+    """
+    Daily counts of a model's predictions that were pruned by
+    ml_models.retention, so history survives deleting the rows.
+    """
+    model = models.ForeignKey(MLModel, on_delete=models.CASCADE, related_name='prediction_rollups')
+    prediction_type = models.CharField(max_length=50, choices=Prediction.PREDICTION_TYPES)
+    day = models.DateField()
+    predictions = models.IntegerField(default=0)
+    graded = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    confidence_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'day']),
+        ]
+        unique_together = ('model', 'prediction_type', 'day')
+
+    def __str__(self):
+        return f"{self.model} {self.prediction_type} predictions on {self.day}"
+
+    @property
+    def accuracy(self):
+        return self.correct / self.graded if self.graded else None
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.predictions if self.predictions else None
@@ -0,0 +1,150 @@
+"""
+Cache of predictions keyed by model, entities and feature values.
+
+A prediction is reused when the same model is asked about the same match
+and player again and the features are unchanged. Entries are found first in
+Django's cache and then through Prediction.feature_hash, so a repeated
+request neither reruns the model nor stores a duplicate row. Every cache key
+also carries a version number per player and team; the version is bumped when
+new box scores arrive for that entity, which retires its cached entries.
+Predictions still waiting in the write-behind buffer have no primary key
+and are not cached; once written, they are found through feature_hash.
+"""
+
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from ml_models.models import Prediction
+
+CACHE_PREFIX = 'ml_prediction'
+LOOKUP_CHUNK_SIZE = 500
+
+
+def feature_hash(features):
+    """
+    Return a stable hash of a feature dictionary.
+    """
+    encoded = json.dumps(features, sort_keys=True, default=_plain_value)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _plain_value(value):
+    # NumPy scalars hash like the Python numbers they hold
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _version_key(kind, entity_id):
+    return f'{CACHE_PREFIX}:version:{kind}:{entity_id}'
+
+
+def entity_versions(kind, entity_ids):
+    """
+    Return the current cache version of each player or team.
+    """
+    keys = {_version_key(kind, entity_id): entity_id for entity_id in entity_ids}
+    found = cache.get_many(keys)
+    return {entity_id: found.get(key, 0) for key, entity_id in keys.items()}
+
+
+def invalidate_entity(kind, entity_id):
+    """
+    Retire every cached prediction that involves a player or team.
+    """
+    key = _version_key(kind, entity_id)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, timeout=None)
+
+
+def cache_key(model_instance, prediction_type, hashed, match_id=None, player_ids=(), team_ids=()):
+    """
+    Build the cache key of one prediction.
+    """
+    player_versions = entity_versions('player', player_ids)
+    team_versions = entity_versions('team', team_ids)
+    parts = [
+        prediction_type,
+        match_id,
+        sorted(player_versions.items()),
+        sorted(team_versions.items()),
+        hashed,
+    ]
+    digest = hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+    return f'{CACHE_PREFIX}:{model_instance.id}:{digest}'
+
+
+def get_prediction(key, model_instance, prediction_type, hashed, match=None, player=None):
+    """
+    Return the stored prediction for these inputs, or None.
+    """
+    prediction = cache.get(key)
+    if prediction is not None:
+        return prediction
+    
+    prediction = Prediction.objects.filter(
+        model=model_instance,
+        prediction_type=prediction_type,
+        feature_hash=hashed,
+        match=match,
+        player=player
+    ).order_by('-created_at').first()
+    if prediction is not None:
+        set_prediction(key, prediction)
+    return prediction
+
+
+def set_prediction(key, prediction):
+    """
+    Remember a stored prediction under its cache key.
+    """
+    if prediction.pk is None:
+        return
+    cache.set(key, prediction, timeout=getattr(settings, 'ML_PREDICTION_CACHE_TIMEOUT', 3600))
+
+
+def get_predictions(model_instance, prediction_type, lookups):
+    """
+    Look up many predictions at once. `lookups` maps cache keys to
+    (match_id, player_id, feature_hash) entries. Returns {cache key:
+    prediction} for those found in the cache or, with one query per
+    LOOKUP_CHUNK_SIZE hashes, among the stored predictions.
+    """
+    found = cache.get_many(list(lookups))
+    missing = {entry: key for key, entry in lookups.items() if key not in found}
+    if missing:
+        stored = {
+            missing[entry]: prediction
+            for entry, prediction in find_predictions(model_instance, prediction_type, missing).items()
+        }
+        if stored:
+            cache.set_many(stored, timeout=getattr(settings, 'ML_PREDICTION_CACHE_TIMEOUT', 3600))
+        found.update(stored)
+    return found
+
+
+def find_predictions(model_instance, prediction_type, entries):
+    """
+    Look up stored predictions for many (match_id, player_id, feature_hash)
+    entries at once. Returns {entry: prediction} for the entries found.
+    """
+    entries = set(entries)
+    hashes = sorted({hashed for _, _, hashed in entries})
+    found = {}
+    for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+        predictions = Prediction.objects.filter(
+            model=model_instance,
+            prediction_type=prediction_type,
+            feature_hash__in=hashes[start:start + LOOKUP_CHUNK_SIZE]
+        ).select_related('match', 'player', 'team').order_by('created_at')
+        for prediction in predictions:
+            entry = (prediction.match_id, prediction.player_id, prediction.feature_hash)
+            if entry in entries:
+                # Later rows win, as in get_prediction
+                found[entry] = prediction
+    return found
@@ -0,0 +1,313 @@
+import logging
+import mmap
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+from sklearn.tree._tree import Tree
+
+logger = logging.getLogger(__name__)
+
+# Objects shared with the rest of the process rather than held by a model
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def is_memory_mapped(array):
+    """
+    Return True if a NumPy array's data is a memory-mapped file.
+    """
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def resident_size(model):
+    """
+    Estimate the memory a loaded model holds: the bytes of its NumPy
+    arrays, except memory-mapped ones whose pages live in the shared page
+    cache, plus the shallow size of every other object reachable from it.
+    sklearn trees keep their nodes outside Python objects and are measured
+    through their pickled state.
+    """
+    seen = set()
+    # Keep temporary tree states alive so their ids are not reused
+    states = []
+    pending = [model]
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            if not is_memory_mapped(obj):
+                total += obj.nbytes
+            continue
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif isinstance(obj, Tree):
+            states.append(obj.__getstate__())
+            pending.append(states[-1])
+        elif hasattr(obj, '__dict__'):
+            pending.append(obj.__dict__)
+    return total
+
+
+class ModelRegistry:
+    """
+    Per-process registry of loaded ML model artifacts.
+
+    Entries are keyed by MLModel id and validated against the artifact's
+    modification time and size, so a replaced file is reloaded on the next
+    request. The registry is bounded by the resident_size() of the loaded
+    models, which leaves out memory-mapped arrays, and evicts the least
+    recently used models first. Only one thread loads a given artifact at a
+    time; concurrent callers wait for it instead of unpickling the same file
+    in parallel.
+    """
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, 'ML_MODEL_REGISTRY_MAX_BYTES', self.DEFAULT_MAX_BYTES)
+
+    @staticmethod
+    def file_signature(file_path):
+        """
+        Return the (path, mtime, size) signature used to detect changed
+        artifacts. The path is included so repointing a model at a copy
+        with the same mtime and size still reloads it.
+        """
+        try:
+            if os.path.isdir(file_path):
+                # Directory artifacts: combine the stats of the files inside
+                stats = [entry.stat() for entry in os.scandir(file_path) if entry.is_file()]
+                return (
+                    file_path,
+                    max((stat.st_mtime_ns for stat in stats), default=0),
+                    sum(stat.st_size for stat in stats),
+                )
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Model file not found: {file_path}")
+        return file_path, stat.st_mtime_ns, stat.st_size
+
+    def _lookup(self, model_id, signature):
+        entry = self._entries.get(model_id)
+        if entry is None:
+            return None
+        if entry['signature'] != signature:
+            self._remove(model_id)
+            return None
+        self._entries.move_to_end(model_id)
+        return entry['model']
+
+    def _remove(self, model_id):
+        entry = self._entries.pop(model_id, None)
+        if entry is not None:
+            self._size -= entry['size']
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it is too large
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            model_id = next(iter(self._entries))
+            self._remove(model_id)
+            self._load_locks.pop(model_id, None)
+
+    def get(self, model_instance, loader):
+        """
+        Return the loaded model for an MLModel instance, calling
+        loader(file_path) at most once per artifact version.
+        """
+        model_id = model_instance.id
+        file_path = model_instance.file_path
+        signature = self.file_signature(file_path)
+
+        with self._lock:
+            model = self._lookup(model_id, signature)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+
+        with load_lock:
+            # Another thread may have loaded the model while we waited
+            with self._lock:
+                model = self._lookup(model_id, signature)
+                if model is not None:
+                    return model
+
+            model = loader(file_path)
+            size = resident_size(model)
+
+            with self._lock:
+                self._remove(model_id)
+                self._entries[model_id] = {
+                    'signature': signature,
+                    'model': model,
+                    'size': size,
+                }
+                self._size += size
+                self._evict()
+
+        return model
+
+    def invalidate(self, model_id):
+        """
+        Drop a model from the registry.
+        """
+        with self._lock:
+            self._remove(model_id)
+            # A load already running keeps its lock; a later one gets a new lock
+            self._load_locks.pop(model_id, None)
+
+    def clear(self):
+        """
+        Drop every model from the registry.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._load_locks.clear()
+            self._size = 0
+
+    @property
+    def size(self):
+        """
+        Estimated bytes held by the loaded models.
+        """
+        return self._size
+
+    def __contains__(self, model_id):
+        return model_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ActiveModelTable:
+    """
+    Per-process table resolving (model_type, version) to the active MLModel.
+
+    Lookups are answered from memory, so the prediction path runs no query
+    to find its model. The table is cleared when an MLModel row is saved or
+    deleted in this process. Other processes see the change through a stamp
+    file that is replaced on every invalidation. As a backstop for updates
+    that bypass model signals, or a stamp file that cannot be written, the
+    table is also rebuilt after a TTL.
+    """
+    DEFAULT_TTL = 60
+
+    def __init__(self, stamp_path=None, ttl=None):
+        self._stamp_path = stamp_path
+        self._ttl = ttl
+        self._entries = {}
+        self._stamp = None
+        self._expires = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stamp_path(self):
+        if self._stamp_path is not None:
+            return self._stamp_path
+        return getattr(settings, 'ML_MODEL_STAMP_FILE', None)
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'ML_MODEL_RESOLUTION_TTL', self.DEFAULT_TTL)
+
+    def read_stamp(self):
+        """
+        Return the current cross-process stamp, or None if there is none.
+        """
+        if not self.stamp_path:
+            return None
+        try:
+            stat = os.stat(self.stamp_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def get(self, model_type, version, resolver):
+        """
+        Return the MLModel for (model_type, version), calling
+        resolver(model_type, version) when it is not in the table.
+        """
+        key = (model_type, version)
+        stamp = self.read_stamp()
+        now = time.monotonic()
+        with self._lock:
+            if stamp != self._stamp or now >= self._expires:
+                self._entries.clear()
+                self._stamp = stamp
+                self._expires = now + self.ttl
+                self._generation += 1
+            if key in self._entries:
+                return self._entries[key]
+            generation = self._generation
+
+        model_instance = resolver(model_type, version)
+
+        with self._lock:
+            # Skip storing a result that an invalidation may have made stale
+            if generation == self._generation:
+                self._entries[key] = model_instance
+        return model_instance
+
+    def clear(self):
+        """
+        Empty this process's table.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def invalidate(self):
+        """
+        Empty the table in this process and, through the stamp file, in
+        every other process.
+        """
+        self.clear()
+        if not self.stamp_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.stamp_path))
+        temp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Replacing the file changes its inode, even within one mtime tick
+            fd, temp_path = tempfile.mkstemp(dir=directory)
+            os.close(fd)
+            os.replace(temp_path, self.stamp_path)
+        except OSError:
+            # Other processes still pick up the change once their TTL expires
+            logger.warning("Could not write model stamp file %s", self.stamp_path, exc_info=True)
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+model_registry = ModelRegistry()
+active_models = ActiveModelTable()
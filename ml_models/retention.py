@@ -0,0 +1,162 @@
+"""
+Retention of stored predictions.
+
+Predictions older than ML_PREDICTION_RETENTION_DAYS are pruned unless they
+are the latest prediction of their model for the same subject: the same
+prediction type, match and player (or team, for predictions about neither
+a match nor a player). Predictions still waiting to be graded, because
+their match is not completed, are kept too.
+
+Before deletion, pruned rows are added to daily PredictionRollup rows per
+model and prediction type (counts, graded and correct counts, summed
+confidence). The latest prediction of every subject is looked up once,
+with one grouped query per kind of subject, and old predictions are then
+read in id order and pruned in small batches, one short transaction
+each, so pruning can run while predictions are being served without
+holding long write locks. GradingTotals are running totals and are not changed by
+pruning. ShadowPredictions of pruned predictions are deleted with them.
+"""
+
+import datetime
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ml_models.models import Prediction, PredictionRollup
+
+# Predictions that are graded or can no longer be graded
+GRADABLE = Q(was_correct__isnull=False) | Q(match__isnull=True) | Q(match__is_completed=True)
+
+# Predictions about a match and the others, with the columns identifying
+# their subject. The team of a match prediction is its predicted winner,
+# not its subject.
+SUBJECTS = (
+    (Q(match__isnull=False), ('model_id', 'prediction_type', 'match_id', 'player_id')),
+    (Q(match__isnull=True), ('model_id', 'prediction_type', 'player_id', 'team_id')),
+)
+
+
+def subject_key(model_id, prediction_type, match_id=None, player_id=None, team_id=None):
+    if match_id is not None:
+        team_id = None
+    return model_id, prediction_type, match_id, player_id, team_id
+
+
+def latest_ids(subject, fields):
+    """
+    Return the id of the latest prediction per subject, as `latest`, in
+    one grouped query. Ids grow with created_at, so the latest prediction
+    is the one with the highest id.
+    """
+    return Prediction.objects.filter(subject).values(*fields).annotate(latest=Max('id'))
+
+
+def latest_by_subject():
+    """
+    Return {subject_key: id of its latest prediction} for every subject.
+    """
+    latest = {}
+    for subject, fields in SUBJECTS:
+        for row in latest_ids(subject, fields):
+            latest[subject_key(**{field: row[field] for field in fields})] = row['latest']
+    return latest
+
+
+def prunable_predictions(before):
+    """
+    Return the predictions created before a datetime that retention may
+    delete: superseded by a later prediction for the same subject, and
+    graded or no longer gradable.
+    """
+    predictions = Prediction.objects.filter(GRADABLE, created_at__lt=before)
+    for subject, fields in SUBJECTS:
+        predictions = predictions.exclude(id__in=latest_ids(subject, fields).values('latest'))
+    return predictions
+
+
+def rollup_counts(predictions):
+    """
+    Return daily counts per model and prediction type for a Prediction queryset.
+    """
+    return predictions.annotate(day=TruncDate('created_at')).values(
+        'model_id', 'prediction_type', 'day'
+    ).annotate(
+        predictions=Count('id'),
+        graded=Count('was_correct'),
+        correct=Count('id', filter=Q(was_correct=True)),
+        confidence_sum=Sum('confidence'),
+    ).order_by()
+
+
+def add_to_rollups(counts):
+    """
+    Add rollup_counts() rows to the PredictionRollup table.
+    """
+    counts = list(counts)
+    if not counts:
+        return
+    PredictionRollup.objects.bulk_create([
+        PredictionRollup(model_id=row['model_id'], prediction_type=row['prediction_type'], day=row['day'])
+        for row in counts
+    ], ignore_conflicts=True)
+    for row in counts:
+        PredictionRollup.objects.filter(
+            model_id=row['model_id'], prediction_type=row['prediction_type'], day=row['day']
+        ).update(
+            predictions=F('predictions') + row['predictions'],
+            graded=F('graded') + row['graded'],
+            correct=F('correct') + row['correct'],
+            confidence_sum=F('confidence_sum') + row['confidence_sum'],
+        )
+
+
+def prune_predictions(before=None, batch_size=None, pause=0.0, dry_run=False):
+    """
+    Roll up and delete prunable predictions created before a datetime
+    (default: ML_PREDICTION_RETENTION_DAYS ago), `batch_size` rows per
+    transaction, sleeping `pause` seconds between batches. With dry_run,
+    only counts them. Returns the number of predictions pruned.
+    """
+    if before is None:
+        days = getattr(settings, 'ML_PREDICTION_RETENTION_DAYS', 30)
+        before = timezone.now() - datetime.timedelta(days=days)
+    if batch_size is None:
+        batch_size = getattr(settings, 'ML_PREDICTION_RETENTION_BATCH_SIZE', 500)
+
+    if dry_run:
+        return prunable_predictions(before).count()
+
+    latest = latest_by_subject()
+    old = Prediction.objects.filter(GRADABLE, created_at__lt=before).order_by('id')
+    pruned = 0
+    last_id = 0
+    while True:
+        batch = list(old.filter(id__gt=last_id).values(
+            'id', 'model_id', 'prediction_type', 'match_id', 'player_id', 'team_id'
+        )[:batch_size])
+        if not batch:
+            return pruned
+        last_id = batch[-1]['id']
+        superseded = {}
+        for row in batch:
+            prediction_id = row.pop('id')
+            # Predictions made after the lookup only supersede more rows
+            latest_id = latest.get(subject_key(**row))
+            if latest_id is not None and latest_id != prediction_id:
+                superseded[prediction_id] = latest_id
+        if not superseded:
+            continue
+        with transaction.atomic():
+            # Keep predictions whose latest prediction was deleted meanwhile,
+            # and recheck grades, which may have been reset
+            kept = set(Prediction.objects.filter(id__in=set(superseded.values())).values_list('id', flat=True))
+            predictions = Prediction.objects.filter(
+                GRADABLE, id__in=[prediction_id for prediction_id, latest_id in superseded.items() if latest_id in kept]
+            )
+            add_to_rollups(rollup_counts(predictions))
+            _, deleted = predictions.delete()
+        pruned += deleted.get(Prediction._meta.label, 0)
+        if pause:
+            time.sleep(pause)
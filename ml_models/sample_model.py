@@ -1,6 +1,7 @@
 """
 Sample script to train and save a machine learning model.
-This is for demonstration purposes only.
+This is for demonstration purposes only; train real models on stored box
+scores with `python manage.py train_models`.
 """
 
 import os
@@ -11,8 +12,9 @@ from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, accuracy_score
 
-# Create models directory if it doesn't exist
-os.makedirs('models', exist_ok=True)
+# Save next to this script, where load_initial_data registers the models
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+os.makedirs(MODELS_DIR, exist_ok=True)
 
 # Sample data for player performance prediction
 def generate_player_performance_data():
@@ -131,10 +133,11 @@ def train_player_performance_model():
     print(f"Player Performance Model MSE: {mse}")
     
     # Save model
-    with open('models/player_performance_model_v1.pkl', 'wb') as f:
+    file_path = os.path.join(MODELS_DIR, 'player_performance_model_v1.pkl')
+    with open(file_path, 'wb') as f:
         pickle.dump(model, f)
     
-    print("Player performance model saved to models/player_performance_model_v1.pkl")
+    print(f"Player performance model saved to {file_path}")
 
 # Train and save match outcome prediction model
 def train_match_outcome_model():
@@ -158,10 +161,11 @@ def train_match_outcome_model():
     print(f"Match Outcome Model Accuracy: {accuracy}")
     
     # Save model
-    with open('models/match_outcome_model_v1.pkl', 'wb') as f:
+    file_path = os.path.join(MODELS_DIR, 'match_outcome_model_v1.pkl')
+    with open(file_path, 'wb') as f:
         pickle.dump(model, f)
     
-    print("Match outcome model saved to models/match_outcome_model_v1.pkl")
+    print(f"Match outcome model saved to {file_path}")
 
 if __name__ == "__main__":
     train_player_performance_model()
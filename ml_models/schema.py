@@ -0,0 +1,242 @@
+"""
+Fixed feature schemas and float32 vectorization of model inputs.
+
+A schema lists a model's input columns in the order the model was fitted
+on. Each column is either a numeric feature or a one-hot (feature, value)
+pair for a categorical feature such as a player's position. Schemas are
+compiled once, when an MLModel is registered, from the column names the
+fitted estimator records. A model that expects columns ModelService does
+not build is rejected at that point instead of failing on its first
+prediction.
+
+At predict time, feature dictionaries (or feature frames) are written
+straight into a float32 array in schema order, so no DataFrame is built
+per request. float32 is the precision sklearn trees compare features in,
+so predictions are identical to passing a DataFrame. A Pipeline that
+one-hot encodes with a ColumnTransformer is compiled into its final
+estimator plus a schema that does the encoding.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+from ml_models import feature_store
+from ml_models.features import SOURCES, validate_windows, window_feature_name
+from stats.models import Player
+
+# String-valued features ModelService builds, with the values they take
+CATEGORICAL_FEATURES = {
+    'PLAYER_PERFORMANCE': {'position': [code for code, _ in Player.POSITION_CHOICES]},
+}
+
+
+def served_features(model_type, windows=None):
+    """
+    Return the names of the features ModelService builds for a model type
+    and its extra rolling windows, or None for model types it does not
+    build features for.
+    """
+    windows = validate_windows(windows or [])
+    if model_type == 'PLAYER_PERFORMANCE':
+        return [
+            'player_id', 'position', 'height', 'weight', 'age',
+            *feature_store.PLAYER_FEATURES,
+            'avg_opp_points_allowed',
+            *(window_feature_name(field, window) for window in windows for field in SOURCES['player'][2]),
+        ]
+    if model_type == 'MATCH_OUTCOME':
+        names = ['home_team_id', 'away_team_id']
+        for prefix in ('home', 'away'):
+            names += [f'{prefix}_{name}' for name in feature_store.TEAM_FEATURES]
+        for prefix in ('home', 'away'):
+            names += [
+                f'{prefix}_{window_feature_name(field, window)}'
+                for window in windows for field in SOURCES['team'][2]
+            ]
+        return names
+    return None
+
+
+class FeatureSchema:
+    """
+    Input columns of a model, in order, and how to fill them from features.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, columns):
+        self.columns = [tuple(column) if isinstance(column, (list, tuple)) else column for column in columns]
+        self.numeric = [(name, index) for index, name in enumerate(self.columns) if isinstance(name, str)]
+        self.one_hot = {}
+        for index, column in enumerate(self.columns):
+            if isinstance(column, tuple):
+                feature, value = column
+                self.one_hot.setdefault(feature, {})[value] = index
+        self.one_hot_indices = [index for index, column in enumerate(self.columns) if isinstance(column, tuple)]
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __eq__(self, other):
+        return isinstance(other, FeatureSchema) and self.columns == other.columns
+
+    def to_dict(self):
+        return {
+            'dtype': np.dtype(self.dtype).name,
+            'columns': [list(column) if isinstance(column, tuple) else column for column in self.columns],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['columns'])
+
+    def vectorize(self, rows):
+        """
+        Write feature dictionaries into a new float32 array of shape
+        (len(rows), len(schema)). Missing numeric features are NaN; an
+        unknown category leaves all of its one-hot columns at 0.
+        """
+        out = np.full((len(rows), len(self.columns)), np.nan, dtype=self.dtype)
+        out[:, self.one_hot_indices] = 0
+        for row, features in zip(out, rows):
+            for name, index in self.numeric:
+                value = features.get(name)
+                if value is not None:
+                    row[index] = value
+            for feature, indices in self.one_hot.items():
+                index = indices.get(features.get(feature))
+                if index is not None:
+                    row[index] = 1
+        return out
+
+    def vectorize_frame(self, frame):
+        """
+        Write a feature frame into a new float32 array, column by column.
+        """
+        out = np.empty((len(frame), len(self.columns)), dtype=self.dtype)
+        for index, column in enumerate(self.columns):
+            if isinstance(column, tuple):
+                feature, value = column
+                out[:, index] = (frame[feature].to_numpy() == value) if feature in frame else 0
+            elif column in frame:
+                out[:, index] = frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                out[:, index] = np.nan
+        return out
+
+
+class VectorizedModel:
+    """
+    A fitted estimator whose inputs are built by a FeatureSchema. Accepts
+    feature dictionaries, feature frames or already vectorized arrays.
+    """
+
+    def __init__(self, schema, estimator):
+        self.schema = schema
+        self.estimator = estimator
+
+    @property
+    def classes_(self):
+        return self.estimator.classes_
+
+    def vectorize(self, X):
+        if isinstance(X, np.ndarray):
+            return X
+        if isinstance(X, pd.DataFrame):
+            return self.schema.vectorize_frame(X)
+        return self.schema.vectorize(X)
+
+    def predict(self, X):
+        return self.estimator.predict(self.vectorize(X))
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(self.vectorize(X))
+
+
+def one_hot_columns(transformer):
+    """
+    Return the input columns of a fitted ColumnTransformer's output, or
+    None if it does anything other than one-hot encode and pass through.
+    """
+    names_in = getattr(transformer, 'feature_names_in_', None)
+    if names_in is None:
+        return None
+    columns = []
+    for _, step, selected in transformer.transformers_:
+        if isinstance(selected, slice) or np.asarray(selected).dtype == bool:
+            return None
+        selected = [
+            str(names_in[column]) if isinstance(column, (int, np.integer)) else str(column)
+            for column in np.atleast_1d(selected)
+        ]
+        if step == 'drop':
+            continue
+        # Newer sklearn versions fit remainder='passthrough' as an identity FunctionTransformer
+        if step == 'passthrough' or (isinstance(step, FunctionTransformer) and step.func is None):
+            columns += selected
+        elif (isinstance(step, OneHotEncoder) and step.drop is None
+              and not getattr(step, '_infrequent_enabled', False)):
+            for feature, categories in zip(selected, step.categories_):
+                columns += [(feature, str(category)) for category in categories]
+        else:
+            return None
+    return columns
+
+
+def compile_schema(estimator, model_type, windows=None):
+    """
+    Return the FeatureSchema a fitted estimator was trained on. Returns None
+    when it cannot be derived: for estimators fitted on bare arrays, which
+    record no column names, or pipelines with preprocessing other than
+    one-hot encoding. Such models are given feature frames as they are.
+    Raises ValueError if the estimator expects columns that ModelService
+    does not build for the model type and windows.
+    """
+    served = served_features(model_type, windows)
+    if served is None:
+        return None
+    categorical = CATEGORICAL_FEATURES.get(model_type, {})
+
+    if isinstance(estimator, Pipeline):
+        if len(estimator.steps) != 2 or not isinstance(estimator.steps[0][1], ColumnTransformer):
+            return None
+        columns = one_hot_columns(estimator.steps[0][1])
+        if columns is None:
+            return None
+    else:
+        names = getattr(estimator, 'feature_names_in_', None)
+        if names is None:
+            return None
+        columns = []
+        for name in map(str, names):
+            # pandas.get_dummies style one-hot columns, e.g. position_PG
+            feature = next(
+                (feature for feature in categorical if name not in served and name.startswith(f'{feature}_')),
+                None
+            )
+            columns.append((feature, name[len(feature) + 1:]) if feature else name)
+
+    features = {column[0] if isinstance(column, tuple) else column for column in columns}
+    unknown = sorted(features - set(served))
+    if unknown:
+        raise ValueError(f"Model expects features that are not served: {', '.join(unknown)}")
+    encoded = sorted({column for column in columns if isinstance(column, str) and column in categorical})
+    if encoded:
+        raise ValueError(f"Categorical features must be one-hot encoded: {', '.join(encoded)}")
+    return FeatureSchema(columns)
+
+
+def input_estimator(estimator):
+    """
+    Return the part of a fitted estimator that runs on vectorized arrays:
+    the final step of a one-hot pipeline, or the estimator itself. Its
+    recorded column names are dropped, since the schema has already
+    matched them and arrays carry none.
+    """
+    if isinstance(estimator, Pipeline):
+        estimator = estimator.steps[-1][1]
+    if getattr(estimator, 'feature_names_in_', None) is not None:
+        estimator.feature_names_in_ = None
+    return estimator
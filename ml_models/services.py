@@ -1,21 +1,38 @@
 import os
 import pickle
+import time
+import joblib
 import numpy as np
 import pandas as pd
 from django.conf import settings
-from django.core.cache import cache
-from ml_models.models import MLModel, Prediction
-from stats.models import Player, Team, Match, PlayerStats, TeamStats
+from ml_models import feature_store, prediction_cache, shadow, timing
+from ml_models.asof import StatsHistory, match_feature_frame, player_feature_frame
+from ml_models.features import window_averages, window_feature_name
+from ml_models.forest import FlatForest, compile_model, tree_mean, tree_predictions
+from ml_models.models import MLModel, Prediction, ShadowPrediction
+from ml_models.registry import active_models, model_registry
+from ml_models.schema import FeatureSchema, VectorizedModel, compile_schema, input_estimator
+from ml_models.writer import get_prediction_writer
 
 
 class ModelService:
     """
     Service for loading and using ML models.
     """
-    CACHE_TIMEOUT = 3600  # 1 hour
+    PLAYER_OUTPUTS = ('points', 'assists', 'rebounds', 'steals', 'blocks')
+    PROJECTION_QUANTILES = (10, 50, 90)
 
     @staticmethod
     def get_model(model_type, version=None):
+        """
+        Get the ML model instance for a type and optional version.
+        Results are kept in the per-process active model table, so repeated
+        lookups do not query the database.
+        """
+        return active_models.get(model_type, version, ModelService.find_model)
+
+    @staticmethod
+    def find_model(model_type, version=None):
         """
         Get the ML model instance from the database.
         If version is not specified, get the latest active model.
@@ -34,53 +51,152 @@ class ModelService:
         
         return model
 
+    @staticmethod
+    def read_model_file(file_path):
+        """
+        Read a model artifact from the file system.
+        The format is detected from the path:
+        - a flat forest directory is memory-mapped read-only
+        - a .joblib file is loaded with joblib; sklearn trees copy their
+          node arrays when unpickled, so only a flat forest shares memory
+          between workers
+        - anything else is unpickled
+        """
+        if FlatForest.is_artifact(file_path):
+            return FlatForest.load(file_path, mmap_mode='r')
+        if file_path.endswith('.joblib'):
+            return joblib.load(file_path, mmap_mode='r')
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+
     @staticmethod
     def load_model(model_instance):
         """
         Load the ML model from the file system.
-        Use caching to avoid loading the model multiple times.
+        Loaded models are kept in the per-process model registry so each
+        artifact is only unpickled once per worker. With the 'numpy'
+        inference backend, random forests are compiled into flat node
+        arrays when they are loaded, and batches larger than
+        ML_INFERENCE_NUMPY_MAX_ROWS still run on sklearn. Models with a
+        feature schema are wrapped so they take feature dictionaries and
+        vectorize them.
         """
-        cache_key = f"ml_model_{model_instance.id}"
-        model = cache.get(cache_key)
+        compile_forests = getattr(settings, 'ML_INFERENCE_BACKEND', 'sklearn') == 'numpy'
+        schema = model_instance.feature_schema and FeatureSchema.from_dict(model_instance.feature_schema)
         
-        if model is None:
-            file_path = model_instance.file_path
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"Model file not found: {file_path}")
-            
-            with open(file_path, 'rb') as f:
-                model = pickle.load(f)
-            
-            cache.set(cache_key, model, ModelService.CACHE_TIMEOUT)
+        def load(file_path):
+            model = ModelService.read_model_file(file_path)
+            if schema:
+                model = input_estimator(model)
+            if compile_forests:
+                model = compile_model(model, getattr(settings, 'ML_INFERENCE_NUMPY_MAX_ROWS', 256))
+            return VectorizedModel(schema, model) if schema else model
         
-        return model
+        return model_registry.get(model_instance, load)
 
     @staticmethod
-    def prepare_player_features(player, match=None, recent_matches=5):
+    def compile_feature_schema(model_instance):
         """
-        Prepare features for player performance prediction.
+        Compile the feature schema of a model's artifact for storage on the
+        model. Returns None if the artifact does not exist yet or records no
+        input columns. Raises ValueError if it expects features that are
+        not served for the model's type and windows.
         """
-        # Get player's recent stats
-        if match:
-            recent_stats = PlayerStats.objects.filter(
-                player=player,
-                match__date__lt=match.date
-            ).order_by('-match__date')[:recent_matches]
-        else:
-            recent_stats = PlayerStats.objects.filter(
-                player=player
-            ).order_by('-match__date')[:recent_matches]
+        if not os.path.exists(model_instance.file_path):
+            return None
+        schema = compile_schema(
+            ModelService.read_model_file(model_instance.file_path),
+            model_instance.model_type,
+            model_instance.feature_windows
+        )
+        return schema.to_dict() if schema else None
+
+    @staticmethod
+    def model_input(model, rows):
+        """
+        Return the input for a loaded model from a list of feature
+        dictionaries or a feature frame: a float32 array written in schema
+        order for models with a feature schema, or a DataFrame for models
+        without one.
+        """
+        if isinstance(model, VectorizedModel):
+            return model.vectorize(rows)
+        if isinstance(rows, pd.DataFrame):
+            return rows
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def save_predictions(predictions):
+        """
+        Persist unsaved Prediction instances through the prediction writer.
+        In write-behind mode they are returned immediately and written in
+        a later batch.
+        """
+        return get_prediction_writer().save(predictions)
+
+    @staticmethod
+    def average_player_stats(player, match=None, recent_matches=5):
+        """
+        Average a player's last games, read from the feature store when the
+        window is materialized and computed from box scores otherwise.
+        """
+        snapshot = feature_store.latest_snapshot(
+            'player', player.id, recent_matches, before=match.date if match else None
+        )
+        if snapshot:
+            return {name: getattr(snapshot, name) for name in feature_store.PLAYER_FEATURES}
+        
+        averages = window_averages(
+            'player',
+            [player.id],
+            [recent_matches],
+            fields=list(feature_store.PLAYER_FEATURES.values()),
+            before=match.date if match else None
+        ).get(player.id)
+        if not averages:
+            return None
         
-        if not recent_stats:
+        return {
+            name: averages[window_feature_name(field, recent_matches)]
+            for name, field in feature_store.PLAYER_FEATURES.items()
+        }
+
+    @staticmethod
+    def average_team_stats(team, recent_matches, before=None):
+        """
+        Average a team's last games (optionally only games played before a
+        date), read from the feature store when the window is materialized
+        and computed from box scores otherwise.
+        """
+        snapshot = feature_store.latest_snapshot('team', team.id, recent_matches, before=before)
+        if snapshot:
+            return {name: getattr(snapshot, name) for name in feature_store.TEAM_FEATURES}
+        
+        averages = window_averages(
+            'team',
+            [team.id],
+            [recent_matches],
+            fields=list(feature_store.TEAM_FEATURES.values()),
+            before=before
+        ).get(team.id)
+        if not averages:
             return None
         
-        # Calculate average stats
-        avg_points = sum(stat.points for stat in recent_stats) / len(recent_stats)
-        avg_assists = sum(stat.assists for stat in recent_stats) / len(recent_stats)
-        avg_rebounds = sum(stat.rebounds for stat in recent_stats) / len(recent_stats)
-        avg_steals = sum(stat.steals for stat in recent_stats) / len(recent_stats)
-        avg_blocks = sum(stat.blocks for stat in recent_stats) / len(recent_stats)
-        avg_minutes = sum(stat.minutes_played for stat in recent_stats) / len(recent_stats)
+        return {
+            name: averages[window_feature_name(field, recent_matches)]
+            for name, field in feature_store.TEAM_FEATURES.items()
+        }
+
+    @staticmethod
+    def prepare_player_features(player, match=None, recent_matches=5, windows=None):
+        """
+        Prepare features for player performance prediction.
+        Extra rolling windows (e.g. [3, 10, 'season']) add one average per
+        stat column and window, all computed by a single query.
+        """
+        averages = ModelService.average_player_stats(player, match, recent_matches)
+        if not averages:
+            return None
         
         # Create feature dictionary
         features = {
@@ -89,169 +205,630 @@ class ModelService:
             'height': player.height,
             'weight': player.weight,
             'age': player.age,
-            'avg_points': avg_points,
-            'avg_assists': avg_assists,
-            'avg_rebounds': avg_rebounds,
-            'avg_steals': avg_steals,
-            'avg_blocks': avg_blocks,
-            'avg_minutes': avg_minutes,
+            'avg_points': averages['avg_points'],
+            'avg_assists': averages['avg_assists'],
+            'avg_rebounds': averages['avg_rebounds'],
+            'avg_steals': averages['avg_steals'],
+            'avg_blocks': averages['avg_blocks'],
+            'avg_minutes': averages['avg_minutes'],
         }
         
         # Add opponent team features if match is provided
         if match:
-            if player.team == match.home_team:
+            if player.team_id == match.home_team_id:
                 opponent_team = match.away_team
             else:
                 opponent_team = match.home_team
             
             # Get opponent team's defensive stats
-            opponent_stats = TeamStats.objects.filter(
-                team=opponent_team
-            ).order_by('-match__date')[:recent_matches]
+            opponent_averages = ModelService.average_team_stats(
+                opponent_team, recent_matches, before=match.date
+            )
             
-            if opponent_stats:
-                avg_opp_points_allowed = sum(stat.points for stat in opponent_stats) / len(opponent_stats)
-                features['avg_opp_points_allowed'] = avg_opp_points_allowed
+            if opponent_averages:
+                features['avg_opp_points_allowed'] = opponent_averages['avg_points']
+        
+        if windows:
+            features.update(window_averages(
+                'player', [player.id], windows, before=match.date if match else None
+            ).get(player.id, {}))
         
         return features
 
     @staticmethod
-    def prepare_match_features(match):
+    def prepare_match_features(match, windows=None):
         """
         Prepare features for match outcome prediction.
+        Extra rolling windows add home_ and away_ averages per stat column
+        and window, computed for both teams by a single query.
         """
         home_team = match.home_team
         away_team = match.away_team
         recent_matches = 10
         
-        # Get recent home team stats
-        home_stats = TeamStats.objects.filter(
-            team=home_team
-        ).order_by('-match__date')[:recent_matches]
-        
-        # Get recent away team stats
-        away_stats = TeamStats.objects.filter(
-            team=away_team
-        ).order_by('-match__date')[:recent_matches]
+        # Get home and away team averages from games before this match
+        home_averages = ModelService.average_team_stats(home_team, recent_matches, before=match.date)
+        away_averages = ModelService.average_team_stats(away_team, recent_matches, before=match.date)
         
-        if not home_stats or not away_stats:
+        if not home_averages or not away_averages:
             return None
         
-        # Calculate average stats for home team
-        home_avg_points = sum(stat.points for stat in home_stats) / len(home_stats)
-        home_avg_rebounds = sum(stat.rebounds for stat in home_stats) / len(home_stats)
-        home_avg_assists = sum(stat.assists for stat in home_stats) / len(home_stats)
-        home_avg_steals = sum(stat.steals for stat in home_stats) / len(home_stats)
-        home_avg_blocks = sum(stat.blocks for stat in home_stats) / len(home_stats)
-        
-        # Calculate average stats for away team
-        away_avg_points = sum(stat.points for stat in away_stats) / len(away_stats)
-        away_avg_rebounds = sum(stat.rebounds for stat in away_stats) / len(away_stats)
-        away_avg_assists = sum(stat.assists for stat in away_stats) / len(away_stats)
-        away_avg_steals = sum(stat.steals for stat in away_stats) / len(away_stats)
-        away_avg_blocks = sum(stat.blocks for stat in away_stats) / len(away_stats)
-        
         # Create feature dictionary
         features = {
             'home_team_id': home_team.id,
             'away_team_id': away_team.id,
-            'home_avg_points': home_avg_points,
-            'home_avg_rebounds': home_avg_rebounds,
-            'home_avg_assists': home_avg_assists,
-            'home_avg_steals': home_avg_steals,
-            'home_avg_blocks': home_avg_blocks,
-            'away_avg_points': away_avg_points,
-            'away_avg_rebounds': away_avg_rebounds,
-            'away_avg_assists': away_avg_assists,
-            'away_avg_steals': away_avg_steals,
-            'away_avg_blocks': away_avg_blocks,
+            'home_avg_points': home_averages['avg_points'],
+            'home_avg_rebounds': home_averages['avg_rebounds'],
+            'home_avg_assists': home_averages['avg_assists'],
+            'home_avg_steals': home_averages['avg_steals'],
+            'home_avg_blocks': home_averages['avg_blocks'],
+            'away_avg_points': away_averages['avg_points'],
+            'away_avg_rebounds': away_averages['avg_rebounds'],
+            'away_avg_assists': away_averages['avg_assists'],
+            'away_avg_steals': away_averages['avg_steals'],
+            'away_avg_blocks': away_averages['avg_blocks'],
         }
         
+        if windows:
+            averages = window_averages(
+                'team', [home_team.id, away_team.id], windows, before=match.date
+            )
+            for prefix, team in (('home', home_team), ('away', away_team)):
+                for name, value in averages.get(team.id, {}).items():
+                    features[f'{prefix}_{name}'] = value
+        
         return features
 
+    @staticmethod
+    def player_prediction_data(prediction, quantiles=None):
+        """
+        Convert a row of model output into the stored prediction payload.
+        Quantiles, given as an array of shape (len(PROJECTION_QUANTILES),
+        n_outputs), are stored per stat under 'quantiles'.
+        """
+        prediction_data = {
+            'points': float(prediction[0]),
+            'assists': float(prediction[1]),
+            'rebounds': float(prediction[2]),
+            'steals': float(prediction[3]),
+            'blocks': float(prediction[4]),
+        }
+        if quantiles is not None:
+            prediction_data['quantiles'] = {
+                stat: {
+                    f'p{quantile}': float(quantiles[row, column])
+                    for row, quantile in enumerate(ModelService.PROJECTION_QUANTILES)
+                }
+                for column, stat in enumerate(ModelService.PLAYER_OUTPUTS)
+            }
+        return prediction_data
+
+    @staticmethod
+    def project_players(model, features_df):
+        """
+        Run the player performance model over its input rows and return a
+        (prediction_data, confidence) pair per row.
+        For random forests, every tree's prediction is collected in the same
+        pass over the forest. The payload then gains p10/p50/p90 quantiles
+        per stat, and confidence falls as the trees disagree more: it is
+        1 / (1 + total p10-p90 width / total predicted value).
+        Other models keep the placeholder confidence.
+        """
+        outputs = tree_predictions(model, features_df)
+        if outputs is None:
+            confidence = 0.8  # Placeholder for confidence score
+            return [
+                (ModelService.player_prediction_data(prediction), confidence)
+                for prediction in model.predict(features_df)
+            ]
+        
+        predictions = tree_mean(outputs)
+        quantiles = np.percentile(outputs, ModelService.PROJECTION_QUANTILES, axis=0)
+        widths = (quantiles[-1] - quantiles[0]).sum(axis=1)
+        totals = np.maximum(np.abs(predictions).sum(axis=1), np.finfo(np.float64).eps)
+        confidences = 1 / (1 + widths / totals)
+        return [
+            (ModelService.player_prediction_data(prediction, quantiles[:, row]), float(confidence))
+            for row, (prediction, confidence) in enumerate(zip(predictions, confidences))
+        ]
+
     @staticmethod
     def predict_player_performance(player, match=None, model_version=None):
         """
         Predict player performance for a match.
         """
+        timer = timing.start('predict_player_performance')
+        
         # Get the ML model
         model_instance = ModelService.get_model('PLAYER_PERFORMANCE', model_version)
         if not model_instance:
             raise ValueError("No active player performance prediction model found")
+        timer.lap('get_model')
         
         # Prepare features
-        features = ModelService.prepare_player_features(player, match)
+        features = ModelService.prepare_player_features(
+            player, match, windows=model_instance.feature_windows
+        )
         if not features:
             raise ValueError("Not enough data to make a prediction")
+        timer.lap('prepare_features')
+        
+        # Reuse an earlier prediction made from the same features
+        hashed = prediction_cache.feature_hash(features)
+        cache_key = ModelService.player_cache_key(model_instance, player, match, hashed)
+        cached = prediction_cache.get_prediction(
+            cache_key, model_instance, 'PLAYER_STATS', hashed, match=match, player=player
+        )
+        timer.lap('cache_lookup')
+        if cached:
+            timer.finish(model_instance)
+            return cached
         
         # Load the model
         model = ModelService.load_model(model_instance)
+        timer.lap('load_model')
         
         # Make prediction
-        features_df = pd.DataFrame([features])
-        prediction = model.predict(features_df)[0]
-        confidence = 0.8  # Placeholder for confidence score
+        started = time.perf_counter()
+        model_input = ModelService.model_input(model, [features])
+        prediction_data, confidence = ModelService.project_players(model, model_input)[0]
+        latency = time.perf_counter() - started
+        timer.lap('predict')
         
         # Create prediction object
-        prediction_obj = Prediction.objects.create(
+        prediction_obj = Prediction(
             model=model_instance,
             prediction_type='PLAYER_STATS',
             match=match,
             player=player,
-            prediction_data={
-                'points': float(prediction[0]),
-                'assists': float(prediction[1]),
-                'rebounds': float(prediction[2]),
-                'steals': float(prediction[3]),
-                'blocks': float(prediction[4]),
-            },
-            confidence=confidence
+            prediction_data=prediction_data,
+            confidence=confidence,
+            feature_hash=hashed
         )
         
+        prediction_obj = ModelService.save_predictions([prediction_obj])[0]
+        prediction_cache.set_prediction(cache_key, prediction_obj)
+        timer.lap('save')
+        
+        # Compare candidate versions on the same features in the background
+        ModelService.shadow_predict(prediction_obj, features, latency)
+        timer.finish(model_instance)
         return prediction_obj
 
+    @staticmethod
+    def player_cache_key(model_instance, player, match, hashed):
+        """
+        Build the prediction cache key for a player, retired when new stats
+        arrive for the player or either team in the match.
+        """
+        return prediction_cache.cache_key(
+            model_instance,
+            'PLAYER_STATS',
+            hashed,
+            match_id=match.id if match else None,
+            player_ids=[player.id],
+            team_ids=[match.home_team_id, match.away_team_id] if match else []
+        )
+
+    @staticmethod
+    def predict_players_batch(players, match=None, model_version=None):
+        """
+        Predict performance for several players with a single model call.
+        Features for every player come from the as-of feature engine, and
+        earlier predictions are looked up together, so the number of
+        queries does not grow with the roster. Players without enough
+        history are skipped. Returns a tuple of the created predictions and
+        the list of skipped players.
+        """
+        players = list(players)
+        timer = timing.start('predict_players_batch')
+        
+        # Get the ML model
+        model_instance = ModelService.get_model('PLAYER_PERFORMANCE', model_version)
+        if not model_instance:
+            raise ValueError("No active player performance prediction model found")
+        timer.lap('get_model')
+        
+        # Prepare features for every player from one box score history per kind
+        features_df = player_feature_frame(
+            [(player, match) for player in players],
+            windows=model_instance.feature_windows,
+            player_history=StatsHistory.load('player', entity_ids={player.id for player in players}),
+            team_history=StatsHistory.load(
+                'team', entity_ids={match.home_team_id, match.away_team_id} if match else set()
+            )
+        )
+        predicted_players = [players[index] for index in features_df.index]
+        skipped_players = [player for index, player in enumerate(players) if index not in features_df.index]
+        timer.lap('prepare_features', len(players))
+        
+        if not predicted_players:
+            timer.finish(model_instance, len(players))
+            return [], skipped_players
+        
+        # Reuse earlier predictions made from the same features
+        lookups = {}
+        for player, features in zip(predicted_players, ModelService.frame_features(features_df)):
+            hashed = prediction_cache.feature_hash(features)
+            cache_key = ModelService.player_cache_key(model_instance, player, match, hashed)
+            lookups[player.id] = (player, features, hashed, cache_key)
+        found = prediction_cache.get_predictions(model_instance, 'PLAYER_STATS', {
+            cache_key: (match.id if match else None, player.id, hashed)
+            for player, _, hashed, cache_key in lookups.values()
+        })
+        cached = {}
+        uncached = []
+        for player, features, hashed, cache_key in lookups.values():
+            if cache_key in found:
+                cached[player.id] = found[cache_key]
+            else:
+                uncached.append((player, features, hashed, cache_key))
+        timer.lap('cache_lookup', len(predicted_players))
+        
+        created = {}
+        if uncached:
+            # Load the model
+            model = ModelService.load_model(model_instance)
+            timer.lap('load_model', len(uncached))
+            
+            # Make all predictions in one call
+            model_input = ModelService.model_input(model, [features for _, features, _, _ in uncached])
+            projections = ModelService.project_players(model, model_input)
+            timer.lap('predict', len(uncached))
+            
+            # Create prediction objects in bulk
+            prediction_objs = ModelService.save_predictions([
+                Prediction(
+                    model=model_instance,
+                    prediction_type='PLAYER_STATS',
+                    match=match,
+                    player=player,
+                    prediction_data=prediction_data,
+                    confidence=confidence,
+                    feature_hash=hashed
+                )
+                for (player, _, hashed, _), (prediction_data, confidence) in zip(uncached, projections)
+            ])
+            for (player, _, _, cache_key), prediction_obj in zip(uncached, prediction_objs):
+                prediction_cache.set_prediction(cache_key, prediction_obj)
+                created[player.id] = prediction_obj
+            timer.lap('save', len(uncached))
+        
+        prediction_objs = [
+            cached.get(player.id) or created[player.id] for player in predicted_players
+        ]
+        timer.finish(model_instance, len(players))
+        return prediction_objs, skipped_players
+
+    @staticmethod
+    def match_prediction_data(match, prediction, probabilities):
+        """
+        Convert match outcome model output into the predicted winner and
+        the stored prediction payload.
+        """
+        confidence = probabilities.max()
+        
+        # Determine winner
+        if prediction == 1:
+            winner = match.home_team
+        else:
+            winner = match.away_team
+        
+        prediction_data = {
+            'winner_id': winner.id,
+            'winner_name': str(winner),
+            'home_win_probability': float(confidence if prediction == 1 else 1 - confidence),
+            'away_win_probability': float(confidence if prediction == 0 else 1 - confidence),
+        }
+        return winner, prediction_data, float(confidence)
+
     @staticmethod
     def predict_match_outcome(match, model_version=None):
         """
         Predict the outcome of a match.
         """
+        timer = timing.start('predict_match_outcome')
+        
         # Get the ML model
         model_instance = ModelService.get_model('MATCH_OUTCOME', model_version)
         if not model_instance:
             raise ValueError("No active match outcome prediction model found")
+        timer.lap('get_model')
         
         # Prepare features
-        features = ModelService.prepare_match_features(match)
+        features = ModelService.prepare_match_features(
+            match, windows=model_instance.feature_windows
+        )
         if not features:
             raise ValueError("Not enough data to make a prediction")
+        timer.lap('prepare_features')
+        
+        # Reuse an earlier prediction made from the same features
+        hashed = prediction_cache.feature_hash(features)
+        cache_key = prediction_cache.cache_key(
+            model_instance,
+            'MATCH_WINNER',
+            hashed,
+            match_id=match.id,
+            team_ids=[match.home_team_id, match.away_team_id]
+        )
+        cached = prediction_cache.get_prediction(
+            cache_key, model_instance, 'MATCH_WINNER', hashed, match=match
+        )
+        timer.lap('cache_lookup')
+        if cached:
+            timer.finish(model_instance)
+            return cached
         
         # Load the model
         model = ModelService.load_model(model_instance)
+        timer.lap('load_model')
         
         # Make prediction
-        features_df = pd.DataFrame([features])
-        prediction = model.predict(features_df)[0]
-        confidence = model.predict_proba(features_df)[0].max()
-        
-        # Determine winner
-        if prediction == 1:
-            winner = match.home_team
-        else:
-            winner = match.away_team
+        started = time.perf_counter()
+        model_input = ModelService.model_input(model, [features])
+        prediction = model.predict(model_input)[0]
+        probabilities = model.predict_proba(model_input)[0]
+        latency = time.perf_counter() - started
+        timer.lap('predict')
+        winner, prediction_data, confidence = ModelService.match_prediction_data(
+            match, prediction, probabilities
+        )
         
         # Create prediction object
-        prediction_obj = Prediction.objects.create(
+        prediction_obj = Prediction(
             model=model_instance,
             prediction_type='MATCH_WINNER',
             match=match,
             team=winner,
-            prediction_data={
-                'winner_id': winner.id,
-                'winner_name': str(winner),
-                'home_win_probability': float(confidence if prediction == 1 else 1 - confidence),
-                'away_win_probability': float(confidence if prediction == 0 else 1 - confidence),
-            },
-            confidence=float(confidence)
+            prediction_data=prediction_data,
+            confidence=confidence,
+            feature_hash=hashed
         )
         
+        prediction_obj = ModelService.save_predictions([prediction_obj])[0]
+        prediction_cache.set_prediction(cache_key, prediction_obj)
+        timer.lap('save')
+        
+        # Compare candidate versions on the same features in the background
+        ModelService.shadow_predict(prediction_obj, features, latency)
+        timer.finish(model_instance)
         return prediction_obj
+
+    @staticmethod
+    def shadow_predict(prediction, features, latency):
+        """
+        Queue the candidate versions listed in ML_SHADOW_MODELS for this
+        prediction's model type to run on the same features. Runs happen in
+        a bounded background pool and never affect the served prediction.
+        """
+        shadow_models = getattr(settings, 'ML_SHADOW_MODELS', {})
+        for version in shadow_models.get(prediction.model.model_type, []):
+            if version != prediction.model.version:
+                shadow.submit(ModelService.run_shadow, prediction, version, features, latency)
+
+    @staticmethod
+    def run_shadow(prediction, version, features, primary_latency):
+        """
+        Predict with one candidate version and record its output and
+        latency next to the primary prediction.
+        """
+        model_type = prediction.model.model_type
+        candidate = MLModel.objects.filter(
+            model_type=model_type, version=version
+        ).order_by('-created_at').first()
+        if not candidate:
+            raise ValueError(f"No {model_type} model with version {version}")
+        
+        # Rebuild features if the candidate uses other rolling windows
+        if candidate.feature_windows != prediction.model.feature_windows:
+            if prediction.prediction_type == 'PLAYER_STATS':
+                features = ModelService.prepare_player_features(
+                    prediction.player, prediction.match, windows=candidate.feature_windows
+                )
+            else:
+                features = ModelService.prepare_match_features(
+                    prediction.match, windows=candidate.feature_windows
+                )
+        
+        model = ModelService.load_model(candidate)
+        started = time.perf_counter()
+        model_input = ModelService.model_input(model, [features])
+        if prediction.prediction_type == 'PLAYER_STATS':
+            prediction_data, confidence = ModelService.project_players(model, model_input)[0]
+        else:
+            outcome = model.predict(model_input)[0]
+            probabilities = model.predict_proba(model_input)[0]
+            _, prediction_data, confidence = ModelService.match_prediction_data(
+                prediction.match, outcome, probabilities
+            )
+        latency = time.perf_counter() - started
+        
+        if prediction.pk is None:
+            # Written behind: store the primary row so it can be referenced
+            get_prediction_writer().flush()
+        return ShadowPrediction.objects.create(
+            prediction=prediction,
+            model=candidate,
+            prediction_data=prediction_data,
+            confidence=confidence,
+            latency_ms=latency * 1000,
+            primary_latency_ms=primary_latency * 1000
+        )
+
+    @staticmethod
+    def frame_features(features_df):
+        """
+        Convert a feature frame into one feature dictionary per row, leaving
+        out missing values like the single-prediction feature builders do.
+        """
+        return [
+            {name: value for name, value in row.items() if not pd.isna(value)}
+            for row in features_df.to_dict('records')
+        ]
+
+    @staticmethod
+    def predict_matches_batch(matches, model_version=None, team_history=None, model_instance=None):
+        """
+        Predict the outcome of many matches with a single model call.
+        Features are built point-in-time by the as-of feature engine, so
+        historical matches only see games played before them. Matches that
+        already have a prediction from the same features reuse it. An
+        MLModel instance can be passed to use a model that is not active.
+        Returns a tuple of the predictions and the list of skipped matches.
+        """
+        timer = timing.start('predict_matches_batch')
+        
+        # Get the ML model
+        if model_instance is None:
+            model_instance = ModelService.get_model('MATCH_OUTCOME', model_version)
+        if not model_instance:
+            raise ValueError("No active match outcome prediction model found")
+        timer.lap('get_model')
+        
+        matches = list(matches)
+        features_df = match_feature_frame(
+            matches, windows=model_instance.feature_windows, team_history=team_history
+        )
+        predicted_matches = [match for match in matches if match.id in features_df.index]
+        skipped_matches = [match for match in matches if match.id not in features_df.index]
+        timer.lap('prepare_features', len(matches))
+        
+        if not predicted_matches:
+            timer.finish(model_instance, len(matches))
+            return [], skipped_matches
+        
+        # Reuse earlier predictions made from the same features
+        features_df = features_df.loc[[match.id for match in predicted_matches]]
+        hashes = [
+            prediction_cache.feature_hash(features)
+            for features in ModelService.frame_features(features_df)
+        ]
+        existing = prediction_cache.find_predictions(
+            model_instance,
+            'MATCH_WINNER',
+            [(match.id, None, hashed) for match, hashed in zip(predicted_matches, hashes)]
+        )
+        uncached = [
+            index for index, (match, hashed) in enumerate(zip(predicted_matches, hashes))
+            if (match.id, None, hashed) not in existing
+        ]
+        timer.lap('cache_lookup', len(predicted_matches))
+        
+        created = {}
+        if uncached:
+            # Load the model
+            model = ModelService.load_model(model_instance)
+            timer.lap('load_model', len(uncached))
+            
+            # Make all predictions in one call
+            model_input = ModelService.model_input(model, features_df.iloc[uncached])
+            predictions = model.predict(model_input)
+            probabilities = model.predict_proba(model_input)
+            timer.lap('predict', len(uncached))
+            
+            # Create prediction objects in bulk
+            prediction_objs = []
+            for index, prediction, match_probabilities in zip(uncached, predictions, probabilities):
+                match = predicted_matches[index]
+                winner, prediction_data, confidence = ModelService.match_prediction_data(
+                    match, prediction, match_probabilities
+                )
+                prediction_objs.append(Prediction(
+                    model=model_instance,
+                    prediction_type='MATCH_WINNER',
+                    match=match,
+                    team=winner,
+                    prediction_data=prediction_data,
+                    confidence=confidence,
+                    feature_hash=hashes[index]
+                ))
+            created = dict(zip(uncached, ModelService.save_predictions(prediction_objs)))
+            timer.lap('save', len(uncached))
+        
+        prediction_objs = [
+            created[index] if index in created else existing[(match.id, None, hashes[index])]
+            for index, match in enumerate(predicted_matches)
+        ]
+        timer.finish(model_instance, len(matches))
+        return prediction_objs, skipped_matches
+
+    @staticmethod
+    def predict_player_matches_batch(pairs, model_version=None, player_history=None, team_history=None):
+        """
+        Predict player performance for many (player, match) pairs with a
+        single model call, using point-in-time features from the as-of
+        feature engine. Pairs that already have a prediction from the same
+        features reuse it. Returns a tuple of the predictions and the list
+        of skipped pairs.
+        """
+        timer = timing.start('predict_player_matches_batch')
+        
+        # Get the ML model
+        model_instance = ModelService.get_model('PLAYER_PERFORMANCE', model_version)
+        if not model_instance:
+            raise ValueError("No active player performance prediction model found")
+        timer.lap('get_model')
+        
+        pairs = list(pairs)
+        features_df = player_feature_frame(
+            pairs,
+            windows=model_instance.feature_windows,
+            player_history=player_history,
+            team_history=team_history
+        )
+        predicted = [pairs[index] for index in features_df.index]
+        skipped_pairs = [pair for index, pair in enumerate(pairs) if index not in features_df.index]
+        timer.lap('prepare_features', len(pairs))
+        
+        if not predicted:
+            timer.finish(model_instance, len(pairs))
+            return [], skipped_pairs
+        
+        # Reuse earlier predictions made from the same features
+        hashes = [
+            prediction_cache.feature_hash(features)
+            for features in ModelService.frame_features(features_df)
+        ]
+        entries = [
+            (match.id if match else None, player.id, hashed)
+            for (player, match), hashed in zip(predicted, hashes)
+        ]
+        existing = prediction_cache.find_predictions(model_instance, 'PLAYER_STATS', entries)
+        uncached = [index for index, entry in enumerate(entries) if entry not in existing]
+        timer.lap('cache_lookup', len(predicted))
+        
+        created = {}
+        if uncached:
+            # Load the model
+            model = ModelService.load_model(model_instance)
+            timer.lap('load_model', len(uncached))
+            
+            # Make all predictions in one call
+            projections = ModelService.project_players(
+                model, ModelService.model_input(model, features_df.iloc[uncached])
+            )
+            timer.lap('predict', len(uncached))
+            
+            # Create prediction objects in bulk
+            prediction_objs = ModelService.save_predictions([
+                Prediction(
+                    model=model_instance,
+                    prediction_type='PLAYER_STATS',
+                    match=predicted[index][1],
+                    player=predicted[index][0],
+                    prediction_data=prediction_data,
+                    confidence=confidence,
+                    feature_hash=hashes[index]
+                )
+                for index, (prediction_data, confidence) in zip(uncached, projections)
+            ])
+            created = dict(zip(uncached, prediction_objs))
+            timer.lap('save', len(uncached))
+        
+        prediction_objs = [
+            created[index] if index in created else existing[entries[index]]
+            for index in range(len(predicted))
+        ]
+        timer.finish(model_instance, len(pairs))
+        return prediction_objs, skipped_pairs
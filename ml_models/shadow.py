@@ -0,0 +1,81 @@
+"""
+Bounded background execution for shadow model evaluation.
+
+Shadow runs are submitted to a small per-process thread pool. When too many
+runs are already waiting, new ones are dropped instead of queued, and a
+failing run is only logged, so shadow evaluation can never slow down or
+fail the request that served the primary prediction.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {'pid': None, 'executor': None, 'pending': 0, 'dropped': 0}
+
+
+def _executor(workers):
+    # Threads do not survive a fork, so each process gets its own pool
+    if _state['pid'] != os.getpid():
+        _state.update(
+            pid=os.getpid(),
+            executor=ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shadow'),
+            pending=0,
+            dropped=0,
+        )
+    return _state['executor']
+
+
+def _run(func, args, in_thread):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Shadow evaluation failed")
+    finally:
+        if in_thread:
+            close_old_connections()
+            with _lock:
+                _state['pending'] -= 1
+
+
+def submit(func, *args):
+    """
+    Run func(*args) in the background. Returns False if the run was dropped
+    because too many are pending. With ML_SHADOW_WORKERS = 0 the run happens
+    immediately in the calling thread, which is useful for debugging.
+    """
+    workers = getattr(settings, 'ML_SHADOW_WORKERS', 2)
+    if workers <= 0:
+        _run(func, args, in_thread=False)
+        return True
+
+    with _lock:
+        executor = _executor(workers)
+        if _state['pending'] >= getattr(settings, 'ML_SHADOW_MAX_PENDING', 100):
+            _state['dropped'] += 1
+            return False
+        _state['pending'] += 1
+    try:
+        executor.submit(_run, func, args, True)
+    except RuntimeError:
+        # The pool is shutting down with the interpreter
+        with _lock:
+            _state['pending'] -= 1
+        return False
+    return True
+
+
+def stats():
+    """
+    Return the number of pending and dropped shadow runs in this process.
+    """
+    with _lock:
+        if _state['pid'] != os.getpid():
+            return {'pending': 0, 'dropped': 0}
+        return {'pending': _state['pending'], 'dropped': _state['dropped']}
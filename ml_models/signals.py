@@ -0,0 +1,160 @@
+import logging
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from ml_models import feature_store, grading, prediction_cache
+from ml_models.models import MLModel
+from ml_models.registry import active_models, model_registry
+from ml_models.services import ModelService
+from ml_models.similarity import similar_players
+from stats.models import Match, Player, PlayerStats, TeamStats
+
+logger = logging.getLogger(__name__)
+
+# MLModel fields the feature schema is compiled from, in schema_inputs() order
+SCHEMA_FIELDS = ('file_path', 'model_type', 'feature_windows')
+
+
+@receiver(pre_save, sender=MLModel)
+def compile_feature_schema(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Compile the model's feature schema when it is registered or its file,
+    type or windows change. Models are validated by MLModel.clean(), so a
+    model saved without it that expects unserved features is stored
+    without a schema.
+    """
+    if raw or (update_fields is not None and update_fields.isdisjoint(SCHEMA_FIELDS)):
+        return
+    inputs = instance.schema_inputs()
+    if getattr(instance, '_schema_inputs', None) == inputs:
+        return
+    if instance.pk:
+        previous = MLModel.objects.filter(pk=instance.pk).values_list(*SCHEMA_FIELDS).first()
+        if previous == inputs:
+            instance._schema_inputs = inputs
+            return
+    try:
+        instance.feature_schema = ModelService.compile_feature_schema(instance)
+    except ValueError as e:
+        logger.warning("Saving %s without a feature schema: %s", instance, e)
+        instance.feature_schema = None
+    instance._schema_inputs = inputs
+
+
+@receiver(post_save, sender=MLModel)
+@receiver(post_delete, sender=MLModel)
+def invalidate_loaded_model(sender, instance, **kwargs):
+    """
+    Drop a model from the registry and reset active model resolution
+    whenever its row changes, so a new file path, a new version or a
+    deactivation takes effect on the next prediction.
+    """
+    model_registry.invalidate(instance.id)
+    active_models.invalidate()
+
+
+@receiver(post_save, sender=PlayerStats)
+@receiver(post_delete, sender=PlayerStats)
+def invalidate_player_predictions(sender, instance, **kwargs):
+    """
+    Retire cached predictions for a player whose box scores changed.
+    """
+    prediction_cache.invalidate_entity('player', instance.player_id)
+
+
+@receiver(post_save, sender=TeamStats)
+@receiver(post_delete, sender=TeamStats)
+def invalidate_team_predictions(sender, instance, **kwargs):
+    """
+    Retire cached predictions for a team whose box scores changed.
+    """
+    prediction_cache.invalidate_entity('team', instance.team_id)
+
+
+@receiver(post_save, sender=Match)
+def grade_match_predictions(sender, instance, **kwargs):
+    """
+    Grade the match's pending predictions once it is completed.
+    """
+    if instance.is_completed:
+        grading.grade_predictions(Match.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Match)
+def remember_match_date(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored date of an edited match.
+    """
+    if not raw and instance.pk:
+        instance._stored_date = Match.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+
+
+@receiver(post_save, sender=Match)
+def reschedule_match_features(sender, instance, raw=False, **kwargs):
+    """
+    Refresh the rolling features of the match's players and teams when the
+    match is rescheduled, since later games now see a different window.
+    """
+    stored = getattr(instance, '_stored_date', None)
+    if raw or stored is None or stored == instance.date:
+        return
+    feature_store.reschedule_features(instance.pk, stored, instance.date)
+
+
+@receiver(post_save, sender=PlayerStats)
+def grade_player_predictions(sender, instance, **kwargs):
+    """
+    Grade player predictions whose box score arrives after the match was
+    completed.
+    """
+    if instance.match.is_completed:
+        grading.grade_predictions(Match.objects.filter(pk=instance.match_id))
+
+
+@receiver(post_save, sender=PlayerStats)
+@receiver(post_delete, sender=PlayerStats)
+def update_similar_player_totals(sender, instance, **kwargs):
+    """
+    Reload the player's totals in the similar-player index.
+    """
+    similar_players.mark_dirty(instance.player_id)
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def update_similar_player(sender, instance, **kwargs):
+    """
+    Reload a player whose physicals or position may have changed.
+    """
+    similar_players.mark_dirty(instance.id)
+
+
+@receiver(post_save, sender=PlayerStats)
+def update_player_features(sender, instance, **kwargs):
+    """
+    Refresh the player's rolling features from this game onward.
+    """
+    feature_store.update_features('player', instance.player_id, instance.match.date)
+
+
+@receiver(post_delete, sender=PlayerStats)
+def remove_player_features(sender, instance, **kwargs):
+    """
+    Drop the player's snapshot for this game and refresh the later ones.
+    """
+    feature_store.remove_features('player', instance.player_id, instance.match_id, instance.match.date)
+
+
+@receiver(post_save, sender=TeamStats)
+def update_team_features(sender, instance, **kwargs):
+    """
+    Refresh the team's rolling features from this game onward.
+    """
+    feature_store.update_features('team', instance.team_id, instance.match.date)
+
+
+@receiver(post_delete, sender=TeamStats)
+def remove_team_features(sender, instance, **kwargs):
+    """
+    Drop the team's snapshot for this game and refresh the later ones.
+    """
+    feature_store.remove_features('team', instance.team_id, instance.match_id, instance.match.date)
@@ -0,0 +1,167 @@
+"""
+Nearest-neighbour index of similar players.
+
+Each player with at least one box score is described by a vector of
+per-game averages, height, weight and a one-hot position. Numeric columns
+are standardized over all indexed players, so every stat weighs the same
+whatever its scale. The vectors are held in a KD-tree, and top-k queries
+are answered from memory without reading any box scores.
+
+The index keeps per-player box score totals. When PlayerStats or Player
+rows change in this process, only those players' totals are reloaded on
+the next query, and the tree is rebuilt from the totals in memory.
+Changes made by other processes are picked up when the index is fully
+reloaded, every ML_SIMILAR_PLAYERS_TTL seconds.
+"""
+
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Sum
+from sklearn.neighbors import KDTree
+from stats.models import Player, PlayerStats
+
+STAT_FIELDS = ('points', 'assists', 'rebounds', 'steals', 'blocks', 'turnovers', 'minutes_played')
+POSITIONS = [code for code, _ in Player.POSITION_CHOICES]
+
+Snapshot = namedtuple('Snapshot', ['player_ids', 'rows', 'vectors', 'per_game', 'tree'])
+
+
+def player_vectors(totals):
+    """
+    Build (per_game, vectors) matrices from rows of [games, *stat sums,
+    height, weight, position index]. Vectors hold standardized per-game
+    stats and physicals followed by a one-hot position.
+    """
+    games = totals[:, :1]
+    per_game = totals[:, 1:1 + len(STAT_FIELDS)] / games
+    numeric = np.hstack([per_game, totals[:, 1 + len(STAT_FIELDS):3 + len(STAT_FIELDS)]])
+    std = numeric.std(axis=0)
+    std[std == 0] = 1
+    standardized = (numeric - numeric.mean(axis=0)) / std
+    positions = np.zeros((len(totals), len(POSITIONS)))
+    known = totals[:, -1] >= 0
+    positions[np.flatnonzero(known), totals[known, -1].astype(int)] = 1
+    return per_game, np.hstack([standardized, positions])
+
+
+class SimilarPlayerIndex:
+    """
+    Per-process nearest-neighbour index over player stat vectors.
+    """
+    DEFAULT_TTL = 300
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._totals = {}
+        self._dirty = set()
+        self._snapshot = None
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'ML_SIMILAR_PLAYERS_TTL', self.DEFAULT_TTL)
+
+    def mark_dirty(self, player_id):
+        """
+        Reload a player's totals before the next query.
+        """
+        with self._lock:
+            self._dirty.add(player_id)
+
+    def invalidate(self):
+        """
+        Reload every player before the next query.
+        """
+        with self._lock:
+            self._snapshot = None
+            self._expires = 0
+
+    @staticmethod
+    def load_totals(player_ids=None):
+        """
+        Return {player_id: row} of games, stat sums and physicals for every
+        player with box scores (or only the given ones), in two queries.
+        """
+        stats = PlayerStats.objects.all()
+        players = Player.objects.all()
+        if player_ids is not None:
+            stats = stats.filter(player_id__in=player_ids)
+            players = players.filter(pk__in=player_ids)
+        sums = stats.values('player_id').annotate(
+            games=Count('id'), **{field: Sum(field) for field in STAT_FIELDS}
+        ).order_by()
+        physicals = {
+            player_id: (height, weight, POSITIONS.index(position) if position in POSITIONS else -1)
+            for player_id, height, weight, position in players.values_list('id', 'height', 'weight', 'position')
+        }
+        totals = {}
+        for row in sums:
+            player_id = row['player_id']
+            if player_id in physicals:
+                totals[player_id] = np.array(
+                    [row['games'], *(row[field] or 0 for field in STAT_FIELDS), *physicals[player_id]],
+                    dtype=np.float64
+                )
+        return totals
+
+    def snapshot(self):
+        """
+        Return the current index, reloading changed players first.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and not self._dirty and now < self._expires:
+                return self._snapshot
+            if self._snapshot is None or now >= self._expires:
+                self._totals = self.load_totals()
+                self._expires = now + self.ttl
+            else:
+                for player_id in self._dirty:
+                    self._totals.pop(player_id, None)
+                self._totals.update(self.load_totals(self._dirty))
+            self._dirty = set()
+
+            player_ids = np.array(sorted(self._totals), dtype=np.int64)
+            totals = np.array([self._totals[player_id] for player_id in player_ids]).reshape(
+                len(player_ids), 4 + len(STAT_FIELDS)
+            )
+            per_game, vectors = player_vectors(totals)
+            self._snapshot = Snapshot(
+                player_ids=player_ids,
+                rows={player_id: row for row, player_id in enumerate(player_ids.tolist())},
+                vectors=vectors,
+                per_game=per_game,
+                tree=KDTree(vectors) if len(player_ids) else None,
+            )
+            return self._snapshot
+
+    def similar(self, player_id, k=10):
+        """
+        Return up to k (player_id, distance, per-game averages) of the
+        players most similar to a player, nearest first. Raises ValueError
+        if the player has no box scores.
+        """
+        snapshot = self.snapshot()
+        row = snapshot.rows.get(player_id)
+        if row is None:
+            raise ValueError("Player has no stats to compare")
+        count = min(k + 1, len(snapshot.player_ids))
+        distances, rows = snapshot.tree.query(snapshot.vectors[row:row + 1], k=count)
+        return [
+            (
+                int(snapshot.player_ids[neighbour]),
+                float(distance),
+                dict(zip(STAT_FIELDS, snapshot.per_game[neighbour].tolist())),
+            )
+            for distance, neighbour in zip(distances[0], rows[0])
+            if neighbour != row
+        ][:k]
+
+
+similar_players = SimilarPlayerIndex()
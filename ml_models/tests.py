@@ -3,16 +3,55 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from stats.models import Team, Player, Match, PlayerStats, TeamStats
-from ml_models.models import MLModel, Prediction
+from ml_models.models import (
+    MLModel, Prediction, PlayerFeatureSnapshot, TeamFeatureSnapshot, ShadowPrediction, GradingTotals,
+    InferenceTiming, PredictionRollup
+)
+from ml_models.asof import match_feature_frame, player_feature_frame
+from ml_models.backtest import backtest
+from ml_models.comparison import compare_players, comparison_predictions
+from ml_models.features import window_averages
+from ml_models.grading import grade_predictions
+from ml_models.forest import CompiledPipeline, FlatForest, compile_model, tree_mean, tree_predictions
+from ml_models import feature_store, shadow, timing
+from ml_models.schema import FeatureSchema, VectorizedModel, served_features
+from ml_models.retention import prune_predictions
+from ml_models.similarity import similar_players
+from ml_models.registry import ActiveModelTable, ModelRegistry, model_registry, resident_size
 from ml_models.services import ModelService
+from ml_models.warmup import start_server_warm_up, warm_up
+from ml_models.writer import PredictionWriter
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 import datetime
+import joblib
+import json
 import os
 import pickle
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
 
 
+# Keep MLModel saves from writing the stamp file into the checkout
+STAMP_FILE = os.path.join(tempfile.mkdtemp(), '.active_models_stamp')
+
+
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
 class MLModelTests(TestCase):
     """Tests for the MLModel model."""
     
@@ -37,6 +76,7 @@ class MLModelTests(TestCase):
         self.assertEqual(str(model), 'Player Performance Predictor v1.0')
 
 
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
 class PredictionTests(TestCase):
     """Tests for the Prediction model."""
     
@@ -113,11 +153,14 @@ class PredictionTests(TestCase):
         self.assertEqual(str(prediction), f"PLAYER_STATS prediction for {self.player}")
 
 
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
 class ModelServiceTests(TestCase):
     """Tests for the ModelService."""
     
     def setUp(self):
         """Set up test data."""
+        cache.clear()
+        
         # Create teams
         self.team1 = Team.objects.create(
             name='Lakers',
@@ -370,3 +413,1525 @@ class ModelServiceTests(TestCase):
         self.assertEqual(features['away_avg_assists'], 21)  # (22 + 20) / 2
         self.assertEqual(features['away_avg_steals'], 5.5)  # (6 + 5) / 2
         self.assertEqual(features['away_avg_blocks'], 3.5)  # (4 + 3) / 2
+    
+    def test_predict_players_batch(self):
+        """Test predicting a whole roster with a single model call."""
+        bench_player = Player.objects.create(
+            first_name='Bench',
+            last_name='Player',
+            jersey_number=99,
+            position='C',
+            height=2.10,
+            weight=115.0,
+            date_of_birth=datetime.date(2000, 1, 1),
+            team=self.team1
+        )
+        
+        # Train a pipeline on the same feature frame the service builds
+        features = ModelService.prepare_player_features(self.player, self.match3)
+        pipeline = Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=10, random_state=42)),
+        ])
+        pipeline.fit(pd.DataFrame([features]), np.array([[30, 9, 8, 2, 1]]))
+        model_dir = tempfile.mkdtemp()
+        file_path = os.path.join(model_dir, 'player_performance_pipeline.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(pipeline, f)
+        MLModel.objects.create(
+            name='Player Performance Pipeline',
+            version='2.0',
+            model_type='PLAYER_PERFORMANCE',
+            description='Pipeline model for batch predictions',
+            file_path=file_path,
+            is_active=True
+        )
+        
+        predictions, skipped = ModelService.predict_players_batch(
+            [self.player, bench_player], self.match3, model_version='2.0'
+        )
+        self.assertEqual(len(predictions), 1)
+        self.assertEqual(skipped, [bench_player])
+        self.assertEqual(predictions[0].player, self.player)
+        self.assertEqual(predictions[0].match, self.match3)
+        self.assertEqual(predictions[0].prediction_data['points'], 30)
+        self.assertEqual(Prediction.objects.filter(prediction_type='PLAYER_STATS').count(), 1)
+    
+    def test_feature_store_updated_on_new_stats(self):
+        """Test that a new box score updates the player's feature snapshot."""
+        snapshot = PlayerFeatureSnapshot.objects.get(player=self.player, match=self.match2, window=5)
+        self.assertEqual(snapshot.games, 2)
+        self.assertEqual(snapshot.avg_points, 30)
+        
+        match4 = Match.objects.create(
+            home_team=self.team1,
+            away_team=self.team2,
+            date=timezone.now() - datetime.timedelta(days=1),
+            season='2023-24',
+            is_completed=True
+        )
+        PlayerStats.objects.create(
+            player=self.player, match=match4, minutes_played=40, points=36,
+            assists=5, rebounds=9, offensive_rebounds=2, defensive_rebounds=7,
+            steals=3, blocks=2, turnovers=1, personal_fouls=1,
+            field_goals_made=14, field_goals_attempted=24, three_pointers_made=2,
+            three_pointers_attempted=5, free_throws_made=6, free_throws_attempted=7,
+            plus_minus=10
+        )
+        snapshot = PlayerFeatureSnapshot.objects.get(player=self.player, match=match4, window=5)
+        self.assertEqual(snapshot.games, 3)
+        self.assertEqual(snapshot.avg_points, 32)  # (28 + 32 + 36) / 3
+        
+        features = ModelService.prepare_player_features(self.player)
+        self.assertEqual(features['avg_points'], 32)
+        
+        # Deleting the game rolls the features back
+        match4.player_stats.get().delete()
+        features = ModelService.prepare_player_features(self.player)
+        self.assertEqual(features['avg_points'], 30)
+    
+    def test_feature_store_updated_on_changed_stats(self):
+        """Test that editing an old box score refreshes later snapshots."""
+        self.player_stats1.points = 38
+        self.player_stats1.save()
+        snapshot = PlayerFeatureSnapshot.objects.get(player=self.player, match=self.match2, window=5)
+        self.assertEqual(snapshot.avg_points, 35)  # (38 + 32) / 2
+        
+        features = ModelService.prepare_player_features(self.player, self.match2)
+        self.assertEqual(features['avg_points'], 38)
+    
+    def test_feature_store_updated_on_rescheduled_match(self):
+        """Test that moving a match's date refreshes the snapshots around both dates."""
+        # match1 (28 points) moves after match2 (32 points)
+        self.match1.date = self.match2.date + datetime.timedelta(days=1)
+        self.match1.save()
+        snapshot = PlayerFeatureSnapshot.objects.get(player=self.player, match=self.match2, window=5)
+        self.assertEqual((snapshot.games, snapshot.avg_points), (1, 32))
+        snapshot = PlayerFeatureSnapshot.objects.get(player=self.player, match=self.match1, window=5)
+        self.assertEqual((snapshot.as_of, snapshot.games, snapshot.avg_points), (self.match1.date, 2, 30))
+        latest = feature_store.latest_snapshot('player', self.player.id, 5, before=self.match1.date)
+        self.assertEqual(latest.match, self.match2)
+        team_snapshot = TeamFeatureSnapshot.objects.get(team=self.team1, match=self.match2, window=5)
+        self.assertEqual(team_snapshot.games, 1)
+        
+        # The incremental refresh matches a full rebuild
+        def snapshot_rows():
+            return sorted(
+                PlayerFeatureSnapshot.objects.values_list('player', 'match', 'window', 'as_of', 'games', 'avg_points')
+            ) + sorted(
+                TeamFeatureSnapshot.objects.values_list('team', 'match', 'window', 'as_of', 'games', 'avg_points')
+            )
+        
+        expected = snapshot_rows()
+        call_command('rebuild_feature_store', stdout=StringIO())
+        self.assertEqual(snapshot_rows(), expected)
+    
+    def test_prepare_features_reads_snapshots(self):
+        """Test that feature preparation reads one row per entity."""
+        match = Match.objects.select_related('home_team', 'away_team').get(pk=self.match3.pk)
+        with self.assertNumQueries(2):
+            features = ModelService.prepare_player_features(self.player, match)
+        self.assertEqual(features['avg_points'], 30)
+        self.assertEqual(features['avg_opp_points_allowed'], 100)  # (102 + 98) / 2
+        with self.assertNumQueries(2):
+            ModelService.prepare_match_features(match)
+    
+    def test_rebuild_feature_store_command(self):
+        """Test that a rebuild reproduces the incrementally maintained snapshots."""
+        def snapshot_rows():
+            return sorted(
+                PlayerFeatureSnapshot.objects.values_list('player', 'match', 'window', 'games', 'avg_points')
+            ) + sorted(
+                TeamFeatureSnapshot.objects.values_list('team', 'match', 'window', 'games', 'avg_points')
+            )
+        
+        expected = snapshot_rows()
+        PlayerFeatureSnapshot.objects.all().delete()
+        TeamFeatureSnapshot.objects.all().delete()
+        call_command('rebuild_feature_store', stdout=open(os.devnull, 'w'))
+        self.assertEqual(snapshot_rows(), expected)
+        self.assertEqual(TeamFeatureSnapshot.objects.count(), 8)  # 4 games x 2 windows
+    
+    def test_window_averages(self):
+        """Test multi-window averages computed in one query."""
+        with self.assertNumQueries(1):
+            averages = window_averages('player', [self.player.id], [1, 5, 'season'])
+        features = averages[self.player.id]
+        self.assertEqual(features['avg_points_last_1'], 32)
+        self.assertEqual(features['avg_points_last_5'], 30)  # (28 + 32) / 2
+        self.assertEqual(features['avg_points_season'], 30)
+        self.assertEqual(features['avg_plus_minus_last_5'], 10)  # (12 + 8) / 2
+        
+        # Only games before the given date are used
+        averages = window_averages('player', [self.player.id], [5], before=self.match2.date)
+        self.assertEqual(averages[self.player.id]['avg_points_last_5'], 28)
+        
+        # Both teams in one query
+        with self.assertNumQueries(1):
+            averages = window_averages('team', [self.team1.id, self.team2.id], [1])
+        self.assertEqual(averages[self.team1.id]['avg_points_last_1'], 110)
+        self.assertEqual(averages[self.team2.id]['avg_points_last_1'], 98)
+    
+    def test_prepare_features_with_windows(self):
+        """Test adding model-configured windows to the feature dictionaries."""
+        features = ModelService.prepare_player_features(self.player, windows=[1, 'season'])
+        self.assertEqual(features['avg_points'], 30)
+        self.assertEqual(features['avg_points_last_1'], 32)
+        self.assertEqual(features['avg_assists_season'], 9.5)
+        
+        features = ModelService.prepare_match_features(self.match3, windows=[1])
+        self.assertEqual(features['home_avg_points_last_1'], 110)
+        self.assertEqual(features['away_avg_points_last_1'], 98)
+    
+    def test_prepare_features_without_snapshots(self):
+        """Test that features are still computed before the store is rebuilt."""
+        PlayerFeatureSnapshot.objects.all().delete()
+        TeamFeatureSnapshot.objects.all().delete()
+        self.test_prepare_player_features()
+        self.test_prepare_match_features()
+    
+    def test_invalid_feature_windows(self):
+        """Test that invalid windows are rejected."""
+        self.player_model.feature_windows = [3, 'career']
+        with self.assertRaises(ValidationError):
+            self.player_model.full_clean()
+    
+    def test_match_features_exclude_later_games(self):
+        """Test that features for a past match only use earlier games."""
+        features = ModelService.prepare_match_features(self.match2)
+        self.assertEqual(features['home_avg_points'], 102)  # Celtics, match1 only
+        self.assertEqual(features['away_avg_points'], 105)  # Lakers, match1 only
+        self.assertIsNone(ModelService.prepare_match_features(self.match1))
+    
+    def test_match_feature_frame_matches_service(self):
+        """Test that the as-of engine reproduces the per-match features."""
+        frame = match_feature_frame([self.match1, self.match2, self.match3], windows=[1, 'season'])
+        self.assertEqual(list(frame.index), [self.match2.id, self.match3.id])
+        for match in (self.match2, self.match3):
+            expected = ModelService.prepare_match_features(match, windows=[1, 'season'])
+            self.assertEqual(list(frame.columns), list(expected))
+            self.assertEqual(frame.loc[match.id].to_dict(), expected)
+    
+    def test_player_feature_frame_matches_service(self):
+        """Test that the as-of engine reproduces the per-player features."""
+        pairs = [(self.player, self.match1), (self.player, self.match2), (self.player, self.match3), (self.player, None)]
+        frame = player_feature_frame(pairs)
+        self.assertEqual(list(frame.index), [1, 2, 3])
+        for index in frame.index:
+            player, match = pairs[index]
+            expected = ModelService.prepare_player_features(player, match)
+            row = frame.loc[index].dropna().to_dict()
+            self.assertEqual(row, expected)
+    
+    def test_predict_matches_batch(self):
+        """Test predicting many matches with a single model call."""
+        frame = match_feature_frame([self.match2, self.match3])
+        classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        classifier.fit(frame, np.array([0, 1]))
+        model_dir = tempfile.mkdtemp()
+        file_path = os.path.join(model_dir, 'match_outcome_frame.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(classifier, f)
+        MLModel.objects.create(
+            name='Match Outcome Frame',
+            version='2.0',
+            model_type='MATCH_OUTCOME',
+            description='Trained on as-of match features',
+            file_path=file_path
+        )
+        
+        predictions, skipped = ModelService.predict_matches_batch(
+            [self.match1, self.match2, self.match3], model_version='2.0'
+        )
+        self.assertEqual(skipped, [self.match1])
+        self.assertEqual([prediction.match for prediction in predictions], [self.match2, self.match3])
+        single = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        self.assertEqual(predictions[1].prediction_data, single.prediction_data)
+        self.assertEqual(predictions[1].confidence, single.confidence)
+
+    
+    def register_match_classifier(self):
+        """Register a match outcome model trained on the service's features."""
+        features = ModelService.prepare_match_features(self.match3)
+        classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        classifier.fit(pd.DataFrame([features, features]), np.array([0, 1]))
+        file_path = os.path.join(tempfile.mkdtemp(), 'match_outcome_cached.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(classifier, f)
+        return MLModel.objects.create(
+            name='Match Outcome Cached',
+            version='2.0',
+            model_type='MATCH_OUTCOME',
+            description='Trained on service features',
+            file_path=file_path,
+            is_active=True
+        )
+    
+    def register_player_pipeline(self):
+        """Register a player performance pipeline trained on the service's features."""
+        features = ModelService.prepare_player_features(self.player, self.match3)
+        pipeline = Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=10, random_state=42)),
+        ])
+        pipeline.fit(pd.DataFrame([features]), np.array([[30, 9, 8, 2, 1]]))
+        file_path = os.path.join(tempfile.mkdtemp(), 'player_performance_cached.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(pipeline, f)
+        return MLModel.objects.create(
+            name='Player Performance Cached',
+            version='2.0',
+            model_type='PLAYER_PERFORMANCE',
+            description='Trained on service features',
+            file_path=file_path,
+            is_active=True
+        )
+    
+    def test_repeated_match_prediction_is_cached(self):
+        """Test that an unchanged match prediction is reused instead of stored again."""
+        self.register_match_classifier()
+        first = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        second = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Prediction.objects.filter(match=self.match3).count(), 1)
+        self.assertEqual(len(first.feature_hash), 64)
+    
+    def test_stored_prediction_reused_without_cache(self):
+        """Test that a matching stored prediction is found after the cache is cleared."""
+        self.register_match_classifier()
+        first = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        cache.clear()
+        second = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Prediction.objects.filter(match=self.match3).count(), 1)
+    
+    def test_new_stats_invalidate_cached_prediction(self):
+        """Test that new box scores for a team retire its cached predictions."""
+        self.register_match_classifier()
+        first = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        match4 = Match.objects.create(
+            home_team=self.team1,
+            away_team=self.team2,
+            date=timezone.now() - datetime.timedelta(days=1),
+            season='2023-24',
+            home_score=120,
+            away_score=90,
+            is_playoff=False,
+            is_completed=True
+        )
+        TeamStats.objects.create(
+            team=self.team1, match=match4, points=120, assists=30, rebounds=50,
+            offensive_rebounds=10, defensive_rebounds=40, steals=9, blocks=7,
+            turnovers=10, personal_fouls=15, field_goals_made=45,
+            field_goals_attempted=85, three_pointers_made=15,
+            three_pointers_attempted=35, free_throws_made=15, free_throws_attempted=18
+        )
+        second = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        self.assertNotEqual(first.id, second.id)
+        self.assertNotEqual(first.feature_hash, second.feature_hash)
+    
+    def test_repeated_roster_predictions_are_cached(self):
+        """Test that batch player predictions reuse cached predictions."""
+        self.register_player_pipeline()
+        first, _ = ModelService.predict_players_batch([self.player], self.match3, model_version='2.0')
+        second, _ = ModelService.predict_players_batch([self.player], self.match3, model_version='2.0')
+        self.assertEqual([p.id for p in first], [p.id for p in second])
+        self.assertEqual(ModelService.predict_player_performance(self.player, self.match3, model_version='2.0').id, first[0].id)
+        self.assertEqual(Prediction.objects.filter(player=self.player).count(), 1)
+    
+    def test_roster_prediction_queries_do_not_grow_with_roster(self):
+        """Test that batch player predictions build features in a constant number of queries."""
+        def add_player(last_name, points):
+            player = Player.objects.create(
+                first_name='Test',
+                last_name=last_name,
+                jersey_number=1,
+                position='PG',
+                height=1.9,
+                weight=90.0,
+                date_of_birth=datetime.date(1995, 1, 1),
+                team=self.team1
+            )
+            if points is not None:
+                stats = PlayerStats.objects.get(pk=self.player_stats1.pk)
+                stats.pk = None
+                stats.player = player
+                stats.points = points
+                stats.save()
+            return player
+        
+        self.register_player_pipeline()
+        ModelService.predict_players_batch([self.player], self.match3, model_version='2.0')
+        rookie = add_player('Rookie', 12)
+        with CaptureQueriesContext(connection) as single:
+            ModelService.predict_players_batch([rookie], self.match3, model_version='2.0')
+        
+        # Two history loads, one stored prediction lookup and one insert
+        roster = [add_player(f'Player {index}', 10 + index) for index in range(10)]
+        bench = add_player('Bench', None)
+        with self.assertNumQueries(len(single.captured_queries)):
+            predictions, skipped = ModelService.predict_players_batch(
+                [self.player, rookie, bench] + roster, self.match3, model_version='2.0'
+            )
+        self.assertEqual(len(single.captured_queries), 6)
+        self.assertEqual([p.player for p in predictions], [self.player, rookie] + roster)
+        self.assertEqual(skipped, [bench])
+        self.assertEqual(Prediction.objects.filter(match=self.match3).count(), 12)
+    
+    def test_write_behind_predictions_are_cached_once_written(self):
+        """Test that buffered predictions are only cached once they have an id."""
+        self.register_match_classifier()
+        writer = PredictionWriter(enabled=True, flush_interval=None, spill_dir=tempfile.mkdtemp())
+        with mock.patch('ml_models.writer._writer', writer):
+            first = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+            self.assertIsNone(first.pk)
+            self.assertEqual(writer.flush(), 1)
+            second = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+            self.assertIsNotNone(second.pk)
+            # Served from the cache, with the stored row's id
+            third = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        self.assertEqual(third.pk, second.pk)
+        self.assertEqual(Prediction.objects.filter(match=self.match3).count(), 1)
+        self.assertEqual(writer.pending, 0)
+    
+    def test_predict_slate_command(self):
+        """Test that the slate command precomputes predictions the API reuses."""
+        self.register_match_classifier()
+        self.register_player_pipeline()
+        
+        call_command('predict_slate', stdout=StringIO())
+        call_command('predict_slate', stdout=StringIO())
+        match_predictions = Prediction.objects.filter(prediction_type='MATCH_WINNER')
+        player_predictions = Prediction.objects.filter(prediction_type='PLAYER_STATS')
+        self.assertEqual(match_predictions.count(), 1)
+        self.assertEqual(player_predictions.count(), 1)
+        self.assertEqual(match_predictions.get().match, self.match3)
+        
+        # Requests with the same features are served from the stored rows
+        match_prediction = ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        player_prediction = ModelService.predict_player_performance(self.player, self.match3, model_version='2.0')
+        self.assertEqual(match_prediction.id, match_predictions.get().id)
+        self.assertEqual(player_prediction.id, player_predictions.get().id)
+    
+    def test_backfill_predictions_command(self):
+        """Test that the backfill checkpoints partitions and resumes from them."""
+        model_instance = self.register_match_classifier()
+        
+        out = StringIO()
+        call_command('backfill_predictions', workers=1, stdout=out)
+        self.assertIn('already checkpointed', out.getvalue())
+        predictions = Prediction.objects.filter(model=model_instance)
+        self.assertEqual([prediction.match for prediction in predictions], [self.match2])
+        checkpoints = model_instance.backfill_checkpoints.all()
+        self.assertGreaterEqual(checkpoints.count(), 1)
+        self.assertEqual(sum(checkpoint.predictions for checkpoint in checkpoints), 1)
+        self.assertEqual(sum(checkpoint.skipped for checkpoint in checkpoints), 1)
+        
+        # A second run only skips checkpointed partitions
+        out = StringIO()
+        call_command('backfill_predictions', workers=1, stdout=out)
+        self.assertIn('0 partitions to run', out.getvalue())
+        
+        # Restarting reruns every partition without duplicating predictions
+        call_command('backfill_predictions', workers=1, restart=True, stdout=StringIO())
+        self.assertEqual(predictions.count(), 1)
+    
+    def test_warm_up_loads_active_models(self):
+        """Test that warm-up loads every active model and runs a prediction."""
+        self.match_model.is_active = False
+        self.match_model.save()
+        self.player_model.is_active = False
+        self.player_model.save()
+        match_model = self.register_match_classifier()
+        player_model = self.register_player_pipeline()
+        model_registry.clear()
+        
+        timings = warm_up()
+        self.assertEqual(set(timings), {match_model.id, player_model.id})
+        self.assertIn(match_model.id, model_registry)
+        self.assertIn(player_model.id, model_registry)
+    
+    def test_warm_up_only_starts_in_server_processes(self):
+        """Test that loading the app does not warm up, but the server entry point does."""
+        with override_settings(ML_WARM_UP=True), mock.patch('ml_models.warmup.start_warm_up') as start:
+            apps.get_app_config('ml_models').ready()
+            start.assert_not_called()
+            start_server_warm_up()
+            start.assert_called_once_with()
+        with mock.patch('ml_models.warmup.start_warm_up') as start:
+            start_server_warm_up()
+            start.assert_not_called()
+    
+    def test_player_projections_from_trees(self):
+        """Test that player predictions carry quantiles and a spread-based confidence."""
+        features = ModelService.prepare_player_features(self.player, self.match3)
+        rng = np.random.RandomState(0)
+        rows = pd.DataFrame([features] * 40)
+        rows['avg_points'] = rng.normal(30, 5, 40)
+        pipeline = Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=25, random_state=42)),
+        ])
+        pipeline.fit(rows, rng.normal([25, 7, 8, 1, 1], [6, 2, 3, 1, 1], size=(40, 5)))
+        
+        projections = ModelService.project_players(pipeline, rows.iloc[:3])
+        expected = pipeline.predict(rows.iloc[:3])
+        for (prediction_data, confidence), prediction in zip(projections, expected):
+            self.assertEqual(prediction_data['points'], prediction[0])
+            self.assertGreater(confidence, 0)
+            self.assertLess(confidence, 1)
+            for stat in ModelService.PLAYER_OUTPUTS:
+                quantiles = prediction_data['quantiles'][stat]
+                self.assertLessEqual(quantiles['p10'], quantiles['p50'])
+                self.assertLessEqual(quantiles['p50'], quantiles['p90'])
+    
+    def test_shadow_models_run_on_same_features(self):
+        """Test that candidate versions are recorded next to the served prediction."""
+        primary_model = self.register_match_classifier()
+        candidate = MLModel.objects.create(
+            name='Match Outcome Candidate',
+            version='3.0',
+            model_type='MATCH_OUTCOME',
+            description='Staged candidate',
+            file_path=primary_model.file_path,
+            is_active=False
+        )
+        with override_settings(ML_SHADOW_MODELS={'MATCH_OUTCOME': ['3.0']}, ML_SHADOW_WORKERS=0):
+            prediction = ModelService.predict_match_outcome(self.match3)
+        self.assertEqual(prediction.model, primary_model)
+        shadow_prediction = ShadowPrediction.objects.get()
+        self.assertEqual(shadow_prediction.prediction, prediction)
+        self.assertEqual(shadow_prediction.model, candidate)
+        self.assertEqual(shadow_prediction.prediction_data, prediction.prediction_data)
+        self.assertGreaterEqual(shadow_prediction.latency_ms, 0)
+    
+    def test_failed_shadow_run_does_not_fail_prediction(self):
+        """Test that a broken candidate is only logged."""
+        self.register_match_classifier()
+        with override_settings(ML_SHADOW_MODELS={'MATCH_OUTCOME': ['9.9']}, ML_SHADOW_WORKERS=0):
+            with self.assertLogs('ml_models.shadow', level='ERROR'):
+                prediction = ModelService.predict_match_outcome(self.match3)
+        self.assertIsNotNone(prediction.id)
+        self.assertEqual(ShadowPrediction.objects.count(), 0)
+    
+    def test_shadow_runs_dropped_when_pool_is_full(self):
+        """Test that shadow runs are dropped instead of queued without bound."""
+        release = threading.Event()
+        with override_settings(ML_SHADOW_WORKERS=1, ML_SHADOW_MAX_PENDING=1):
+            dropped = shadow.stats()['dropped']
+            self.assertTrue(shadow.submit(release.wait, 5))
+            self.assertFalse(shadow.submit(release.wait, 5))
+            release.set()
+            self.assertEqual(shadow.stats()['dropped'], dropped + 1)
+    
+    def test_backtest_match_model(self):
+        """Test backtesting a match outcome model on completed matches."""
+        model_instance = self.register_match_classifier()
+        summary = backtest(model_instance)
+        
+        # match1 has no earlier games; match2 was an away win
+        self.assertEqual(summary['matches'], 1)
+        self.assertEqual(summary['skipped_matches'], 1)
+        features = ModelService.prepare_match_features(self.match2)
+        home_win = ModelService.load_model(model_instance).predict_proba(pd.DataFrame([features]))[0][1]
+        self.assertEqual(summary['accuracy'], float(home_win < 0.5))
+        self.assertAlmostEqual(summary['brier_score'], home_win ** 2)
+        self.assertAlmostEqual(summary['log_loss'], -np.log(1 - home_win))
+        self.assertEqual(
+            sorted((team['team_id'], team['matches']) for team in summary['teams']),
+            [(self.team1.id, 1), (self.team2.id, 1)]
+        )
+        model_instance.refresh_from_db()
+        self.assertEqual(model_instance.accuracy, summary['accuracy'])
+    
+    def test_backtest_command(self):
+        """Test the backtest management command and its season filter."""
+        model_instance = self.register_match_classifier()
+        out = StringIO()
+        call_command('backtest_model', model_id=model_instance.id, no_save=True, stdout=out)
+        self.assertIn('Brier score', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('backtest_model', model_id=model_instance.id, season_from='2030-31', stdout=StringIO())
+    
+    def create_prediction(self, prediction_type, match, prediction_data, player=None):
+        model = self.match_model if prediction_type == 'MATCH_WINNER' else self.player_model
+        return Prediction.objects.create(
+            model=model,
+            prediction_type=prediction_type,
+            match=match,
+            player=player,
+            prediction_data=prediction_data,
+            confidence=0.7
+        )
+    
+    def test_grade_predictions(self):
+        """Test set-based grading of completed matches and the running totals."""
+        # match1 was a home win for team1; the player scored 28 in match1 and 32 in match2
+        home_pick = self.create_prediction('MATCH_WINNER', self.match1, {'winner_id': self.team1.id})
+        away_pick = self.create_prediction('MATCH_WINNER', self.match1, {'winner_id': self.team2.id})
+        upcoming = self.create_prediction('MATCH_WINNER', self.match3, {'winner_id': self.team1.id})
+        in_range = self.create_prediction(
+            'PLAYER_STATS', self.match1,
+            {'points': 24.0, 'quantiles': {'points': {'p10': 20.0, 'p50': 24.0, 'p90': 29.0}}},
+            player=self.player
+        )
+        too_low = self.create_prediction('PLAYER_STATS', self.match2, {'points': 26.0}, player=self.player)
+        
+        graded = grade_predictions()
+        self.assertEqual(graded, {self.match_model.id: (1, 1), self.player_model.id: (1, 1)})
+        outcomes = dict(Prediction.objects.values_list('id', 'was_correct'))
+        self.assertTrue(outcomes[home_pick.id])
+        self.assertFalse(outcomes[away_pick.id])
+        self.assertIsNone(outcomes[upcoming.id])
+        self.assertTrue(outcomes[in_range.id])
+        self.assertFalse(outcomes[too_low.id])
+        self.assertEqual(self.match_model.grading_totals.accuracy, 0.5)
+        
+        # Graded rows are not counted again
+        self.assertEqual(grade_predictions(Match.objects.filter(season='2023-24')), {})
+        self.assertEqual(GradingTotals.objects.get(model=self.player_model).graded, 2)
+    
+    def test_match_completion_grades_predictions(self):
+        """Test that completing a match grades its predictions."""
+        prediction = self.create_prediction('MATCH_WINNER', self.match3, {'winner_id': self.team2.id})
+        self.match3.home_score = 99
+        self.match3.away_score = 101
+        self.match3.is_completed = True
+        self.match3.save()
+        
+        prediction.refresh_from_db()
+        self.assertTrue(prediction.was_correct)
+        totals = GradingTotals.objects.get(model=self.match_model)
+        self.assertEqual((totals.correct, totals.incorrect), (1, 0))
+        
+        out = StringIO()
+        call_command('grade_predictions', season=['2023-24'], regrade=True, stdout=out)
+        self.assertIn('Cleared 1 existing grades', out.getvalue())
+        totals.refresh_from_db()
+        self.assertEqual((totals.correct, totals.incorrect), (1, 0))
+    
+    def test_train_models_command(self):
+        """Test training models on stored box scores and serving them."""
+        out = StringIO()
+        call_command(
+            'train_models', n_estimators=5, holdout=0, activate=True,
+            output_dir=tempfile.mkdtemp(), window=[3], stdout=out
+        )
+        self.assertIn('Successfully trained models', out.getvalue())
+        
+        # Only the second game of each series has earlier history to learn from
+        player_model = ModelService.get_model('PLAYER_PERFORMANCE')
+        match_model = ModelService.get_model('MATCH_OUTCOME')
+        self.assertEqual((player_model.version, match_model.version), ('2.0', '2.0'))
+        self.assertEqual(player_model.feature_windows, [3])
+        self.assertIn('1 examples', match_model.description)
+        features = ModelService.prepare_player_features(self.player, self.match3, windows=[3])
+        self.assertEqual(
+            sorted(player_model.features.values_list('name', flat=True)), sorted(features)
+        )
+        
+        prediction = ModelService.predict_player_performance(self.player, self.match3)
+        self.assertEqual(prediction.model, player_model)
+        prediction = ModelService.predict_match_outcome(self.match3)
+        self.assertEqual(prediction.prediction_data['winner_id'], self.team2.id)
+        
+        with self.assertRaises(CommandError):
+            call_command('train_models', model_type=['MATCH_OUTCOME'], model_version='2.0', stdout=StringIO())
+    
+    def test_retrain_model_command(self):
+        """Test warm-start retraining on games played since the last training run."""
+        call_command(
+            'train_models', n_estimators=5, holdout=0, output_dir=tempfile.mkdtemp(), stdout=StringIO()
+        )
+        base = MLModel.objects.get(model_type='PLAYER_PERFORMANCE', version='2.0')
+        self.assertEqual(base.trained_until, self.match2.date)
+        
+        match4 = Match.objects.create(
+            home_team=self.team1,
+            away_team=self.team2,
+            date=timezone.now() - datetime.timedelta(days=2),
+            season='2023-24',
+            home_score=101,
+            away_score=99,
+            is_completed=True
+        )
+        for stats in (self.player_stats2, self.team_stats3, self.team_stats4):
+            stats.pk = None
+            stats.match = match4
+            stats.save()
+        
+        out = StringIO()
+        call_command(
+            'retrain_model', base.id, new_trees=3, max_trees=6, holdout=0, compare=True,
+            output_dir=tempfile.mkdtemp(), stdout=out
+        )
+        self.assertIn('full refit', out.getvalue())
+        retrained = MLModel.objects.get(model_type='PLAYER_PERFORMANCE', version='3.0')
+        self.assertEqual(retrained.trained_until, match4.date)
+        model = ModelService.load_model(retrained)
+        self.assertEqual(len(model.estimator.estimators_), 6)
+        features = ModelService.prepare_player_features(self.player, self.match3)
+        self.assertEqual(model.predict([features]).shape, (1, 5))
+        
+        # The only new match is a home win, which cannot grow a two-class forest
+        match_base = MLModel.objects.get(model_type='MATCH_OUTCOME', version='2.0')
+        with self.assertRaises(CommandError):
+            call_command('retrain_model', match_base.id, holdout=0, stdout=StringIO())
+    
+    def test_feature_schema_compiled_at_registration(self):
+        """Test that registered models store their input columns in order."""
+        player_model = self.register_player_pipeline()
+        columns = player_model.feature_schema['columns']
+        self.assertEqual(player_model.feature_schema['dtype'], 'float32')
+        self.assertEqual(columns[0], ['position', 'SF'])
+        self.assertIn('avg_opp_points_allowed', columns)
+        self.assertNotIn('position', columns)
+        
+        match_model = self.register_match_classifier()
+        features = ModelService.prepare_match_features(self.match3)
+        self.assertEqual(match_model.feature_schema['columns'], list(features))
+    
+    def test_vectorized_predictions_match_dataframe(self):
+        """Test that vectorized inputs predict exactly what a feature frame does."""
+        player_instance = self.register_player_pipeline()
+        player_model = ModelService.load_model(player_instance)
+        pipeline = ModelService.read_model_file(player_instance.file_path)
+        features = ModelService.prepare_player_features(self.player, self.match3)
+        X = ModelService.model_input(player_model, [features])
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(player_model.predict(X), pipeline.predict(pd.DataFrame([features])))
+        
+        match_instance = self.register_match_classifier()
+        match_model = ModelService.load_model(match_instance)
+        classifier = ModelService.read_model_file(match_instance.file_path)
+        features = ModelService.prepare_match_features(self.match3)
+        np.testing.assert_array_equal(
+            match_model.predict_proba(ModelService.model_input(match_model, [features])),
+            classifier.predict_proba(pd.DataFrame([features]))
+        )
+    
+    def test_unserved_feature_rejected_at_registration(self):
+        """Test that a model expecting features the service does not build cannot be registered."""
+        features = ModelService.prepare_match_features(self.match3)
+        features['home_elo'] = 1500.0
+        classifier = RandomForestClassifier(n_estimators=2, random_state=42)
+        classifier.fit(pd.DataFrame([features, features]), np.array([0, 1]))
+        file_path = os.path.join(tempfile.mkdtemp(), 'match_outcome_elo.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(classifier, f)
+        model_instance = MLModel(
+            name='Match Outcome Elo',
+            version='2.0',
+            model_type='MATCH_OUTCOME',
+            description='Trained on an extra rating feature',
+            file_path=file_path
+        )
+        with self.assertRaisesMessage(ValidationError, 'home_elo'):
+            model_instance.full_clean()
+        
+        # Saving without validation stores the model without a schema
+        with self.assertLogs('ml_models.signals', level='WARNING'):
+            model_instance.save()
+        self.assertIsNone(MLModel.objects.get(pk=model_instance.pk).feature_schema)
+    
+    def test_feature_schema_only_compiled_when_inputs_change(self):
+        """Test that saves which leave the file, type and windows alone do not read the artifact."""
+        model_instance = self.register_match_classifier()
+        schema = model_instance.feature_schema
+        with mock.patch.object(ModelService, 'read_model_file', wraps=ModelService.read_model_file) as read:
+            model_instance.accuracy = 0.7
+            model_instance.save(update_fields=['accuracy'])
+            model_instance = MLModel.objects.get(pk=model_instance.pk)
+            model_instance.is_active = False
+            model_instance.save()
+            model_instance.full_clean()
+            model_instance.save()
+            self.assertEqual(read.call_count, 1)
+            
+            model_instance.feature_windows = [3]
+            model_instance.save()
+            self.assertEqual(read.call_count, 2)
+        self.assertEqual(MLModel.objects.get(pk=model_instance.pk).feature_schema, schema)
+    
+    def test_feature_schema_vectorize(self):
+        """Test that missing features are NaN and categories are one-hot encoded."""
+        schema = FeatureSchema([('position', 'PG'), ('position', 'SF'), 'height', 'avg_points'])
+        X = schema.vectorize([
+            {'position': 'SF', 'height': 2.06, 'avg_points': None},
+            {'position': 'C', 'height': 2.11},
+        ])
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(X[:, :2], [[0, 1], [0, 0]])
+        self.assertTrue(np.isnan(X[:, 3]).all())
+        self.assertEqual(FeatureSchema.from_dict(schema.to_dict()), schema)
+        frame = pd.DataFrame([{'position': 'SF', 'height': 2.06, 'avg_points': None}])
+        np.testing.assert_array_equal(schema.vectorize_frame(frame), X[:1])
+
+    
+    def test_prediction_stage_timings(self):
+        """Test that enabled timing records every stage of a prediction call."""
+        model_instance = self.register_match_classifier()
+        self.register_player_pipeline()
+        timing.get_aggregator().clear()
+        with override_settings(ML_TIMING_ENABLED=True):
+            ModelService.predict_match_outcome(self.match3, model_version='2.0')
+            # The repeated call is served from the prediction cache
+            ModelService.predict_match_outcome(self.match3, model_version='2.0')
+            ModelService.predict_players_batch([self.player], self.match3, model_version='2.0')
+        self.assertEqual(timing.flush(), 14)
+        
+        rows = {
+            row.stage: row for row in InferenceTiming.objects.filter(
+                model=model_instance, operation='predict_match_outcome'
+            )
+        }
+        self.assertEqual(set(rows), set(timing.STAGES))
+        self.assertEqual(rows['total'].calls, 2)
+        self.assertEqual(rows['cache_lookup'].calls, 2)
+        self.assertEqual(rows['predict'].calls, 1)
+        self.assertEqual(sum(rows['total'].buckets), 2)
+        self.assertGreaterEqual(rows['total'].total_seconds, rows['predict'].total_seconds)
+        
+        out = StringIO()
+        call_command('inference_timings', model_id=[model_instance.id], reset=True, stdout=out)
+        self.assertIn('predict_match_outcome', out.getvalue())
+        self.assertIn('100.0%', out.getvalue())
+        self.assertFalse(InferenceTiming.objects.filter(model=model_instance).exists())
+    
+    def test_timing_disabled_by_default(self):
+        """Test that prediction calls are not timed unless timing is enabled."""
+        self.register_match_classifier()
+        timing.get_aggregator().clear()
+        self.assertIs(timing.start('predict_match_outcome'), timing.NULL_TIMER)
+        ModelService.predict_match_outcome(self.match3, model_version='2.0')
+        self.assertEqual(timing.flush(), 0)
+        self.assertFalse(InferenceTiming.objects.exists())
+    
+    def test_histogram_quantile(self):
+        """Test quantiles estimated from latency histogram buckets."""
+        buckets = [0] * (len(timing.BUCKETS) + 1)
+        buckets[timing.bucket_index(0.003)] += 9
+        buckets[timing.bucket_index(20.0)] += 1
+        self.assertEqual(timing.histogram_quantile(buckets, 0.5, 20.0), 0.005)
+        self.assertEqual(timing.histogram_quantile(buckets, 0.99, 20.0), 20.0)
+        self.assertEqual(timing.histogram_quantile(buckets, 0.5, 0.004), 0.004)
+        self.assertIsNone(timing.histogram_quantile([0] * len(buckets), 0.5))
+    
+    def test_prune_predictions(self):
+        """Test that old superseded predictions are rolled up and deleted."""
+        model_instance = MLModel.objects.create(
+            name='Retention Model',
+            version='1.0',
+            model_type='MATCH_OUTCOME',
+            description='Model whose predictions are pruned',
+            file_path='ml_models/models/missing_model.pkl'
+        )
+        now = timezone.now()
+        
+        def predict(days_ago, **kwargs):
+            prediction = Prediction.objects.create(model=model_instance, confidence=0.6, **kwargs)
+            Prediction.objects.filter(pk=prediction.pk).update(created_at=now - datetime.timedelta(days=days_ago))
+            return prediction
+        
+        # match1 was won by the home team; only the latest prediction is kept
+        superseded = [
+            predict(days_ago, prediction_type='MATCH_WINNER', match=self.match1, team=winner,
+                    prediction_data={'winner_id': winner.id})
+            for days_ago, winner in ((40, self.team1), (39, self.team2), (38, self.team1))
+        ]
+        latest = predict(0, prediction_type='MATCH_WINNER', match=self.match1, team=self.team2,
+                         prediction_data={'winner_id': self.team2.id})
+        # Predictions for an upcoming match are kept until they can be graded
+        pending = [
+            predict(days_ago, prediction_type='MATCH_WINNER', match=self.match3, team=self.team1,
+                    prediction_data={'winner_id': self.team1.id})
+            for days_ago in (40, 39)
+        ]
+        old_projection = predict(40, prediction_type='PLAYER_STATS', player=self.player, prediction_data={'points': 20})
+        last_projection = predict(35, prediction_type='PLAYER_STATS', player=self.player, prediction_data={'points': 22})
+        grade_predictions()
+        totals = GradingTotals.objects.get(model=model_instance)
+        
+        out = StringIO()
+        call_command('prune_predictions', dry_run=True, stdout=out)
+        self.assertIn('4 predictions', out.getvalue())
+        self.assertEqual(Prediction.objects.filter(model=model_instance).count(), 8)
+        
+        self.assertEqual(prune_predictions(batch_size=3), 4)
+        remaining = set(Prediction.objects.filter(model=model_instance).values_list('id', flat=True))
+        self.assertEqual(remaining, {latest.id, last_projection.id} | {prediction.id for prediction in pending})
+        self.assertFalse(Prediction.objects.filter(pk__in=[prediction.id for prediction in superseded]).exists())
+        self.assertFalse(Prediction.objects.filter(pk=old_projection.id).exists())
+        
+        rollups = PredictionRollup.objects.filter(model=model_instance, prediction_type='MATCH_WINNER')
+        self.assertEqual(rollups.count(), 3)
+        self.assertEqual(sum(rollup.predictions for rollup in rollups), 3)
+        self.assertEqual(sum(rollup.graded for rollup in rollups), 3)
+        self.assertEqual(sum(rollup.correct for rollup in rollups), 2)
+        self.assertAlmostEqual(rollups.first().mean_confidence, 0.6)
+        projections = PredictionRollup.objects.get(model=model_instance, prediction_type='PLAYER_STATS')
+        self.assertEqual(projections.predictions, 1)
+        self.assertIsNone(projections.accuracy)
+        
+        # Running grading totals still cover the pruned predictions
+        self.assertEqual(GradingTotals.objects.get(model=model_instance).graded, totals.graded)
+        self.assertEqual(prune_predictions(), 0)
+    
+    def test_prune_predictions_batches(self):
+        """Test the queries and rows pruning touches per batch."""
+        model_instance = MLModel.objects.create(
+            name='Retention Model',
+            version='1.0',
+            model_type='MATCH_OUTCOME',
+            description='Model whose predictions are pruned',
+            file_path='ml_models/models/missing_model.pkl'
+        )
+        predictions = [
+            Prediction(model=model_instance, prediction_type='MATCH_WINNER', match=self.match1, team=winner,
+                       prediction_data={'winner_id': winner.id}, confidence=0.6)
+            for winner in (self.team1, self.team2) * 15
+        ] + [
+            Prediction(model=model_instance, prediction_type='PLAYER_STATS', player=self.player,
+                       prediction_data={'points': 20}, confidence=0.6)
+            for _ in range(30)
+        ]
+        Prediction.objects.bulk_create(predictions)
+        Prediction.objects.update(created_at=timezone.now() - datetime.timedelta(days=40))
+        latest = {
+            Prediction.objects.filter(prediction_type=prediction_type).latest('id').id
+            for prediction_type in ('MATCH_WINNER', 'PLAYER_STATS')
+        }
+        self.assertEqual(prune_predictions(dry_run=True), 58)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(prune_predictions(batch_size=25), 58)
+        # Two grouped lookups of the latest predictions, then per batch of 25
+        # rows: read it, check its latest predictions still exist, roll it up
+        # (one update per rollup row) and delete it, keeping the latest ones
+        batch_reads = [query['sql'] for query in queries if 'LIMIT 25' in query['sql']]
+        self.assertEqual(len(batch_reads), 4)
+        self.assertEqual(len([query for query in queries if 'GROUP BY' in query['sql']]), 2 + 3)
+        self.assertEqual(len(queries), 34)
+        deletes = [
+            query['sql'] for query in queries if query['sql'].startswith('DELETE FROM "ml_models_prediction"')
+        ]
+        self.assertEqual([sql.count(',') + 1 for sql in deletes], [25, 24, 9])
+        self.assertEqual(set(Prediction.objects.values_list('id', flat=True)), latest)
+        self.assertEqual(sum(PredictionRollup.objects.values_list('predictions', flat=True)), 58)
+    
+    def test_similar_players(self):
+        """Test nearest-neighbour search and incremental updates of the similar-player index."""
+        def add_player(position, height, weight, points, rebounds):
+            player = Player.objects.create(
+                first_name='Test',
+                last_name=position,
+                jersey_number=1,
+                position=position,
+                height=height,
+                weight=weight,
+                date_of_birth=datetime.date(1995, 1, 1),
+                team=self.team2
+            )
+            stats = PlayerStats.objects.get(pk=self.player_stats1.pk)
+            stats.pk = None
+            stats.player = player
+            stats.points = points
+            stats.rebounds = rebounds
+            stats.save()
+            return player
+        
+        wing = add_player('SF', 2.03, 110.0, 29, 9)
+        center = add_player('C', 2.16, 125.0, 12, 14)
+        similar_players.invalidate()
+        neighbours = similar_players.similar(self.player.id, k=5)
+        self.assertEqual([player_id for player_id, _, _ in neighbours], [wing.id, center.id])
+        self.assertLess(neighbours[0][1], neighbours[1][1])
+        self.assertEqual(neighbours[0][2]['points'], 29)
+        
+        # Only the changed player is reloaded: totals and physicals
+        rookie = Player.objects.create(
+            first_name='Rookie',
+            last_name='Forward',
+            jersey_number=2,
+            position='SF',
+            height=2.06,
+            weight=113.0,
+            date_of_birth=datetime.date(2003, 1, 1),
+            team=self.team2
+        )
+        with self.assertRaises(ValueError):
+            similar_players.similar(rookie.id)
+        stats = PlayerStats.objects.get(pk=self.player_stats2.pk)
+        stats.pk = None
+        stats.player = rookie
+        stats.save()
+        with self.assertNumQueries(2):
+            neighbours = similar_players.similar(self.player.id, k=1)
+        self.assertEqual([player_id for player_id, _, _ in neighbours], [rookie.id])
+        
+        rookie.delete()
+        self.assertNotIn(rookie.id, [player_id for player_id, _, _ in similar_players.similar(self.player.id)])
+    
+    def test_compare_players_matrix(self):
+        """Test pairwise differences and percentiles for several players at once."""
+        def add_player(last_name, points):
+            player = Player.objects.create(
+                first_name='Test',
+                last_name=last_name,
+                jersey_number=1,
+                position='PG',
+                height=1.9,
+                weight=90.0,
+                date_of_birth=datetime.date(1995, 1, 1),
+                team=self.team2
+            )
+            if points is not None:
+                stats = PlayerStats.objects.get(pk=self.player_stats1.pk)
+                stats.pk = None
+                stats.player = player
+                stats.points = points
+                stats.save()
+            return player
+        
+        guard = add_player('Guard', 20)
+        scorer = add_player('Scorer', 30)
+        bench = add_player('Bench', None)
+        with self.assertNumQueries(2):
+            comparison = compare_players([self.player, guard, scorer, bench], recent_matches=5)
+        
+        self.assertEqual(comparison['skipped_player_ids'], [bench.id])
+        self.assertEqual([player['id'] for player in comparison['players']], [self.player.id, guard.id, scorer.id])
+        self.assertEqual(comparison['players'][0]['games'], 2)
+        self.assertEqual(comparison['players'][0]['averages']['avg_points'], 30)
+        self.assertEqual(comparison['differences']['avg_points'], [[0, 10, 0], [-10, 0, -10], [0, 10, 0]])
+        self.assertEqual(
+            [player['percentiles']['avg_points'] for player in comparison['players']], [75.0, 0.0, 75.0]
+        )
+        
+        model_instance = MLModel.objects.create(
+            name='Player Comparison',
+            version='1.0',
+            model_type='PLAYER_COMPARISON',
+            description='Compares players',
+            file_path='ml_models/models/player_comparison_model_v1.pkl'
+        )
+        predictions = comparison_predictions(model_instance, comparison)
+        self.assertEqual(len(predictions), 3)
+        self.assertEqual(predictions[0].prediction_data['comparison']['points_diff'], 10)
+        self.assertEqual(predictions[0].prediction_data['player2']['id'], guard.id)
+        
+        with self.assertRaises(ValueError):
+            compare_players([self.player] * 51)
+
+
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
+class ModelRegistryTests(TestCase):
+    """Tests for the in-process model registry."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.model_dir = tempfile.mkdtemp()
+        self.instances = []
+        for i in range(3):
+            file_path = os.path.join(self.model_dir, f'model_{i}.pkl')
+            with open(file_path, 'wb') as f:
+                pickle.dump({'model': i, 'padding': 'x' * 100}, f)
+            self.instances.append(MLModel.objects.create(
+                name=f'Registry Model {i}',
+                version='1.0',
+                model_type='MATCH_OUTCOME',
+                description='Registry test model',
+                file_path=file_path
+            ))
+        self.loads = []
+    
+    def loader(self, file_path):
+        self.loads.append(file_path)
+        return ModelService.read_model_file(file_path)
+    
+    def test_model_loaded_once(self):
+        """Test that concurrent lookups only load the artifact once."""
+        registry = ModelRegistry()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get(self.instances[0], self.loader)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result['model'] == 0 for result in results))
+    
+    def test_changed_file_is_reloaded(self):
+        """Test that a replaced artifact is reloaded."""
+        registry = ModelRegistry()
+        instance = self.instances[0]
+        registry.get(instance, self.loader)
+        with open(instance.file_path, 'wb') as f:
+            pickle.dump({'model': 'retrained'}, f)
+        self.assertEqual(registry.get(instance, self.loader)['model'], 'retrained')
+        self.assertEqual(len(self.loads), 2)
+    
+    def test_repointed_file_is_reloaded(self):
+        """Test that a model moved to a copy with the same mtime and size is reloaded."""
+        registry = ModelRegistry()
+        instance = self.instances[0]
+        registry.get(instance, self.loader)
+        copy_path = os.path.join(self.model_dir, 'model_0_copy.pkl')
+        with open(copy_path, 'wb') as f:
+            pickle.dump({'model': 9, 'padding': 'x' * 100}, f)
+        stat = os.stat(instance.file_path)
+        self.assertEqual(os.stat(copy_path).st_size, stat.st_size)
+        os.utime(copy_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        
+        instance.file_path = copy_path
+        self.assertEqual(registry.get(instance, self.loader)['model'], 9)
+        self.assertEqual(self.loads, [os.path.join(self.model_dir, 'model_0.pkl'), copy_path])
+    
+    def test_least_recently_used_model_evicted(self):
+        """Test that the registry stays within its size budget."""
+        size = resident_size(ModelService.read_model_file(self.instances[0].file_path))
+        registry = ModelRegistry(max_bytes=size * 2)
+        registry.get(self.instances[0], self.loader)
+        registry.get(self.instances[1], self.loader)
+        registry.get(self.instances[0], self.loader)
+        registry.get(self.instances[2], self.loader)
+        self.assertIn(self.instances[0].id, registry)
+        self.assertNotIn(self.instances[1].id, registry)
+        self.assertIn(self.instances[2].id, registry)
+        # Evicted and invalidated models do not keep a load lock
+        self.assertEqual(set(registry._load_locks), {self.instances[0].id, self.instances[2].id})
+        registry.invalidate(self.instances[0].id)
+        self.assertEqual(set(registry._load_locks), {self.instances[2].id})
+    
+    def test_memory_mapped_arrays_not_charged(self):
+        """Test that the registry charges loaded arrays but not memory-mapped ones."""
+        forest = RandomForestRegressor(n_estimators=5, random_state=42).fit(
+            np.random.RandomState(0).rand(200, 4), np.random.RandomState(1).rand(200)
+        )
+        nodes = sum(estimator.tree_.node_count for estimator in forest.estimators_)
+        self.assertGreater(resident_size(forest), nodes * 64)
+        
+        path = os.path.join(self.model_dir, 'model.forest')
+        FlatForest.from_estimator(forest).save(path)
+        self.assertLess(resident_size(FlatForest.load(path)), nodes * 8)
+    
+    def test_saving_model_invalidates_registry(self):
+        """Test that saving an MLModel row drops it from the registry."""
+        instance = self.instances[0]
+        ModelService.load_model(instance)
+        self.assertIn(instance.id, model_registry)
+        instance.is_active = False
+        instance.save()
+        self.assertNotIn(instance.id, model_registry)
+    
+    def test_active_model_lookup_runs_no_queries(self):
+        """Test that repeated active model lookups are answered from memory."""
+        latest = ModelService.get_model('MATCH_OUTCOME')
+        self.assertEqual(latest, self.instances[-1])
+        with self.assertNumQueries(0):
+            self.assertEqual(ModelService.get_model('MATCH_OUTCOME'), latest)
+    
+    def test_deactivating_model_changes_resolution(self):
+        """Test that saving an MLModel row resets active model resolution."""
+        self.assertEqual(ModelService.get_model('MATCH_OUTCOME'), self.instances[-1])
+        self.instances[-1].is_active = False
+        self.instances[-1].save()
+        self.assertEqual(ModelService.get_model('MATCH_OUTCOME'), self.instances[-2])
+    
+    def test_stamp_file_invalidates_other_processes(self):
+        """Test that an invalidation in one process is seen by another."""
+        stamp_path = os.path.join(self.model_dir, 'stamp')
+        table, other_table = ActiveModelTable(stamp_path=stamp_path), ActiveModelTable(stamp_path=stamp_path)
+        resolved = []
+        
+        def resolver(model_type, version):
+            resolved.append((model_type, version))
+            return self.instances[0]
+        
+        other_table.get('MATCH_OUTCOME', None, resolver)
+        other_table.get('MATCH_OUTCOME', None, resolver)
+        self.assertEqual(len(resolved), 1)
+        table.invalidate()
+        other_table.get('MATCH_OUTCOME', None, resolver)
+        self.assertEqual(len(resolved), 2)
+    
+    def test_unwritable_stamp_file_does_not_block_saves(self):
+        """Test that models can be saved when the stamp file cannot be written."""
+        blocker = os.path.join(self.model_dir, 'not_a_directory')
+        open(blocker, 'w').close()
+        with override_settings(ML_MODEL_STAMP_FILE=os.path.join(blocker, 'stamp')):
+            with self.assertLogs('ml_models.registry', level='WARNING'):
+                self.instances[0].is_active = False
+                self.instances[0].save()
+        self.assertFalse(MLModel.objects.get(pk=self.instances[0].pk).is_active)
+
+
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
+class FlatForestArtifactTests(TestCase):
+    """Tests for memory-mapped flat forest artifacts."""
+    
+    def setUp(self):
+        """Set up test data."""
+        rng = np.random.RandomState(0)
+        self.X = rng.normal(size=(200, 6))
+        self.regressor = RandomForestRegressor(n_estimators=10, random_state=42)
+        self.regressor.fit(self.X, rng.normal(size=(200, 5)))
+        self.classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        self.classifier.fit(self.X, rng.randint(0, 2, 200))
+        self.model_dir = tempfile.mkdtemp()
+    
+    def test_saved_forest_is_memory_mapped(self):
+        """Test saving and memory-mapping a flat forest."""
+        path = os.path.join(self.model_dir, 'regressor.forest')
+        FlatForest.from_estimator(self.regressor).save(path)
+        self.assertTrue(FlatForest.is_artifact(path))
+        forest = FlatForest.load(path)
+        self.assertIsInstance(forest.value, np.memmap)
+        np.testing.assert_array_equal(forest.predict(self.X), self.regressor.predict(self.X))
+    
+    def test_classifier_round_trip(self):
+        """Test that a saved classifier matches sklearn."""
+        path = os.path.join(self.model_dir, 'classifier.forest')
+        FlatForest.from_estimator(self.classifier).save(path)
+        forest = FlatForest.load(path)
+        np.testing.assert_array_equal(forest.predict(self.X), self.classifier.predict(self.X))
+        np.testing.assert_array_equal(forest.predict_proba(self.X), self.classifier.predict_proba(self.X))
+    
+    def test_convert_model_artifact_command(self):
+        """Test converting a pickled model and loading it through the service."""
+        file_path = os.path.join(self.model_dir, 'classifier.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(self.classifier, f)
+        instance = MLModel.objects.create(
+            name='Flat Classifier',
+            version='1.0',
+            model_type='MATCH_OUTCOME',
+            description='Converted classifier',
+            file_path=file_path
+        )
+        call_command('convert_model_artifact', instance.id, stdout=open(os.devnull, 'w'))
+        instance.refresh_from_db()
+        self.assertEqual(instance.file_path, os.path.join(self.model_dir, 'classifier.forest'))
+        model = ModelService.load_model(instance)
+        self.assertIsInstance(model, FlatForest)
+        np.testing.assert_array_equal(model.predict_proba(self.X), self.classifier.predict_proba(self.X))
+    
+    def test_convert_model_artifact_with_feature_schema(self):
+        """Test converting a model fitted on feature frames keeps its schema and raw estimator."""
+        columns = served_features('MATCH_OUTCOME')
+        rng = np.random.RandomState(1)
+        frame = pd.DataFrame(rng.normal(size=(200, len(columns))), columns=columns)
+        classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        classifier.fit(frame, rng.randint(0, 2, 200))
+        expected = classifier.predict_proba(frame)
+        
+        for output_format, suffix in (('flat', '.forest'), ('joblib', '.joblib')):
+            file_path = os.path.join(self.model_dir, f'frame_classifier_{output_format}.pkl')
+            with open(file_path, 'wb') as f:
+                pickle.dump(classifier, f)
+            instance = MLModel.objects.create(
+                name=f'Frame Classifier {output_format}',
+                version='1.0',
+                model_type='MATCH_OUTCOME',
+                description='Fitted on served features',
+                file_path=file_path
+            )
+            self.assertIsNotNone(instance.feature_schema)
+            # Served through the registry's vectorized wrapper before converting
+            self.assertIsInstance(ModelService.load_model(instance), VectorizedModel)
+            
+            call_command('convert_model_artifact', instance.id, '--format', output_format, stdout=StringIO())
+            instance.refresh_from_db()
+            self.assertTrue(instance.file_path.endswith(suffix))
+            self.assertEqual(instance.feature_schema['columns'], columns)
+            self.assertNotIsInstance(ModelService.read_model_file(instance.file_path), VectorizedModel)
+            np.testing.assert_array_equal(ModelService.load_model(instance).predict_proba(frame), expected)
+    
+    def test_joblib_artifact_is_detected(self):
+        """Test loading a joblib artifact through the service."""
+        file_path = os.path.join(self.model_dir, 'regressor.joblib')
+        joblib.dump(self.regressor, file_path)
+        model = ModelService.read_model_file(file_path)
+        np.testing.assert_array_equal(model.predict(self.X), self.regressor.predict(self.X))
+        # Unpickled trees copy their node arrays, so the registry charges all of them
+        tree_bytes = sum(
+            state['nodes'].nbytes + state['values'].nbytes
+            for state in (estimator.tree_.__getstate__() for estimator in model.estimators_)
+        )
+        self.assertGreater(resident_size(model), tree_bytes)
+
+
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
+class CompiledForestParityTests(TestCase):
+    """Parity tests for the compiled numpy forest backend."""
+    
+    def setUp(self):
+        """Set up test data."""
+        rng = np.random.RandomState(1)
+        self.X_train = rng.normal(size=(300, 8))
+        self.X_test = rng.normal(size=(5000, 8))
+        self.regressor = RandomForestRegressor(n_estimators=20, random_state=42)
+        self.regressor.fit(self.X_train, rng.normal(size=(300, 5)))
+        self.classifier = RandomForestClassifier(n_estimators=20, random_state=42)
+        self.classifier.fit(self.X_train, rng.randint(0, 3, 300))
+    
+    def test_regressor_parity(self):
+        """Test compiled regressor output for small and large batches."""
+        forest = FlatForest.from_estimator(self.regressor)
+        for n_rows in (1, 100, 5000):
+            X = self.X_test[:n_rows]
+            np.testing.assert_array_equal(forest.predict(X), self.regressor.predict(X))
+            np.testing.assert_array_equal(forest.apply(X), self.regressor.apply(X) + forest.roots)
+    
+    def test_tree_predictions_parity(self):
+        """Test that per-tree predictions average to the forest's predictions."""
+        X = self.X_test[:500]
+        outputs = tree_predictions(self.regressor, X)
+        self.assertEqual(outputs.shape, (20, 500, 5))
+        np.testing.assert_array_equal(tree_mean(outputs), self.regressor.predict(X))
+        forest = FlatForest.from_estimator(self.regressor)
+        np.testing.assert_array_equal(tree_predictions(forest, X), outputs)
+        self.assertIsNone(tree_predictions(self.classifier, X))
+    
+    def test_classifier_parity(self):
+        """Test compiled classifier output for small and large batches."""
+        forest = FlatForest.from_estimator(self.classifier)
+        for n_rows in (1, 100, 5000):
+            X = self.X_test[:n_rows]
+            np.testing.assert_array_equal(forest.predict(X), self.classifier.predict(X))
+            np.testing.assert_array_equal(forest.predict_proba(X), self.classifier.predict_proba(X))
+    
+    def test_missing_values_parity(self):
+        """Test that missing values follow the learned sklearn split direction."""
+        rng = np.random.RandomState(2)
+        X_train = self.X_train.copy()
+        X_train[rng.rand(*X_train.shape) < 0.1] = np.nan
+        regressor = RandomForestRegressor(n_estimators=10, random_state=42)
+        regressor.fit(X_train, rng.normal(size=300))
+        X = self.X_test.copy()
+        X[rng.rand(*X.shape) < 0.1] = np.nan
+        forest = FlatForest.from_estimator(regressor)
+        np.testing.assert_array_equal(forest.predict(X), regressor.predict(X))
+    
+    def test_compiled_pipeline_parity(self):
+        """Test compiling a pipeline that encodes categorical features."""
+        frame = pd.DataFrame(self.X_train, columns=[f'f{i}' for i in range(8)])
+        frame['position'] = np.random.RandomState(3).choice(['PG', 'SG', 'SF', 'PF', 'C'], 300)
+        pipeline = Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=10, random_state=42)),
+        ])
+        pipeline.fit(frame, self.regressor.predict(self.X_train))
+        compiled = compile_model(pipeline)
+        self.assertIsInstance(compiled, CompiledPipeline)
+        np.testing.assert_array_equal(compiled.predict(frame), pipeline.predict(frame))
+    
+    def test_benchmark_inference_registered_models(self):
+        """Test benchmarking a registered pipeline and an already flat artifact."""
+        frame = pd.DataFrame(self.X_train, columns=[f'f{i}' for i in range(8)])
+        frame['position'] = np.random.RandomState(3).choice(['PG', 'SG', 'SF', 'PF', 'C'], 300)
+        pipeline = Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=10, random_state=42)),
+        ])
+        pipeline.fit(frame, self.regressor.predict(self.X_train))
+        model_dir = tempfile.mkdtemp()
+        pipeline_path = os.path.join(model_dir, 'pipeline.pkl')
+        with open(pipeline_path, 'wb') as f:
+            pickle.dump(pipeline, f)
+        forest_path = os.path.join(model_dir, 'classifier.forest')
+        FlatForest.from_estimator(self.classifier).save(forest_path)
+        
+        for file_path, expected in ((pipeline_path, 'speedup'), (forest_path, 'already flat')):
+            instance = MLModel.objects.create(
+                name='Benchmarked Model',
+                version=os.path.basename(file_path),
+                model_type='TEAM_PERFORMANCE',
+                description='Benchmarked model',
+                file_path=file_path
+            )
+            out = StringIO()
+            call_command(
+                'benchmark_inference', '--model-id', instance.id, '--rows', '1', '300', '--repeat', '1', stdout=out
+            )
+            self.assertIn(expected, out.getvalue())
+            self.assertIn('Benchmark complete', out.getvalue())
+    
+    def test_numpy_backend_compiles_on_load(self):
+        """Test that the numpy backend compiles models when they are loaded."""
+        model_dir = tempfile.mkdtemp()
+        file_path = os.path.join(model_dir, 'classifier.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(self.classifier, f)
+        instance = MLModel.objects.create(
+            name='Compiled Classifier',
+            version='1.0',
+            model_type='MATCH_OUTCOME',
+            description='Compiled classifier',
+            file_path=file_path
+        )
+        with override_settings(ML_INFERENCE_BACKEND='numpy'):
+            model = ModelService.load_model(instance)
+        self.assertIsInstance(model, FlatForest)
+        np.testing.assert_array_equal(model.predict_proba(self.X_test), self.classifier.predict_proba(self.X_test))
+    
+    def test_large_batches_run_on_sklearn(self):
+        """Test that batches above max_rows run on the source sklearn forest."""
+        regressor = compile_model(self.regressor, max_rows=100)
+        classifier = compile_model(self.classifier, max_rows=100)
+        self.assertIs(regressor.estimator, self.regressor)
+        for n_rows, sklearn_calls in ((100, 0), (101, 1)):
+            X = self.X_test[:n_rows]
+            with mock.patch.object(self.regressor, 'predict', wraps=self.regressor.predict) as predict, \
+                    mock.patch.object(FlatForest, 'apply', autospec=True, side_effect=FlatForest.apply) as apply:
+                np.testing.assert_array_equal(regressor.predict(X), self.regressor.predict(X))
+                np.testing.assert_array_equal(tree_predictions(regressor, X), tree_predictions(self.regressor, X))
+                np.testing.assert_array_equal(classifier.predict_proba(X), self.classifier.predict_proba(X))
+            self.assertEqual(predict.call_count, 1 + sklearn_calls)
+            self.assertEqual(apply.call_count, 0 if sklearn_calls else 3)
+        
+        # Without max_rows every batch runs on the flat arrays
+        self.assertIsNone(compile_model(self.regressor).estimator)
+        file_path = os.path.join(tempfile.mkdtemp(), 'regressor.pkl')
+        with open(file_path, 'wb') as f:
+            pickle.dump(self.regressor, f)
+        instance = MLModel.objects.create(
+            name='Routed Regressor',
+            version='1.0',
+            model_type='PLAYER_PERFORMANCE',
+            description='Routed regressor',
+            file_path=file_path
+        )
+        with override_settings(ML_INFERENCE_BACKEND='numpy', ML_INFERENCE_NUMPY_MAX_ROWS=1000):
+            model = ModelService.load_model(instance)
+        self.assertEqual(model.max_rows, 1000)
+
+
+@override_settings(ML_MODEL_STAMP_FILE=STAMP_FILE)
+class PredictionWriterTests(TestCase):
+    """Tests for write-behind prediction persistence."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.spill_dir = tempfile.mkdtemp()
+        self.model = MLModel.objects.create(
+            name='Writer Model',
+            version='1.0',
+            model_type='PLAYER_PERFORMANCE',
+            description='Writer test model',
+            file_path='/path/to/model.pkl'
+        )
+    
+    def make_predictions(self, count):
+        return [
+            Prediction(
+                model=self.model,
+                prediction_type='PLAYER_STATS',
+                prediction_data={'points': i},
+                confidence=0.5
+            )
+            for i in range(count)
+        ]
+    
+    def spilled_rows(self, writer):
+        with open(writer.spill_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def test_disabled_writer_saves_synchronously(self):
+        """Test that predictions are written immediately when write-behind is off."""
+        writer = PredictionWriter(enabled=False, spill_dir=self.spill_dir)
+        saved = writer.save(self.make_predictions(3))
+        self.assertEqual(Prediction.objects.count(), 3)
+        self.assertTrue(all(prediction.pk for prediction in saved))
+    
+    def test_write_behind_buffers_until_flush(self):
+        """Test that buffered predictions are spilled and written on flush."""
+        writer = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir)
+        writer.save(self.make_predictions(3))
+        self.assertEqual(Prediction.objects.count(), 0)
+        self.assertEqual(writer.pending, 3)
+        self.assertEqual(len(self.spilled_rows(writer)), 3)
+        
+        self.assertEqual(writer.flush(), 3)
+        self.assertEqual(Prediction.objects.count(), 3)
+        self.assertEqual(writer.pending, 0)
+        self.assertEqual(self.spilled_rows(writer), [])
+    
+    def test_full_buffer_falls_back_to_synchronous_writes(self):
+        """Test that predictions beyond max_pending are written immediately."""
+        writer = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir, max_pending=2)
+        writer.save(self.make_predictions(3))
+        self.assertEqual(Prediction.objects.count(), 3)
+        self.assertEqual(writer.pending, 0)
+    
+    def write_spill_file(self, name, count):
+        with open(os.path.join(self.spill_dir, name), 'w') as f:
+            for i in range(count):
+                f.write(json.dumps({
+                    'model_id': self.model.id,
+                    'prediction_type': 'PLAYER_STATS',
+                    'match_id': None,
+                    'player_id': None,
+                    'team_id': None,
+                    'prediction_data': {'points': i},
+                    'confidence': 0.5,
+                }) + '\n')
+    
+    def test_spill_from_dead_process_is_replayed(self):
+        """Test that rows spilled by a writer that died are inserted."""
+        dead = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir)
+        dead.save(self.make_predictions(2))
+        # The kernel drops the lock when a process dies
+        dead._spill_file.close()
+        
+        writer = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir)
+        self.assertEqual(writer.replay_spill(), 2)
+        self.assertEqual(Prediction.objects.count(), 2)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+    
+    def test_spill_from_reused_pid_is_replayed(self):
+        """Test that a predecessor's spill file is replayed when the process id is reused."""
+        self.write_spill_file(f'predictions-{os.getpid()}.jsonl', 2)
+        self.write_spill_file(f'predictions-{os.getpid()}-0123456789abcdef.jsonl', 3)
+        
+        writer = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir)
+        self.assertEqual(writer.replay_spill(), 5)
+        writer.save(self.make_predictions(1))
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(Prediction.objects.count(), 6)
+        self.assertEqual(os.listdir(self.spill_dir), [os.path.basename(writer.spill_path)])
+    
+    def test_live_process_spill_is_not_replayed(self):
+        """Test that a running writer's pending rows are not replayed, even from the same process."""
+        writer = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir)
+        writer.save(self.make_predictions(2))
+        self.assertEqual(writer.replay_spill(), 0)
+        other = PredictionWriter(enabled=True, flush_interval=None, spill_dir=self.spill_dir)
+        self.assertEqual(other.replay_spill(), 0)
+        self.assertEqual(Prediction.objects.count(), 0)
+        
+        # The lock follows the spill file through rewrites
+        writer.save(self.make_predictions(1))
+        self.assertEqual(writer.flush(), 3)
+        writer.save(self.make_predictions(1))
+        self.assertEqual(other.replay_spill(), 0)
+        self.assertEqual(Prediction.objects.count(), 3)
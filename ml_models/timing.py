@@ -0,0 +1,227 @@
+"""
+Per-stage timing of ModelService prediction calls.
+
+When ML_TIMING_ENABLED is set, every prediction call records how long it
+spent in each stage (resolving the model, preparing features, the cache
+lookup, loading the model, predicting and saving) and how many rows each
+stage handled. Timings are aggregated in memory per model, operation and
+stage into fixed-bucket latency histograms. Every ML_TIMING_FLUSH_INTERVAL
+seconds they are added to the InferenceTiming rows, so the totals cover
+every process. When timing is disabled, calls get a shared no-op timer.
+"""
+
+import atexit
+import bisect
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from ml_models.models import InferenceTiming, MLModel
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('get_model', 'prepare_features', 'cache_lookup', 'load_model', 'predict', 'save', 'total')
+
+# Upper bounds of the histogram buckets in seconds; a final bucket holds slower calls
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def bucket_index(seconds):
+    """
+    Return the index of the histogram bucket a duration falls into.
+    """
+    return bisect.bisect_left(BUCKETS, seconds)
+
+
+def histogram_quantile(buckets, q, max_seconds=None):
+    """
+    Estimate the q-quantile of a histogram as the upper bound of the bucket
+    it falls into, capped at the slowest recorded duration.
+    """
+    count = sum(buckets)
+    if not count:
+        return None
+    seen = 0
+    for index, bucket_count in enumerate(buckets):
+        seen += bucket_count
+        if bucket_count and seen >= q * count:
+            if index == len(BUCKETS):
+                return max_seconds
+            return BUCKETS[index] if max_seconds is None else min(BUCKETS[index], max_seconds)
+    return max_seconds
+
+
+class StageTimes:
+    """
+    Aggregated durations and row counts of one stage.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds, rows):
+        self.calls += 1
+        self.rows += rows
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bucket_index(seconds)] += 1
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.rows += other.rows
+        self.total_seconds += other.total_seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+
+class TimingAggregator:
+    """
+    In-process stage timings, keyed by (model_id, operation, stage), which
+    are periodically added to the InferenceTiming table.
+    """
+
+    def __init__(self, flush_interval=10.0):
+        self.flush_interval = flush_interval
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, model_id, operation, stages):
+        """
+        Add the {stage: (seconds, rows)} of one call, flushing to the
+        database once the flush interval has elapsed.
+        """
+        with self._lock:
+            for stage, (seconds, rows) in stages.items():
+                key = (model_id, operation, stage)
+                times = self._stages.get(key)
+                if times is None:
+                    times = self._stages[key] = StageTimes()
+                times.add(seconds, rows)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Add the timings recorded since the last flush to InferenceTiming.
+        Timings of models deleted meanwhile are dropped; on a database
+        error they are kept for the next flush. Returns the number of rows
+        updated.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._stages = self._stages, {}
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                with transaction.atomic():
+                    model_ids = set(MLModel.objects.filter(
+                        pk__in={model_id for model_id, _, _ in pending}
+                    ).values_list('id', flat=True))
+                    updated = 0
+                    for (model_id, operation, stage), times in pending.items():
+                        if model_id not in model_ids:
+                            continue
+                        row, _ = InferenceTiming.objects.select_for_update().get_or_create(
+                            model_id=model_id, operation=operation, stage=stage
+                        )
+                        row.add(times)
+                        row.save()
+                        updated += 1
+                return updated
+            except Exception:
+                logger.exception("Could not write inference timings")
+                with self._lock:
+                    for key, times in pending.items():
+                        self._stages.setdefault(key, StageTimes()).merge(times)
+                return 0
+
+    def clear(self):
+        with self._lock:
+            self._stages = {}
+
+
+class StageTimer:
+    """
+    Times the stages of one prediction call. Each lap() closes the stage
+    that ran since the previous lap (or since the timer started).
+    """
+
+    def __init__(self, operation, aggregator):
+        self.operation = operation
+        self.aggregator = aggregator
+        self.started = self._last = time.perf_counter()
+        self.stages = {}
+
+    def lap(self, stage, rows=1):
+        now = time.perf_counter()
+        seconds, counted = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (seconds + now - self._last, counted + rows)
+        self._last = now
+
+    def finish(self, model_instance, rows=1):
+        """
+        Record the call's stages and its total time against a model.
+        """
+        self.stages['total'] = (time.perf_counter() - self.started, rows)
+        self.aggregator.record(model_instance.id, self.operation, self.stages)
+
+
+class NullTimer:
+    """
+    Timer used while timing is disabled; every call is a no-op.
+    """
+
+    def lap(self, stage, rows=1):
+        pass
+
+    def finish(self, model_instance, rows=1):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator():
+    """
+    Return the process-wide timing aggregator.
+    """
+    global _aggregator
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = TimingAggregator(getattr(settings, 'ML_TIMING_FLUSH_INTERVAL', 10.0))
+                atexit.register(_aggregator.flush)
+    return _aggregator
+
+
+def start(operation):
+    """
+    Return a timer for one call of a ModelService operation.
+    """
+    if not getattr(settings, 'ML_TIMING_ENABLED', False):
+        return NULL_TIMER
+    return StageTimer(operation, get_aggregator())
+
+
+def flush():
+    """
+    Write this process's pending timings, if any.
+    """
+    if _aggregator is not None:
+        return _aggregator.flush()
+    return 0
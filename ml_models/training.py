@@ -0,0 +1,432 @@
+"""
+Training of player performance and match outcome models on stored box scores.
+
+Training examples are streamed from the database in chunks. Each chunk's
+point-in-time features come from the as-of engine and are copied into
+preallocated arrays, so peak memory is the final training matrix plus one
+chunk, however many seasons are read. The feature columns are exactly those
+ModelService builds at prediction time, so a trained artifact can be
+registered and served as is.
+"""
+
+import collections
+import datetime
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from ml_models.asof import StatsHistory, iter_chunks, match_feature_frame, player_feature_frame
+from ml_models.features import validate_windows
+from ml_models.models import MLModel, ModelFeature
+from ml_models.services import ModelService
+from stats.models import Match, Player, PlayerStats
+
+TRAINING_CHUNK_SIZE = 5000
+MODELS_DIR = 'ml_models/models'
+
+MODEL_NAMES = {
+    'PLAYER_PERFORMANCE': 'Player Performance Predictor',
+    'MATCH_OUTCOME': 'Match Outcome Predictor',
+}
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Lightweight stand-in for a Match, with the fields the as-of engine reads
+MatchRow = collections.namedtuple('MatchRow', 'id date home_team_id away_team_id')
+
+
+def to_microseconds(value):
+    """
+    Convert a datetime to exact epoch microseconds, so training cutoffs
+    compare equal to the match dates they came from.
+    """
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def from_microseconds(value):
+    return EPOCH + datetime.timedelta(microseconds=int(value))
+
+
+class TrainingSet:
+    """
+    Feature columns, targets and match timestamps copied chunk by chunk
+    into arrays allocated once for the largest possible number of examples.
+    """
+
+    def __init__(self, size, target_shape=()):
+        self.size = size
+        self.count = 0
+        self.columns = None
+        self.targets = np.empty((size, *target_shape), dtype=np.float64)
+        self.timestamps = np.empty(size, dtype=np.int64)
+
+    def add(self, frame, targets, timestamps):
+        if frame.empty:
+            return
+        if self.columns is None:
+            self.columns = {
+                name: np.empty(self.size, dtype=frame[name].to_numpy().dtype) for name in frame.columns
+            }
+        end = self.count + len(frame)
+        for name, column in self.columns.items():
+            column[self.count:end] = frame[name].to_numpy()
+        self.targets[self.count:end] = targets
+        self.timestamps[self.count:end] = timestamps
+        self.count = end
+
+    def frame(self):
+        """
+        Return (features_df, targets, timestamps) trimmed to the examples
+        added. Timestamps are the epoch microseconds of each example's match.
+        """
+        if not self.count:
+            raise ValueError("No training examples with enough history")
+        features_df = pd.DataFrame({name: column[:self.count] for name, column in self.columns.items()})
+        return features_df, self.targets[:self.count], self.timestamps[:self.count]
+
+
+def player_training_set(seasons=None, windows=None, after=None, chunk_size=TRAINING_CHUNK_SIZE):
+    """
+    Return (features_df, targets, timestamps) with one example per box
+    score, optionally only for matches played after a datetime: the
+    player's features as of the match, and the points, assists, rebounds,
+    steals and blocks they recorded in it.
+    """
+    rows = PlayerStats.objects.filter(match__is_completed=True)
+    if seasons:
+        rows = rows.filter(match__season__in=seasons)
+    if after:
+        rows = rows.filter(match__date__gt=after)
+    rows = rows.order_by('match__date', 'id').values_list(
+        'player_id', 'match_id', 'match__date', 'match__home_team_id', 'match__away_team_id',
+        *ModelService.PLAYER_OUTPUTS
+    )
+
+    players = Player.objects.in_bulk()
+    player_history = StatsHistory.load('player')
+    team_history = StatsHistory.load('team')
+    training_set = TrainingSet(rows.count(), (len(ModelService.PLAYER_OUTPUTS),))
+
+    for chunk in iter_chunks(rows.iterator(chunk_size=chunk_size), chunk_size):
+        pairs = [(players[row[0]], MatchRow(row[1], row[2], row[3], row[4])) for row in chunk]
+        frame = player_feature_frame(
+            pairs, windows=windows, player_history=player_history, team_history=team_history
+        )
+        kept = [chunk[position] for position in frame.index]
+        training_set.add(
+            frame,
+            [row[5:] for row in kept],
+            [to_microseconds(row[2]) for row in kept]
+        )
+    return training_set.frame()
+
+
+def match_training_set(seasons=None, windows=None, after=None, chunk_size=TRAINING_CHUNK_SIZE):
+    """
+    Return (features_df, targets, timestamps) with one example per
+    completed match, optionally only for matches played after a datetime:
+    both teams' features as of the match, and 1 for a home win.
+    """
+    rows = Match.objects.filter(is_completed=True, home_score__isnull=False, away_score__isnull=False)
+    if seasons:
+        rows = rows.filter(season__in=seasons)
+    if after:
+        rows = rows.filter(date__gt=after)
+    rows = rows.order_by('date', 'id').values_list(
+        'id', 'date', 'home_team_id', 'away_team_id', 'home_score', 'away_score'
+    )
+
+    team_history = StatsHistory.load('team')
+    training_set = TrainingSet(rows.count())
+
+    for chunk in iter_chunks(rows.iterator(chunk_size=chunk_size), chunk_size):
+        frame = match_feature_frame(
+            [MatchRow(*row[:4]) for row in chunk], windows=windows, team_history=team_history
+        )
+        by_id = {row[0]: row for row in chunk}
+        kept = [by_id[match_id] for match_id in frame.index]
+        training_set.add(
+            frame,
+            [float(row[4] > row[5]) for row in kept],
+            [to_microseconds(row[1]) for row in kept]
+        )
+
+    features_df, targets, timestamps = training_set.frame()
+    return features_df, targets.astype(int), timestamps
+
+
+def build_estimator(model_type, n_estimators=100, random_state=None):
+    """
+    Return an unfitted estimator for a model type. Player models one-hot
+    encode the position column; every other feature is numeric.
+    """
+    if model_type == 'PLAYER_PERFORMANCE':
+        return Pipeline([
+            ('encode', ColumnTransformer(
+                [('position', OneHotEncoder(handle_unknown='ignore'), ['position'])],
+                remainder='passthrough'
+            )),
+            ('forest', RandomForestRegressor(n_estimators=n_estimators, n_jobs=-1, random_state=random_state)),
+        ])
+    return RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=random_state)
+
+
+def feature_importances(estimator, columns):
+    """
+    Return {column: importance}, adding up the one-hot columns of a
+    position encoder into a single 'position' importance.
+    """
+    if isinstance(estimator, Pipeline):
+        encoder = estimator.named_steps['encode']
+        forest = estimator.steps[-1][1]
+        importances = dict.fromkeys(columns, 0.0)
+        for name, importance in zip(encoder.get_feature_names_out(), forest.feature_importances_):
+            transformer, column = name.split('__', 1)
+            importances['position' if transformer == 'position' else column] += float(importance)
+        return importances
+    return dict(zip(columns, map(float, estimator.feature_importances_)))
+
+
+def evaluate(model_type, estimator, features_df, targets):
+    """
+    Score a fitted estimator on held-out examples: accuracy for match
+    outcome models, mean absolute error per stat for player models.
+    """
+    predicted = estimator.predict(features_df)
+    if model_type == 'MATCH_OUTCOME':
+        return {'accuracy': float(np.mean(predicted == targets))}
+    errors = np.abs(predicted - targets).mean(axis=0)
+    return {f'mae_{stat}': float(error) for stat, error in zip(ModelService.PLAYER_OUTPUTS, errors)}
+
+
+def next_version(name):
+    """
+    Return the next major version for a model name, e.g. '3.0' after '2.0'.
+    """
+    majors = []
+    for version in MLModel.objects.filter(name=name).values_list('version', flat=True):
+        try:
+            majors.append(int(float(version)))
+        except ValueError:
+            continue
+    return f'{max(majors, default=0) + 1}.0'
+
+
+def holdout_split(timestamps, holdout):
+    """
+    Return the index that splits date-ordered examples into training rows
+    and the most recent `holdout` fraction. Examples from the same match
+    time stay on the same side.
+    """
+    split = len(timestamps) - int(len(timestamps) * holdout)
+    if split < len(timestamps):
+        split = int(np.searchsorted(timestamps, timestamps[split], side='left'))
+    if split <= 0:
+        raise ValueError("Not enough training examples for the holdout")
+    return split
+
+
+def check_version(name, version):
+    """
+    Return the version to register a model under, rejecting one that exists.
+    """
+    version = version or next_version(name)
+    if MLModel.objects.filter(name=name, version=version).exists():
+        raise ValueError(f"{name} v{version} already exists")
+    return version
+
+
+def register_model(estimator, model_type, name, version, description, columns, windows,
+                   trained_until, accuracy=None, activate=False, models_dir=MODELS_DIR):
+    """
+    Save a fitted estimator in models_dir and register it as a new MLModel
+    version with a ModelFeature row per feature column.
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    file_path = os.path.join(models_dir, f"{model_type.lower()}_model_v{version.replace('.', '_')}.pkl")
+    with open(file_path, 'wb') as f:
+        pickle.dump(estimator, f)
+
+    with transaction.atomic():
+        if activate:
+            MLModel.objects.filter(model_type=model_type, is_active=True).update(is_active=False)
+        model_instance = MLModel(
+            name=name,
+            version=version,
+            model_type=model_type,
+            description=description,
+            file_path=file_path,
+            is_active=activate,
+            accuracy=accuracy,
+            feature_windows=windows,
+            trained_until=trained_until,
+        )
+        try:
+            model_instance.clean()
+        except ValidationError as e:
+            raise ValueError('; '.join(e.messages))
+        model_instance.save()
+        ModelFeature.objects.bulk_create([
+            ModelFeature(model=model_instance, name=column, description=f'Feature column {column}', importance=importance)
+            for column, importance in feature_importances(estimator, columns).items()
+        ])
+    return model_instance
+
+
+def train_model(model_type, seasons=None, windows=None, n_estimators=100, holdout=0.2, version=None,
+                activate=False, models_dir=MODELS_DIR, random_state=None, chunk_size=TRAINING_CHUNK_SIZE):
+    """
+    Train a player performance or match outcome model on stored box scores,
+    save the artifact in models_dir and register it as a new MLModel
+    version with its ModelFeature rows. The latest `holdout` fraction of
+    examples, by match date, is kept out of training to score the model.
+    Returns (model_instance, metrics).
+    """
+    if model_type not in MODEL_NAMES:
+        raise ValueError(f"Training is not supported for {model_type} models")
+    windows = validate_windows(windows or [])
+    name = MODEL_NAMES[model_type]
+    version = check_version(name, version)
+    build = player_training_set if model_type == 'PLAYER_PERFORMANCE' else match_training_set
+    features_df, targets, timestamps = build(seasons=seasons, windows=windows, chunk_size=chunk_size)
+
+    # Examples arrive in match date order, so the holdout is the most recent games
+    split = holdout_split(timestamps, holdout)
+    started = time.perf_counter()
+    estimator = build_estimator(model_type, n_estimators, random_state)
+    estimator.fit(features_df.iloc[:split], targets[:split])
+
+    metrics = {
+        'examples': len(features_df),
+        'training_examples': split,
+        'training_seconds': time.perf_counter() - started,
+    }
+    if split < len(features_df):
+        metrics.update(evaluate(model_type, estimator, features_df.iloc[split:], targets[split:]))
+        metrics['holdout_from'] = from_microseconds(timestamps[split]).isoformat()
+
+    model_instance = register_model(
+        estimator, model_type, name, version,
+        description=(
+            f"Random forest trained on {split} examples"
+            + (f" from seasons {', '.join(seasons)}" if seasons else '')
+        ),
+        columns=list(features_df.columns),
+        windows=windows,
+        trained_until=from_microseconds(timestamps[split - 1]),
+        accuracy=metrics.get('accuracy'),
+        activate=activate,
+        models_dir=models_dir
+    )
+    return model_instance, metrics
+
+
+def add_trees(estimator, features_df, targets, new_trees, max_trees=None, random_state=None):
+    """
+    Grow a fitted random forest (or a Pipeline ending in one) in place with
+    warm_start: `new_trees` trees are fitted on the given examples only and
+    appended, then the oldest trees are dropped beyond `max_trees`. The
+    preprocessing steps of a Pipeline are reused as fitted, so the new
+    trees see the same encoded columns as the old ones.
+    """
+    forest = estimator
+    X = features_df
+    if isinstance(estimator, Pipeline):
+        forest = estimator.steps[-1][1]
+        if len(estimator.steps) > 1:
+            X = Pipeline(estimator.steps[:-1]).transform(features_df)
+    if not isinstance(forest, (RandomForestClassifier, RandomForestRegressor)):
+        raise ValueError("Only sklearn random forests can be retrained incrementally")
+    if isinstance(forest, RandomForestClassifier) and set(np.unique(targets)) != set(forest.classes_):
+        # Trees fitted on fewer classes would not line up with the old ones
+        raise ValueError("New examples must include every class the model predicts")
+
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + new_trees, n_jobs=-1)
+    if random_state is not None:
+        forest.set_params(random_state=random_state)
+    forest.fit(X, targets)
+    forest.set_params(warm_start=False)
+    if max_trees and len(forest.estimators_) > max_trees:
+        forest.estimators_ = forest.estimators_[-max_trees:]
+        forest.set_params(n_estimators=max_trees)
+    return estimator
+
+
+def retrain_model(base_instance, new_trees=20, max_trees=None, holdout=0.2, version=None, activate=False,
+                  compare=False, models_dir=MODELS_DIR, random_state=None, chunk_size=TRAINING_CHUNK_SIZE):
+    """
+    Register a new version of a trained model with `new_trees` trees added,
+    fitted only on examples from matches after the base model's
+    trained_until. The latest `holdout` fraction of those examples scores
+    the new version. With compare=True, a forest of the same size is also
+    refitted from scratch on every stored example before the holdout and
+    scored on the same holdout, under metrics['full_refit'].
+    Returns (model_instance, metrics).
+    """
+    model_type = base_instance.model_type
+    if model_type not in MODEL_NAMES:
+        raise ValueError(f"Training is not supported for {model_type} models")
+    if base_instance.trained_until is None:
+        raise ValueError(f"{base_instance} has no recorded training cutoff; train it with train_models first")
+    version = check_version(base_instance.name, version)
+    windows = base_instance.feature_windows
+    build = player_training_set if model_type == 'PLAYER_PERFORMANCE' else match_training_set
+    try:
+        features_df, targets, timestamps = build(
+            windows=windows, after=base_instance.trained_until, chunk_size=chunk_size
+        )
+    except ValueError:
+        raise ValueError(f"No new examples since {base_instance.trained_until:%Y-%m-%d %H:%M}")
+
+    split = holdout_split(timestamps, holdout)
+    started = time.perf_counter()
+    estimator = add_trees(
+        ModelService.read_model_file(base_instance.file_path),
+        features_df.iloc[:split], targets[:split], new_trees, max_trees, random_state
+    )
+    forest = estimator.steps[-1][1] if isinstance(estimator, Pipeline) else estimator
+    metrics = {
+        'examples': len(features_df),
+        'training_examples': split,
+        'training_seconds': time.perf_counter() - started,
+        'trees': len(forest.estimators_),
+    }
+    holdout_df, holdout_targets = features_df.iloc[split:], targets[split:]
+    if len(holdout_df):
+        metrics.update(evaluate(model_type, estimator, holdout_df, holdout_targets))
+        metrics['holdout_from'] = from_microseconds(timestamps[split]).isoformat()
+
+    if compare:
+        all_df, all_targets, all_timestamps = build(windows=windows, chunk_size=chunk_size)
+        training = all_timestamps < timestamps[split] if len(holdout_df) else slice(None)
+        refit_started = time.perf_counter()
+        refit = build_estimator(model_type, len(forest.estimators_), random_state)
+        refit.fit(all_df[training], all_targets[training])
+        metrics['full_refit'] = {
+            'training_examples': len(all_df[training]),
+            'training_seconds': time.perf_counter() - refit_started,
+        }
+        if len(holdout_df):
+            metrics['full_refit'].update(evaluate(model_type, refit, holdout_df, holdout_targets))
+
+    model_instance = register_model(
+        estimator, model_type, base_instance.name, version,
+        description=(
+            f"Warm-started from v{base_instance.version} with {new_trees} trees "
+            f"fitted on {split} new examples"
+        ),
+        columns=list(features_df.columns),
+        windows=windows,
+        trained_until=from_microseconds(timestamps[split - 1]),
+        accuracy=metrics.get('accuracy'),
+        activate=activate,
+        models_dir=models_dir
+    )
+    return model_instance, metrics
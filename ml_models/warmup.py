@@ -0,0 +1,128 @@
+"""
+Model warm-up at process start.
+
+Warming up loads every active MLModel into the model registry and runs one
+prediction per model on real features, so the first request after a deploy
+does not pay for unpickling artifacts or for first-call overhead in pandas
+and sklearn. Warm-up runs in a background thread; readiness is per process
+and is reported by the /api/health/ready/ endpoint. It is started from the
+WSGI and ASGI entry points, so management commands such as migrate never
+query the models at startup.
+"""
+
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from ml_models.models import MLModel
+from ml_models.services import ModelService
+from stats.models import Match, PlayerStats
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# Model types whose artifacts are loaded to serve predictions
+MODEL_TYPES = ('PLAYER_PERFORMANCE', 'MATCH_OUTCOME')
+
+_lock = threading.Lock()
+_state = {'pid': None, 'status': PENDING, 'models': {}, 'error': None}
+
+
+def sample_features(model_instance):
+    """
+    Return a one-row list of features for a model, built from the latest
+    game in the database, or None if there is no data to build one from.
+    """
+    windows = model_instance.feature_windows
+    if model_instance.model_type == 'PLAYER_PERFORMANCE':
+        stats = PlayerStats.objects.select_related('player', 'match').order_by('-match__date').first()
+        features = stats and ModelService.prepare_player_features(stats.player, stats.match, windows=windows)
+    elif model_instance.model_type == 'MATCH_OUTCOME':
+        match = Match.objects.select_related('home_team', 'away_team').order_by('-date').first()
+        features = match and ModelService.prepare_match_features(match, windows=windows)
+    else:
+        features = None
+    return [features] if features else None
+
+
+def warm_up():
+    """
+    Load every active prediction model and run a prediction with each.
+    Returns {model_id: seconds spent warming it}.
+    """
+    timings = {}
+    model_instances = MLModel.objects.filter(
+        is_active=True, model_type__in=MODEL_TYPES
+    ).order_by('model_type', '-created_at')
+    for model_instance in model_instances:
+        started = time.perf_counter()
+        model = ModelService.load_model(model_instance)
+        features = sample_features(model_instance)
+        if features is not None:
+            try:
+                model.predict(ModelService.model_input(model, features))
+            except Exception:
+                # A model trained on other features still counts as loaded
+                logger.warning("Warm-up prediction failed for %s", model_instance, exc_info=True)
+        timings[model_instance.id] = time.perf_counter() - started
+    return timings
+
+
+def _run():
+    try:
+        timings = warm_up()
+    except Exception as e:
+        logger.exception("Model warm-up failed")
+        with _lock:
+            _state.update(status=FAILED, error=str(e))
+    else:
+        with _lock:
+            _state.update(status=READY, models=timings)
+
+
+def _run_in_thread():
+    try:
+        _run()
+    finally:
+        close_old_connections()
+
+
+def start_warm_up(background=True):
+    """
+    Start warming up this process, in a background thread by default. Safe
+    to call more than once, and from a server's post-fork hook.
+    """
+    with _lock:
+        if _state['pid'] == os.getpid():
+            return
+        _state.update(pid=os.getpid(), status=WARMING, models={}, error=None)
+    if background:
+        threading.Thread(target=_run_in_thread, name='model-warm-up', daemon=True).start()
+    else:
+        _run()
+
+
+def start_server_warm_up():
+    """
+    Start warming up a server process when ML_WARM_UP is set. Called once
+    the WSGI or ASGI application has been created.
+    """
+    if getattr(settings, 'ML_WARM_UP', False):
+        start_warm_up()
+
+
+def warm_up_status():
+    """
+    Return this process's warm-up state.
+    """
+    with _lock:
+        if _state['pid'] != os.getpid():
+            # Forked from a process that warmed up; this one has not started
+            return {'status': PENDING, 'models': {}, 'error': None}
+        return {key: value for key, value in _state.items() if key != 'pid'}
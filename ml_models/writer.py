@@ -0,0 +1,280 @@
+"""
+Write-behind persistence for Prediction rows.
+
+In write-behind mode, predictions are appended to a spill file (so they
+survive a crash) and to an in-process buffer. The buffer is written with a
+single bulk_create when it reaches the batch size or when the flush
+interval elapses. After each successful flush, the spill file is rewritten
+to hold only rows that are still pending.
+
+Every writer spills to a file of its own, named after the process id and a
+random token, and holds an exclusive flock on it for as long as it lives.
+The kernel releases the lock when the process dies, so a spill file that
+can be locked belongs to a dead writer, even if a restarted container has
+reused its process id. Such files are claimed (by renaming them) and
+inserted the next time a writer starts. Delivery is at-least-once: a crash
+between a flush and the spill rewrite replays that batch.
+
+When write-behind is disabled, or the spill file cannot be written, or too
+many rows are pending, predictions are saved synchronously instead.
+"""
+
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from ml_models.models import Prediction
+
+logger = logging.getLogger(__name__)
+
+SPILL_FIELDS = (
+    'model_id',
+    'prediction_type',
+    'match_id',
+    'player_id',
+    'team_id',
+    'prediction_data',
+    'confidence',
+    'feature_hash',
+)
+
+
+class PredictionWriter:
+    """
+    Buffers Prediction rows and writes them in batches.
+    """
+
+    def __init__(self, enabled=False, batch_size=200, flush_interval=1.0,
+                 spill_dir=None, max_pending=10000):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_dir = spill_dir
+        self.max_pending = max_pending
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._spill_name = f'predictions-{os.getpid()}-{uuid.uuid4().hex}.jsonl'
+        # Open, locked handle on the spill file once this writer has spilled
+        self._spill_file = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            enabled=getattr(settings, 'ML_PREDICTION_WRITE_BEHIND', False),
+            batch_size=getattr(settings, 'ML_PREDICTION_WRITE_BEHIND_BATCH_SIZE', 200),
+            flush_interval=getattr(settings, 'ML_PREDICTION_WRITE_BEHIND_INTERVAL', 1.0),
+            spill_dir=getattr(settings, 'ML_PREDICTION_SPILL_DIR', None),
+            max_pending=getattr(settings, 'ML_PREDICTION_WRITE_BEHIND_MAX_PENDING', 10000),
+        )
+
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    @property
+    def spill_path(self):
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, self._spill_name)
+
+    def save(self, predictions):
+        """
+        Persist unsaved Prediction instances and return them. In write-behind
+        mode they are returned before they are written, without primary keys.
+        """
+        predictions = list(predictions)
+        if not predictions:
+            return predictions
+        if not self.enabled or self.pending + len(predictions) > self.max_pending:
+            return self.write(predictions)
+
+        try:
+            with self._lock:
+                self._spill(predictions)
+                self._buffer.extend(predictions)
+                pending = len(self._buffer)
+        except OSError:
+            logger.exception("Could not spill predictions, writing synchronously")
+            return self.write(predictions)
+
+        self._start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return predictions
+
+    def write(self, predictions):
+        """
+        Write predictions synchronously.
+        """
+        return Prediction.objects.bulk_create(predictions)
+
+    def flush(self):
+        """
+        Write every buffered prediction. Returns the number of rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                with transaction.atomic():
+                    self.write(batch)
+            except Exception:
+                with self._lock:
+                    self._buffer = batch + self._buffer
+                raise
+            with self._lock:
+                self._rewrite_spill(self._buffer)
+            return len(batch)
+
+    def replay_spill(self):
+        """
+        Insert predictions left in spill files by writers that are no
+        longer running. Returns the number of rows written.
+        """
+        if not self.spill_dir:
+            return 0
+        written = 0
+        # predictions-<pid>-<token>.jsonl, or replay-<pid>-<token>.jsonl once claimed
+        for path in glob.glob(os.path.join(self.spill_dir, '*-*.jsonl')):
+            if path == self.spill_path:
+                continue
+            try:
+                f = open(path)
+            except FileNotFoundError:
+                # Another process claimed it first
+                continue
+            with f:
+                if not try_lock(f):
+                    # Its writer, or the process replaying it, is alive
+                    continue
+                claimed = os.path.join(
+                    self.spill_dir, f'replay-{os.getpid()}-{uuid.uuid4().hex}.jsonl'
+                )
+                try:
+                    os.rename(path, claimed)
+                except FileNotFoundError:
+                    continue
+                rows = [json.loads(line) for line in f if line.strip()]
+                if rows:
+                    self.write([Prediction(**row) for row in rows])
+                os.remove(claimed)
+                written += len(rows)
+        return written
+
+    def _spill(self, predictions):
+        if not self.spill_dir:
+            return
+        if self._spill_file is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill_file = self._open_locked(self.spill_path, 'a')
+        self._write_rows(self._spill_file, predictions)
+
+    def _rewrite_spill(self, predictions):
+        if not self.spill_dir:
+            return
+        if self._spill_file is None:
+            return
+        # The new file is locked before it replaces the old one
+        temp_path = f'{self.spill_path}.tmp'
+        f = self._open_locked(temp_path, 'w')
+        try:
+            self._write_rows(f, predictions)
+            os.replace(temp_path, self.spill_path)
+        except OSError:
+            f.close()
+            raise
+        self._spill_file.close()
+        self._spill_file = f
+
+    @staticmethod
+    def _open_locked(path, mode):
+        f = open(path, mode)
+        if not try_lock(f):
+            f.close()
+            raise OSError(f"Spill file {path} is locked by another writer")
+        return f
+
+    def _write_rows(self, f, predictions):
+        for prediction in predictions:
+            f.write(json.dumps(self._serialize(prediction)) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+    @staticmethod
+    def _serialize(prediction):
+        return {field: getattr(prediction, field) for field in SPILL_FIELDS}
+
+    def _start(self):
+        if self._thread is not None or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='prediction-writer', daemon=True
+                )
+                self._thread.start()
+                atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Prediction flush failed, will retry")
+            finally:
+                close_old_connections()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Prediction flush at exit failed; rows remain in the spill file")
+
+
+def try_lock(f):
+    """
+    Take an exclusive flock on an open file without waiting. Returns False
+    if another open file holds it. The lock is released when the file is
+    closed or its process exits.
+    """
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_prediction_writer():
+    """
+    Return the process-wide prediction writer, replaying any spilled rows
+    the first time it is created.
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = PredictionWriter.from_settings()
+                if writer.enabled:
+                    try:
+                        writer.replay_spill()
+                    except Exception:
+                        logger.exception("Could not replay spilled predictions")
+                _writer = writer
+    return _writer
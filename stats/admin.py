@@ -1,5 +1,5 @@
 from django.contrib import admin
-from stats.models import Team, Player, Match, PlayerStats, TeamStats
+from stats.models import Team, Player, Match, PlayerStats, TeamStats, PlayerSeasonTotals, TeamSeasonTotals
 
 
 @admin.register(Team)
@@ -36,3 +36,17 @@ class TeamStatsAdmin(admin.ModelAdmin):
     list_display = ('team', 'match', 'points', 'rebounds', 'assists')
     list_filter = ('match', 'team')
     search_fields = ('team__name',)
+
+
+@admin.register(PlayerSeasonTotals)
+class PlayerSeasonTotalsAdmin(admin.ModelAdmin):
+    list_display = ('player', 'season', 'is_playoff', 'games', 'points', 'rebounds', 'assists')
+    list_filter = ('season', 'is_playoff')
+    search_fields = ('player__first_name', 'player__last_name')
+
+
+@admin.register(TeamSeasonTotals)
+class TeamSeasonTotalsAdmin(admin.ModelAdmin):
+    list_display = ('team', 'season', 'is_playoff', 'games', 'points', 'rebounds', 'assists')
+    list_filter = ('season', 'is_playoff')
+    search_fields = ('team__name',)
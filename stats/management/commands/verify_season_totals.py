@@ -0,0 +1,46 @@
+"""
+Management command to check season totals against the box scores.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from stats.season_totals import SOURCES, check_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute player and team season totals from box scores and report (or fix) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(SOURCES), action='append', help='Only check player or team totals')
+        parser.add_argument('--season', action='append', help='Only check these seasons')
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted rows from the box scores')
+        parser.add_argument('--show', type=int, default=10, help='Drifted rows to list per kind')
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for kind in options['kind'] or sorted(SOURCES):
+            started = time.perf_counter()
+            drift = check_totals(kind, seasons=options['season'], fix=options['fix'])
+            elapsed = time.perf_counter() - started
+            drifted += len(drift)
+
+            self.stdout.write(f'{kind}: {len(drift)} drifted rows in {elapsed:.2f}s')
+            for (entity_id, season, is_playoff), stored, computed in drift[:options['show']]:
+                label = f"  {kind} {entity_id} {season}{' playoffs' if is_playoff else ''}"
+                if stored is None:
+                    self.stdout.write(f"{label}: missing ({computed['games']} games)")
+                elif computed is None:
+                    self.stdout.write(f"{label}: no box scores ({stored['games']} games stored)")
+                else:
+                    changes = ', '.join(
+                        f'{column} {stored[column]} != {computed[column]}'
+                        for column in computed if stored[column] != computed[column]
+                    )
+                    self.stdout.write(f'{label}: {changes}')
+
+        if drifted and not options['fix']:
+            self.stdout.write(self.style.WARNING(f'{drifted} season totals rows drifted; rerun with --fix to rewrite them'))
+        elif drifted:
+            self.stdout.write(self.style.SUCCESS(f'Rewrote {drifted} season totals rows'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Season totals match the box scores'))
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamSeasonTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.CharField(max_length=10)),
+                ('is_playoff', models.BooleanField(default=False)),
+                ('games', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('assists', models.IntegerField(default=0)),
+                ('rebounds', models.IntegerField(default=0)),
+                ('offensive_rebounds', models.IntegerField(default=0)),
+                ('defensive_rebounds', models.IntegerField(default=0)),
+                ('steals', models.IntegerField(default=0)),
+                ('blocks', models.IntegerField(default=0)),
+                ('turnovers', models.IntegerField(default=0)),
+                ('personal_fouls', models.IntegerField(default=0)),
+                ('field_goals_made', models.IntegerField(default=0)),
+                ('field_goals_attempted', models.IntegerField(default=0)),
+                ('three_pointers_made', models.IntegerField(default=0)),
+                ('three_pointers_attempted', models.IntegerField(default=0)),
+                ('free_throws_made', models.IntegerField(default=0)),
+                ('free_throws_attempted', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_totals', to='stats.team')),
+            ],
+            options={
+                'verbose_name_plural': 'Team Season Totals',
+                'indexes': [models.Index(fields=['season', 'is_playoff'], name='stats_teams_season_78610d_idx')],
+                'unique_together': {('team', 'season', 'is_playoff')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerSeasonTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.CharField(max_length=10)),
+                ('is_playoff', models.BooleanField(default=False)),
+                ('games', models.IntegerField(default=0)),
+                ('minutes_played', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('assists', models.IntegerField(default=0)),
+                ('rebounds', models.IntegerField(default=0)),
+                ('offensive_rebounds', models.IntegerField(default=0)),
+                ('defensive_rebounds', models.IntegerField(default=0)),
+                ('steals', models.IntegerField(default=0)),
+                ('blocks', models.IntegerField(default=0)),
+                ('turnovers', models.IntegerField(default=0)),
+                ('personal_fouls', models.IntegerField(default=0)),
+                ('field_goals_made', models.IntegerField(default=0)),
+                ('field_goals_attempted', models.IntegerField(default=0)),
+                ('three_pointers_made', models.IntegerField(default=0)),
+                ('three_pointers_attempted', models.IntegerField(default=0)),
+                ('free_throws_made', models.IntegerField(default=0)),
+                ('free_throws_attempted', models.IntegerField(default=0)),
+                ('plus_minus', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_totals', to='stats.player')),
+            ],
+            options={
+                'verbose_name_plural': 'Player Season Totals',
+                'indexes': [models.Index(fields=['season', 'is_playoff'], name='stats_playe_season_315d2b_idx')],
+                'unique_together': {('player', 'season', 'is_playoff')},
+            },
+        ),
+    ]
@@ -211,3 +211,85 @@ class TeamStats(models.Model):
         if self.free_throws_attempted == 0:
             return 0
         return round(self.free_throws_made / self.free_throws_attempted * 100, 1)
+
+
+class PlayerSeasonTotals(models.Model):
+    """
+    A player's summed box scores for a season, regular season or playoffs,
+    kept up to date by stats.season_totals as PlayerStats rows change.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='season_totals')
+    season = models.CharField(max_length=10)
+    is_playoff = models.BooleanField(default=False)
+    games = models.IntegerField(default=0)
+    minutes_played = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    assists = models.IntegerField(default=0)
+    rebounds = models.IntegerField(default=0)
+    offensive_rebounds = models.IntegerField(default=0)
+    defensive_rebounds = models.IntegerField(default=0)
+    steals = models.IntegerField(default=0)
+    blocks = models.IntegerField(default=0)
+    turnovers = models.IntegerField(default=0)
+    personal_fouls = models.IntegerField(default=0)
+    field_goals_made = models.IntegerField(default=0)
+    field_goals_attempted = models.IntegerField(default=0)
+    three_pointers_made = models.IntegerField(default=0)
+    three_pointers_attempted = models.IntegerField(default=0)
+    free_throws_made = models.IntegerField(default=0)
+    free_throws_attempted = models.IntegerField(default=0)
+    plus_minus = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['season', 'is_playoff']),
+        ]
+        verbose_name_plural = 'Player Season Totals'
+        unique_together = ('player', 'season', 'is_playoff')
+
+    def __str__(self):
+        return f"{self.player} {self.season}{' playoff' if self.is_playoff else ''} totals"
+
+    def per_game(self, field):
+        return round(getattr(self, field) / self.games, 1) if self.games else 0
+
+
+class TeamSeasonTotals(models.Model):
+    """
+    A team's summed box scores for a season, regular season or playoffs,
+    kept up to date by stats.season_totals as TeamStats rows change.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='season_totals')
+    season = models.CharField(max_length=10)
+    is_playoff = models.BooleanField(default=False)
+    games = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    assists = models.IntegerField(default=0)
+    rebounds = models.IntegerField(default=0)
+    offensive_rebounds = models.IntegerField(default=0)
+    defensive_rebounds = models.IntegerField(default=0)
+    steals = models.IntegerField(default=0)
+    blocks = models.IntegerField(default=0)
+    turnovers = models.IntegerField(default=0)
+    personal_fouls = models.IntegerField(default=0)
+    field_goals_made = models.IntegerField(default=0)
+    field_goals_attempted = models.IntegerField(default=0)
+    three_pointers_made = models.IntegerField(default=0)
+    three_pointers_attempted = models.IntegerField(default=0)
+    free_throws_made = models.IntegerField(default=0)
+    free_throws_attempted = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['season', 'is_playoff']),
+        ]
+        verbose_name_plural = 'Team Season Totals'
+        unique_together = ('team', 'season', 'is_playoff')
+
+    def __str__(self):
+        return f"{self.team} {self.season}{' playoff' if self.is_playoff else ''} totals"
+
+    def per_game(self, field):
+        return round(getattr(self, field) / self.games, 1) if self.games else 0
@@ -0,0 +1,170 @@
+"""
+Season totals maintained by delta.
+
+PlayerSeasonTotals and TeamSeasonTotals hold one row per entity, season
+and playoff flag with summed box scores and a game count, so season pages
+and leaderboards read single rows instead of aggregating PlayerStats or
+TeamStats. Signal handlers in stats.signals keep the rows current: an
+inserted box score adds its values to its row, a deleted one subtracts
+them, and an edited one applies the difference with one UPDATE.
+
+check_totals() recomputes totals from the box scores in bulk, reports
+rows that have drifted (for example after bulk imports that bypass model
+signals) and can rewrite them.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from stats.models import PlayerSeasonTotals, PlayerStats, TeamSeasonTotals, TeamStats
+
+PLAYER_FIELDS = (
+    'minutes_played', 'points', 'assists', 'rebounds', 'offensive_rebounds', 'defensive_rebounds',
+    'steals', 'blocks', 'turnovers', 'personal_fouls', 'field_goals_made', 'field_goals_attempted',
+    'three_pointers_made', 'three_pointers_attempted', 'free_throws_made', 'free_throws_attempted',
+    'plus_minus',
+)
+TEAM_FIELDS = tuple(field for field in PLAYER_FIELDS if field not in ('minutes_played', 'plus_minus'))
+
+# kind: (box score model, totals model, entity field, summed fields)
+SOURCES = {
+    'player': (PlayerStats, PlayerSeasonTotals, 'player', PLAYER_FIELDS),
+    'team': (TeamStats, TeamSeasonTotals, 'team', TEAM_FIELDS),
+}
+
+
+def kind_of(stats):
+    return 'player' if isinstance(stats, PlayerStats) else 'team'
+
+
+def box_score(stats):
+    """
+    Return ((entity_id, season, is_playoff), values) for a box score.
+    """
+    _, _, entity, fields = SOURCES[kind_of(stats)]
+    match = stats.match
+    key = (getattr(stats, f'{entity}_id'), match.season, match.is_playoff)
+    return key, {field: getattr(stats, field) for field in fields}
+
+
+def stored_box_score(stats):
+    """
+    Return box_score() of a box score as currently stored, or None if it
+    is not stored yet.
+    """
+    model, _, entity, fields = SOURCES[kind_of(stats)]
+    if stats.pk is None:
+        return None
+    row = model.objects.filter(pk=stats.pk).values(
+        f'{entity}_id', 'match__season', 'match__is_playoff', *fields
+    ).first()
+    if row is None:
+        return None
+    key = (row[f'{entity}_id'], row['match__season'], row['match__is_playoff'])
+    return key, {field: row[field] for field in fields}
+
+
+def apply_delta(kind, key, values, games):
+    """
+    Add `values` (or subtract, with negative games) to the totals row for a
+    key, creating it when needed and deleting it once no games are left.
+    """
+    _, totals_model, entity, fields = SOURCES[kind]
+    entity_id, season, is_playoff = key
+    lookup = {f'{entity}_id': entity_id, 'season': season, 'is_playoff': is_playoff}
+    with transaction.atomic():
+        if games > 0:
+            totals_model.objects.bulk_create([totals_model(**lookup)], ignore_conflicts=True)
+        totals_model.objects.filter(**lookup).update(
+            games=F('games') + games,
+            **{field: F(field) + values[field] for field in fields if values[field]}
+        )
+        if games < 0:
+            totals_model.objects.filter(**lookup, games__lte=0).delete()
+
+
+def record_change(kind, previous, current):
+    """
+    Move a box score's contribution from its previous (key, values) to its
+    current one; either may be None for inserts and deletes.
+    """
+    if previous and current and previous[0] == current[0]:
+        key = current[0]
+        difference = {field: current[1][field] - previous[1][field] for field in current[1]}
+        if any(difference.values()):
+            apply_delta(kind, key, difference, 0)
+        return
+    if previous:
+        apply_delta(kind, previous[0], {field: -value for field, value in previous[1].items()}, -1)
+    if current:
+        apply_delta(kind, current[0], current[1], 1)
+
+
+def computed_totals(kind, entity_ids=None, seasons=None):
+    """
+    Sum box scores in one query. Returns {(entity_id, season, is_playoff): totals}.
+    """
+    model, _, entity, fields = SOURCES[kind]
+    stats = model.objects.all()
+    if entity_ids is not None:
+        stats = stats.filter(**{f'{entity}_id__in': entity_ids})
+    if seasons is not None:
+        stats = stats.filter(match__season__in=seasons)
+    rows = stats.values(f'{entity}_id', 'match__season', 'match__is_playoff').annotate(
+        games=Count('id'), **{f'sum_{field}': Sum(field) for field in fields}
+    ).order_by()
+    return {
+        (row[f'{entity}_id'], row['match__season'], row['match__is_playoff']): {
+            'games': row['games'], **{field: row[f'sum_{field}'] for field in fields}
+        }
+        for row in rows
+    }
+
+
+def check_totals(kind, entity_ids=None, seasons=None, fix=False):
+    """
+    Compare stored totals (for some entities or seasons, or all of them)
+    with totals recomputed from the box scores. Returns the drifted rows
+    as (key, stored, computed) tuples, where stored or computed is None
+    for a missing or surplus row. With fix, the stored rows are rewritten.
+    """
+    _, totals_model, entity, fields = SOURCES[kind]
+    columns = ('games', *fields)
+    computed = computed_totals(kind, entity_ids, seasons)
+
+    stored_rows = totals_model.objects.all()
+    if entity_ids is not None:
+        stored_rows = stored_rows.filter(**{f'{entity}_id__in': entity_ids})
+    if seasons is not None:
+        stored_rows = stored_rows.filter(season__in=seasons)
+    stored = {
+        (row[f'{entity}_id'], row['season'], row['is_playoff']): row
+        for row in stored_rows.values('id', f'{entity}_id', 'season', 'is_playoff', *columns)
+    }
+
+    drift = []
+    for key in sorted(set(stored) | set(computed)):
+        stored_values = stored.get(key)
+        computed_values = computed.get(key)
+        if stored_values is not None:
+            stored_values = {column: stored_values[column] for column in columns}
+        if stored_values != computed_values:
+            drift.append((key, stored_values, computed_values))
+
+    if fix and drift:
+        now = timezone.now()
+        with transaction.atomic():
+            surplus = [stored[key]['id'] for key, _, computed_values in drift if computed_values is None]
+            totals_model.objects.filter(pk__in=surplus).delete()
+            changed = [
+                totals_model(
+                    pk=stored[key]['id'] if key in stored else None,
+                    **{f'{entity}_id': key[0], 'season': key[1], 'is_playoff': key[2]},
+                    updated_at=now,
+                    **computed_values
+                )
+                for key, _, computed_values in drift if computed_values is not None
+            ]
+            totals_model.objects.bulk_update([row for row in changed if row.pk], [*columns, 'updated_at'])
+            totals_model.objects.bulk_create([row for row in changed if not row.pk])
+    return drift
@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from stats import season_totals
+from stats.models import Match, PlayerStats, TeamStats
+
+
+@receiver(pre_save, sender=PlayerStats)
+@receiver(pre_save, sender=TeamStats)
+def remember_stored_box_score(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored version of an edited box score, so the season totals
+    can be updated by the difference after it is saved.
+    """
+    if not raw:
+        instance._stored_box_score = season_totals.stored_box_score(instance)
+
+
+@receiver(post_save, sender=PlayerStats)
+@receiver(post_save, sender=TeamStats)
+def update_season_totals(sender, instance, raw=False, **kwargs):
+    """
+    Apply a saved box score to its season totals.
+    """
+    if not raw:
+        season_totals.record_change(
+            season_totals.kind_of(instance),
+            getattr(instance, '_stored_box_score', None),
+            season_totals.box_score(instance)
+        )
+
+
+@receiver(post_delete, sender=PlayerStats)
+@receiver(post_delete, sender=TeamStats)
+def remove_from_season_totals(sender, instance, **kwargs):
+    """
+    Take a deleted box score out of its season totals.
+    """
+    season_totals.record_change(season_totals.kind_of(instance), season_totals.box_score(instance), None)
+
+
+@receiver(pre_save, sender=Match)
+def remember_match_season(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored season and playoff flag of an edited match.
+    """
+    if not raw and instance.pk:
+        instance._stored_season = Match.objects.filter(pk=instance.pk).values_list('season', 'is_playoff').first()
+
+
+@receiver(post_save, sender=Match)
+def move_match_season_totals(sender, instance, raw=False, **kwargs):
+    """
+    Recompute the totals of the match's players and teams when the match
+    moves to another season or between regular season and playoffs.
+    """
+    stored = getattr(instance, '_stored_season', None)
+    if raw or not stored or stored == (instance.season, instance.is_playoff):
+        return
+    seasons = {stored[0], instance.season}
+    for kind, (model, _, entity, _) in season_totals.SOURCES.items():
+        entity_ids = list(model.objects.filter(match=instance).values_list(f'{entity}_id', flat=True))
+        if entity_ids:
+            season_totals.check_totals(kind, entity_ids=entity_ids, seasons=seasons, fix=True)
@@ -2,7 +2,10 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from stats.models import Team, Player, Match
+from io import StringIO
+from django.core.management import call_command
+from stats.models import Team, Player, Match, PlayerStats, TeamStats, PlayerSeasonTotals, TeamSeasonTotals
+from stats.season_totals import PLAYER_FIELDS, TEAM_FIELDS, check_totals
 from django.utils import timezone
 import datetime
 
@@ -201,3 +204,132 @@ class APITests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['last_name'], 'James')
+
+
+class SeasonTotalsTests(TestCase):
+    """Tests for the delta-maintained season totals."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.client = APIClient()
+        self.team1 = Team.objects.create(
+            name='Lakers', abbreviation='LAL', city='Los Angeles', conference='Western', division='Pacific'
+        )
+        self.team2 = Team.objects.create(
+            name='Celtics', abbreviation='BOS', city='Boston', conference='Eastern', division='Atlantic'
+        )
+        self.player1 = Player.objects.create(
+            first_name='LeBron', last_name='James', jersey_number=23, position='SF',
+            height=2.06, weight=113.4, date_of_birth=datetime.date(1984, 12, 30), team=self.team1
+        )
+        self.player2 = Player.objects.create(
+            first_name='Jayson', last_name='Tatum', jersey_number=0, position='SF',
+            height=2.03, weight=95.3, date_of_birth=datetime.date(1998, 3, 3), team=self.team2
+        )
+        self.match1 = self.create_match('2023-24', days_ago=2)
+        self.match2 = self.create_match('2023-24', days_ago=1)
+    
+    def create_match(self, season, days_ago, is_playoff=False):
+        return Match.objects.create(
+            home_team=self.team1, away_team=self.team2,
+            date=timezone.now() - datetime.timedelta(days=days_ago),
+            season=season, home_score=110, away_score=100, is_playoff=is_playoff, is_completed=True
+        )
+    
+    def add_stats(self, player, match, points, assists=5):
+        values = dict.fromkeys(PLAYER_FIELDS, 1)
+        values.update(minutes_played=30, points=points, assists=assists)
+        return PlayerStats.objects.create(player=player, match=match, **values)
+    
+    def totals(self, player, season='2023-24', is_playoff=False):
+        return PlayerSeasonTotals.objects.get(player=player, season=season, is_playoff=is_playoff)
+    
+    def test_insert_update_and_delete_apply_deltas(self):
+        """Test that box score changes update the totals row by delta."""
+        stats = self.add_stats(self.player1, self.match1, points=20)
+        self.add_stats(self.player1, self.match2, points=30)
+        totals = self.totals(self.player1)
+        self.assertEqual((totals.games, totals.points, totals.assists), (2, 50, 10))
+        self.assertEqual(totals.per_game('points'), 25.0)
+        
+        stats.points = 26
+        stats.save()
+        totals = self.totals(self.player1)
+        self.assertEqual((totals.games, totals.points), (2, 56))
+        
+        stats.delete()
+        totals = self.totals(self.player1)
+        self.assertEqual((totals.games, totals.points), (1, 30))
+        
+        PlayerStats.objects.get(player=self.player1).delete()
+        self.assertFalse(PlayerSeasonTotals.objects.filter(player=self.player1).exists())
+    
+    def test_moving_box_score_between_seasons(self):
+        """Test moving a box score to a match in another season."""
+        playoff_match = self.create_match('2023-24', days_ago=0, is_playoff=True)
+        stats = self.add_stats(self.player1, self.match1, points=20)
+        self.add_stats(self.player1, self.match2, points=30)
+        
+        stats.match = playoff_match
+        stats.save()
+        self.assertEqual(self.totals(self.player1).points, 30)
+        self.assertEqual(self.totals(self.player1, is_playoff=True).points, 20)
+        self.assertEqual(check_totals('player'), [])
+    
+    def test_match_season_change_moves_totals(self):
+        """Test that editing a match's season moves its box scores' totals."""
+        self.add_stats(self.player1, self.match1, points=20)
+        self.add_stats(self.player2, self.match1, points=15)
+        self.add_stats(self.player1, self.match2, points=30)
+        TeamStats.objects.create(team=self.team1, match=self.match1, **dict.fromkeys(TEAM_FIELDS, 10))
+        
+        self.match1.season = '2022-23'
+        self.match1.save()
+        self.assertEqual(self.totals(self.player1).points, 30)
+        self.assertEqual(self.totals(self.player1, season='2022-23').points, 20)
+        self.assertFalse(PlayerSeasonTotals.objects.filter(player=self.player2, season='2023-24').exists())
+        self.assertEqual(TeamSeasonTotals.objects.get(team=self.team1).season, '2022-23')
+        self.assertEqual(check_totals('player'), [])
+        self.assertEqual(check_totals('team'), [])
+    
+    def test_verify_command_reports_and_fixes_drift(self):
+        """Test that verify_season_totals reports drift and rewrites it with --fix."""
+        self.add_stats(self.player1, self.match1, points=20)
+        self.add_stats(self.player2, self.match1, points=15)
+        # Bulk updates bypass the signals
+        PlayerStats.objects.filter(player=self.player1).update(points=24)
+        PlayerSeasonTotals.objects.filter(player=self.player2).delete()
+        
+        out = StringIO()
+        call_command('verify_season_totals', '--kind', 'player', stdout=out)
+        self.assertIn('player: 2 drifted rows', out.getvalue())
+        self.assertIn('points 20 != 24', out.getvalue())
+        self.assertIn('missing (1 games)', out.getvalue())
+        self.assertEqual(self.totals(self.player1).points, 20)
+        
+        out = StringIO()
+        call_command('verify_season_totals', '--fix', stdout=out)
+        self.assertIn('Rewrote 2 season totals rows', out.getvalue())
+        self.assertEqual(self.totals(self.player1).points, 24)
+        self.assertEqual(self.totals(self.player2).points, 15)
+        self.assertEqual(check_totals('player'), [])
+    
+    def test_season_totals_leaderboard(self):
+        """Test ranking season totals through the API."""
+        self.add_stats(self.player1, self.match1, points=20, assists=10)
+        self.add_stats(self.player1, self.match2, points=30, assists=10)
+        self.add_stats(self.player2, self.match1, points=35, assists=2)
+        
+        response = self.client.get(
+            reverse('playerseasontotals-list'), {'season': '2023-24', 'ordering': '-points_per_game'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['player'] for row in results], [self.player2.id, self.player1.id])
+        self.assertEqual(results[1]['player_name'], 'LeBron James')
+        self.assertEqual(results[1]['points'], 50)
+        self.assertEqual(results[1]['per_game']['points'], 25.0)
+        
+        response = self.client.get(reverse('playerseasontotals-list'), {'ordering': '-points'})
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(results[0]['player'], self.player1.id)